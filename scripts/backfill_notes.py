@@ -0,0 +1,73 @@
+"""Bring notes written by older versions of the app up to the current schema.
+
+Stores a precomputed `snippet` on notes that lack one, and gives notes without
+a `change_seq` their own sequence number so delta sync can page past them.
+
+Usage:
+    python scripts/backfill_notes.py --dry-run
+    python scripts/backfill_notes.py --commit
+
+Environment variables:
+    MONGODB_URI or MONGO_URI (required)
+    MONGO_DB_NAME (optional, default: notetaker_db)
+"""
+import os
+import sys
+import argparse
+
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from src.models.note import make_snippet, WATERMARK_ID  # noqa: E402
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument('--dry-run', action='store_true', help='Count notes needing a backfill without writing')
+    p.add_argument('--commit', action='store_true', help='Write the backfilled fields to MongoDB')
+    p.add_argument('--batch-size', type=int, default=500)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    uri = os.environ.get('MONGODB_URI') or os.environ.get('MONGO_URI')
+    if not uri:
+        print('MONGODB_URI not set. Set it to your MongoDB connection string and retry.')
+        return 2
+
+    db = MongoClient(uri)[os.environ.get('MONGO_DB_NAME', 'notetaker_db')]
+    coll = db.notes
+    snippet_query = {'snippet': {'$exists': False}, 'deleted': {'$ne': True}}
+    seq_query = {'change_seq': {'$exists': False}}
+    if not args.commit:
+        print(f'Notes missing a snippet: {coll.count_documents(snippet_query)}')
+        print(f'Notes missing a change_seq: {coll.count_documents(seq_query)}')
+        print('Dry run mode - no changes written')
+        return 0
+
+    snippets = 0
+    ops = []
+    for doc in coll.find(snippet_query, {'content': 1}).batch_size(args.batch_size):
+        ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'snippet': make_snippet(doc.get('content'))}}))
+        if len(ops) >= args.batch_size:
+            snippets += coll.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        snippets += coll.bulk_write(ops, ordered=False).modified_count
+    print(f'Snippets written: {snippets}')
+
+    ids = [d['_id'] for d in coll.find(seq_query, {'_id': 1})]
+    if ids:
+        # reserve a block of sequence numbers in one step, oldest note first
+        top = db.counters.find_one_and_update({'_id': WATERMARK_ID}, {'$inc': {'seq': len(ids)}},
+                                              upsert=True, return_document=ReturnDocument.AFTER)['seq']
+        first = top - len(ids) + 1
+        ops = [UpdateOne({'_id': oid}, {'$set': {'change_seq': first + i}}) for i, oid in enumerate(sorted(ids))]
+        for start in range(0, len(ops), args.batch_size):
+            coll.bulk_write(ops[start:start + args.batch_size], ordered=False)
+    print(f'Change sequence numbers assigned: {len(ids)}')
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+"""Microbenchmark: encoding a 10k-note list response.
+
+Compares the old path (str()/isoformat() per field, then Flask's default
+stdlib encoder with sorted keys) against FastJSONProvider on the
+pass-through serializer, with and without orjson.
+
+Usage:
+    python scripts/bench_json_encode.py [--notes 10000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from src import json_provider  # noqa: E402
+from src.json_provider import FastJSONProvider  # noqa: E402
+from src.models.note import doc_to_dict, make_snippet  # noqa: E402
+
+
+def make_docs(n):
+    base = datetime(2024, 1, 1)
+    content = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 8
+    return [{
+        '_id': ObjectId(),
+        'title': f'Note {i}',
+        'content': content,
+        'snippet': make_snippet(content),
+        'created_at': base + timedelta(seconds=i),
+        'updated_at': base + timedelta(seconds=i, milliseconds=500),
+        'translations': {'French': {'title': f'Note {i}', 'content': content}},
+        'version': 1,
+    } for i in range(n)]
+
+
+def legacy_doc_to_dict(doc):
+    return {
+        'id': str(doc.get('_id')),
+        'title': doc.get('title', ''),
+        'content': doc.get('content', ''),
+        'snippet': doc.get('snippet', ''),
+        'created_at': doc.get('created_at').isoformat() if doc.get('created_at') else None,
+        'updated_at': doc.get('updated_at').isoformat() if doc.get('updated_at') else None,
+        'translations': doc.get('translations', {}),
+        'version': doc.get('version', 0),
+    }
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.notes)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    def run_legacy():
+        default.dumps({'notes': [legacy_doc_to_dict(d) for d in docs]}, separators=(',', ':'))
+
+    def run_fast():
+        fast.dumps({'notes': [doc_to_dict(d) for d in docs]}, separators=(',', ':'))
+
+    results = [('legacy: str()/isoformat() + stdlib json', best_of(args.repeat, run_legacy))]
+    orjson = json_provider.orjson
+    json_provider.orjson = None
+    results.append(('FastJSONProvider (stdlib fallback)', best_of(args.repeat, run_fast)))
+    json_provider.orjson = orjson
+    if orjson is not None:
+        results.append(('FastJSONProvider (orjson)', best_of(args.repeat, run_fast)))
+    else:
+        print('orjson not installed; pip install orjson to benchmark the fast path')
+
+    baseline = results[0][1]
+    print(f'Encoding {args.notes} notes, best of {args.repeat}:')
+    for label, seconds in results:
+        print(f'  {label:<42} {seconds * 1000:8.1f} ms  ({baseline / seconds:4.1f}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
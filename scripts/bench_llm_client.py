@@ -0,0 +1,78 @@
+"""Measure per-call latency of back-to-back translations, fresh client vs pooled client.
+
+The legacy path builds a new OpenAI client (and so a new TCP/TLS connection)
+for every call; the pooled path goes through llm.clients, which keeps the
+connection alive between calls. Requires GITHUB_TOKEN (or --token) and network
+access to the inference endpoint.
+
+Usage:
+    python scripts/bench_llm_client.py [--calls 10] [--text "Hello"] [--to French]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from openai import OpenAI
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from src import llm  # noqa: E402
+
+
+def messages_for(text, target):
+    return [
+        {'role': 'system', 'content': 'Translate the user text. Reply with the translation only.'},
+        {'role': 'user', 'content': f'Translate to {target}:\n\n{text}'},
+    ]
+
+
+def fresh_call(token, msgs):
+    client = OpenAI(base_url=llm.endpoint, api_key=token)
+    try:
+        client.chat.completions.create(messages=msgs, model=llm.model, temperature=0.2, max_tokens=32)
+    finally:
+        client.close()
+
+
+def pooled_call(token, msgs):
+    llm.clients.get(llm.endpoint, token).chat.completions.create(
+        messages=msgs, model=llm.model, temperature=0.2, max_tokens=32)
+
+
+def run(label, fn, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    # The first pooled call pays for the handshake too; report it separately.
+    steady = timings[1:] or timings
+    print(f'  {label:<8} first {timings[0] * 1000:7.1f} ms   '
+          f'median {statistics.median(steady) * 1000:7.1f} ms   mean {statistics.mean(steady) * 1000:7.1f} ms')
+    return statistics.median(steady)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument('--text', default='Good morning, see you at the meeting.')
+    parser.add_argument('--to', default='French')
+    parser.add_argument('--token')
+    args = parser.parse_args()
+
+    token = args.token or llm.env_token
+    if not token:
+        print('Set GITHUB_TOKEN or pass --token', file=sys.stderr)
+        return 2
+    msgs = messages_for(args.text, args.to)
+    print(f'{args.calls} back-to-back calls to {llm.endpoint} ({llm.model}):')
+    fresh = run('fresh', lambda: fresh_call(token, msgs), args.calls)
+    pooled = run('pooled', lambda: pooled_call(token, msgs), args.calls)
+    print(f'  saved per call (median): {(fresh - pooled) * 1000:.1f} ms')
+    llm.clients.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
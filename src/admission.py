@@ -0,0 +1,228 @@
+"""Admission control for the LLM routes (generate and translate).
+
+A model call holds a worker thread for seconds. Without a bound, a burst of
+LLM requests takes every thread and plain CRUD requests queue behind them.
+Each LLM request therefore has to pass two checks before it runs:
+
+- a token bucket per client (by IP address) limits how often one client may
+  start LLM work;
+- a concurrency limit per route group (`generate`, `translate`) caps how many
+  run at once. A few more may wait for a slot, up to a queue-depth limit and
+  a queue timeout.
+
+A request that fails either check gets 429 with a Retry-After header and
+never takes a thread for long. A slot is held until the response has been
+sent, so a streamed (SSE/NDJSON) response keeps it until the stream closes.
+
+Configuration (environment):
+- LLM_ADMISSION: `off` disables these checks (default on)
+- LLM_RATE_PER_MINUTE: sustained LLM requests per client per minute (default 30)
+- LLM_RATE_BURST: requests a client may make at once before the rate applies (default 10)
+- LLM_MAX_CONCURRENT: LLM requests running at once per route group (default 8);
+  LLM_MAX_CONCURRENT_GENERATE / LLM_MAX_CONCURRENT_TRANSLATE override it per group
+- LLM_MAX_QUEUE: requests allowed to wait for a slot per route group (default 16)
+- LLM_QUEUE_TIMEOUT_SECONDS: how long a request waits for a slot (default 5)
+- LLM_TRUST_FORWARDED_FOR: `on` to identify clients by the first X-Forwarded-For
+  address; only use this behind a proxy that sets it (default off)
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+
+class Rejected(Exception):
+    """The request was not admitted; retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token; returns 0 when granted, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket per client key; the least recently seen clients are forgotten beyond `max_clients`."""
+
+    def __init__(self, per_minute=30, burst=10, max_clients=10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take()
+        if wait:
+            raise Rejected('rate_limited', wait)
+
+    def clients(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders; up to `max_queue` more may wait `queue_timeout` seconds for a slot."""
+
+    def __init__(self, limit=8, max_queue=16, queue_timeout=5.0):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.peak_active = 0
+        self._avg_hold = 1.0  # seconds, moving average
+
+    def acquire(self):
+        """Take a slot or raise Rejected; returns the time the slot was taken (pass it to release)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    raise Rejected('queue_full', self._retry_after())
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                raise Rejected('queue_timeout', self._retry_after())
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        return time.monotonic()
+
+    def release(self, started):
+        with self._lock:
+            self.active -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - started)
+        self._slots.release()
+
+    def _retry_after(self):
+        # roughly when the queue ahead of a new request will have drained
+        return self._avg_hold * (self.waiting + 1) / self.limit
+
+
+class Ticket:
+    """An admitted request's slot; release() is safe to call more than once."""
+
+    def __init__(self, limiter, started):
+        self._limiter = limiter
+        self._started = started
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            limiter, self._limiter = self._limiter, None
+        if limiter is not None:
+            limiter.release(self._started)
+
+
+class AdmissionController:
+    def __init__(self, rate_limiter, limiters):
+        self.rate_limiter = rate_limiter
+        self.limiters = limiters  # route group -> ConcurrencyLimiter
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = {'rate_limited': 0, 'queue_full': 0, 'queue_timeout': 0}
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        default = int(env('LLM_MAX_CONCURRENT', '8'))
+        queue = int(env('LLM_MAX_QUEUE', '16'))
+        timeout = float(env('LLM_QUEUE_TIMEOUT_SECONDS', '5'))
+        limiters = {group: ConcurrencyLimiter(int(env(f'LLM_MAX_CONCURRENT_{group.upper()}', default)), queue, timeout)
+                    for group in ('generate', 'translate')}
+        return cls(RateLimiter(float(env('LLM_RATE_PER_MINUTE', '30')), int(env('LLM_RATE_BURST', '10'))), limiters)
+
+    def admit(self, group, client):
+        """Check the client's rate and take a slot in `group`; returns a Ticket or raises Rejected."""
+        try:
+            self.rate_limiter.check(client)
+            ticket = Ticket(self.limiters[group], self.limiters[group].acquire())
+        except Rejected as e:
+            with self._lock:
+                self.rejected[e.reason] += 1
+            raise
+        with self._lock:
+            self.admitted += 1
+        return ticket
+
+    def stats(self):
+        return {
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'clients': self.rate_limiter.clients(),
+            'groups': {group: {'active': l.active, 'waiting': l.waiting, 'limit': l.limit,
+                               'max_queue': l.max_queue, 'peak_active': l.peak_active}
+                       for group, l in self.limiters.items()},
+        }
+
+
+ENABLED = os.environ.get('LLM_ADMISSION', 'on').lower() not in ('off', 'none', '0')
+TRUST_FORWARDED_FOR = os.environ.get('LLM_TRUST_FORWARDED_FOR', 'off').lower() in ('1', 'on', 'true', 'yes')
+
+controller = AdmissionController.from_env()
+
+
+def client_key():
+    if TRUST_FORWARDED_FOR and request.headers.get('X-Forwarded-For'):
+        return request.headers['X-Forwarded-For'].split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+
+def admit(group):
+    """Decorate a route so it only runs once admitted to `group`; otherwise answer 429 with Retry-After."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            try:
+                ticket = controller.admit(group, client_key())
+            except Rejected as e:
+                response = jsonify({'error': 'Too many LLM requests, retry later', 'reason': e.reason})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+                return response
+            try:
+                response = current_app.make_response(fn(*args, **kwargs))
+            except BaseException:
+                ticket.release()
+                raise
+            # after the body has been sent, which for a stream is when it ends or the client goes away
+            response.call_on_close(ticket.release)
+            return response
+        return wrapper
+    return decorate
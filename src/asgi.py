@@ -0,0 +1,756 @@
+"""ASGI variant of the API with non-blocking Mongo (motor) and LLM (AsyncOpenAI) I/O.
+
+It serves the same /api/notes and /api/users contract as the Flask app in
+src/main.py, so clients can use either one. A translation or generation
+waits on the event loop instead of holding a worker thread, so one process
+can run hundreds of them while CRUD requests stay fast:
+
+    pip install -r requirements-asgi.txt
+    uvicorn src.asgi:app --port 5001
+
+Covered: health, stats, note list/create/get/update/delete (keyset pages,
+fields/view, ETags, version and If-Match checks), PATCH deltas, delta sync
+(/api/notes/changes), translate (one or several languages) and generate,
+including `"async": true` jobs and GET /api/jobs/{id}, and the users CRUD.
+Translate and generate pass the same admission checks as in the Flask app
+(src/admission.py, LLM_ADMISSION and the LLM_RATE_* / LLM_MAX_* variables).
+Search, batch writes and the NDJSON/SSE streaming variants are served only
+by the Flask app; here they answer 501. Queued jobs are run by the Flask
+app's workers or `python -m src.jobs`.
+
+Configuration is the same as for src/main.py (MONGODB_URI, MONGO_DB_NAME and
+the LLM_* variables). The translation cache is kept in memory only and the
+translation memory is not used. Writes here never reach the Flask app's
+search index or note cache (see the comment above `routes`), so when both
+apps serve one database, Flask search and single-note reads can lag behind
+ASGI writes by SEARCH_INDEX_MAX_AGE and NOTE_CACHE_TTL.
+"""
+import asyncio
+import contextlib
+import hashlib
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+repo_root = os.path.dirname(os.path.dirname(__file__))
+env_path = os.path.join(repo_root, '.env')
+if os.path.exists(env_path):
+    load_dotenv(env_path)
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags
+
+from src import admission, jobs, llm, llm_async, metrics, mongo_settings
+from src.json_provider import dumpb
+from src.models.note import (NOTE_INDEXES, WATERMARK_ID, doc_to_dict, make_note_doc, note_update_fields,
+                             is_noop_update, parse_fields, note_projection, note_etag, etag_version,
+                             version_filter, version_matches, live, tombstone_update, content_hash)
+from src.models.user import user_doc_to_dict, make_user_doc
+from src.pagination import DEFAULT_LIMIT, KEYSET_SORT, MAX_LIMIT, encode_cursor, keyset_query, parse_limit
+from src.routes.note import PATCH_RESPONSE_FIELDS, parse_targets, translation_failed
+from src.streaming import NDJSON
+from src.sync import (SyncTokenError, SyncTokenExpired, changes_page, changes_projection, changes_query,
+                      DEFAULT_LIMIT as SYNC_DEFAULT_LIMIT)
+from src.textdelta import DeltaError, apply_ops
+
+
+class JSONResponse(Response):
+    """JSON encoded like the Flask app's FastJSONProvider (ObjectId and datetimes as strings)."""
+
+    media_type = 'application/json'
+
+    def render(self, content):
+        return dumpb(content)
+
+
+def error(message, status, **extra):
+    return JSONResponse({'error': message, **extra}, status)
+
+
+async def read_json(request):
+    """The request body as JSON, or None when it is missing or malformed."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def conditional(response, etag):
+    """Attach a strong ETag and ask clients to revalidate before reusing a cached copy"""
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(etag):
+    return conditional(Response(status_code=304), etag)
+
+
+def wants_ndjson(request):
+    accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+    return accept.best_match(['application/json', NDJSON]) == NDJSON
+
+
+def wants_stream(request):
+    """Whether the client asked for a streamed list (see src/streaming.py stream_mode)."""
+    return wants_ndjson(request) or request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def wants_async(request, data):
+    """`"async": true` or `Prefer: respond-async`, as in src/routes/job.py."""
+    if data.get('async') is True:
+        return True
+    return any(p.strip().lower() == 'respond-async' for p in request.headers.get('prefer', '').split(','))
+
+
+# ConcurrencyLimiter.acquire may block for up to LLM_QUEUE_TIMEOUT_SECONDS; those waits get their own
+# threads (one per queue place) so they never tie up the default executor that motor runs on.
+admission_waits = ThreadPoolExecutor(
+    max_workers=sum(l.max_queue + 1 for l in admission.controller.limiters.values()),
+    thread_name_prefix='llm-admission')
+
+
+def client_key(request):
+    """The rate-limit key for a request, as admission.client_key does for Flask."""
+    forwarded = request.headers.get('x-forwarded-for')
+    if admission.TRUST_FORWARDED_FOR and forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+
+def admitted(group, endpoint):
+    """Run `endpoint` only once admitted to `group` (src/admission.py); otherwise 429 with Retry-After."""
+    async def wrapper(request):
+        if not admission.ENABLED:
+            return await endpoint(request)
+        try:
+            ticket = await asyncio.get_running_loop().run_in_executor(
+                admission_waits, admission.controller.admit, group, client_key(request))
+        except admission.Rejected as e:
+            response = error('Too many LLM requests, retry later', 429, reason=e.reason)
+            response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+            return response
+        try:
+            # responses here are never streamed, so the slot is done once the body is built
+            return await endpoint(request)
+        finally:
+            ticket.release()
+    return wrapper
+
+
+def flask_only(feature):
+    """Endpoint answering 501 for a feature only the Flask app serves."""
+    async def endpoint(request):
+        return error(f'{feature} is only served by the Flask app (src/main.py)', 501)
+    return endpoint
+
+
+def parse_object_id(raw):
+    try:
+        return ObjectId(raw)
+    except Exception:
+        return None
+
+
+# --- Mongo (motor) -----------------------------------------------------------
+
+def database(request):
+    db = request.app.state.db
+    if db is None:
+        raise RuntimeError("Database not connected. Please check MONGODB_URI environment variable.")
+    return db
+
+
+async def notes_collection(request):
+    db = database(request)
+    if not request.app.state.note_indexes_ready:
+        try:
+            for keys, options in NOTE_INDEXES:
+                await db.notes.create_index(keys, **options)
+            request.app.state.note_indexes_ready = True
+        except Exception:
+            # Queries still work without the indexes, just slower; retry on the next request.
+            pass
+    return db.notes
+
+
+async def bump_watermark(db, by=1):
+    """Async bump_watermark (src/models/note.py)."""
+    doc = await db.counters.find_one_and_update({'_id': WATERMARK_ID}, {'$inc': {'seq': by}},
+                                                upsert=True, return_document=ReturnDocument.AFTER)
+    return doc['seq']
+
+
+async def read_watermark(db):
+    doc = await db.counters.find_one({'_id': WATERMARK_ID})
+    return doc['seq'] if doc else 0
+
+
+async def jobs_collection(request):
+    db = database(request)
+    if not request.app.state.job_indexes_ready:
+        try:
+            for keys, options in jobs.JOB_INDEXES:
+                await db.jobs.create_index(keys, **options)
+            request.app.state.job_indexes_ready = True
+        except Exception:
+            pass
+    return db.jobs
+
+
+async def enqueue_job(request, kind, params):
+    """Queue a job for the Flask app's workers (or `python -m src.jobs`) and answer 202."""
+    job_id = (await (await jobs_collection(request)).insert_one(jobs.new_job(kind, params))).inserted_id
+    location = f'/api/jobs/{job_id}'
+    response = JSONResponse({'job_id': str(job_id), 'status': jobs.QUEUED, 'location': location}, 202)
+    response.headers['Location'] = location
+    response.headers['Preference-Applied'] = 'respond-async'
+    return response
+
+
+async def fetch_page(coll, query, limit, cursor=None, projection=None):
+    """Async fetch_page (src/pagination.py): (docs, next_cursor)."""
+    docs = await coll.find(keyset_query(query, cursor), projection).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
+
+
+async def insert_note(coll, doc):
+    doc['change_seq'] = await bump_watermark(coll.database)
+    doc['_id'] = (await coll.insert_one(doc)).inserted_id
+    await bump_watermark(coll.database)
+    return doc
+
+
+# --- Notes -------------------------------------------------------------------
+
+def list_etag(request, watermark):
+    """Same list ETag as the Flask app: the collection watermark plus the query args"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(args.encode('utf-8')).hexdigest()[:12]
+    return f'notes-{watermark}-{digest}'
+
+
+def if_none_match(request, etag):
+    return parse_etags(request.headers.get('if-none-match')).contains(etag)
+
+
+def precondition_query(request, oid):
+    """Filter for a write guarded by If-Match; None when the header cannot match this note"""
+    query = live({'_id': oid})
+    if_match = parse_etags(request.headers.get('if-match'))
+    if if_match and not if_match.star_tag:
+        expected = etag_version(if_match, oid)
+        if expected is None:
+            return None
+        query.update(version_filter(expected))
+    return query
+
+
+async def write_missed(coll, query):
+    if len(query) > 2 and await coll.count_documents(live({'_id': query['_id']}), limit=1):
+        return error('Precondition failed', 412)
+    return error('Note not found', 404)
+
+
+def version_conflict(current):
+    body = {'error': 'Version conflict', 'current_version': current.get('version', 0),
+            'note': doc_to_dict(current)}
+    return conditional(JSONResponse(body, 409), note_etag(current))
+
+
+async def get_notes(request):
+    """GET /api/notes: one keyset page, { notes, next_cursor } (streaming is 501, see flask_only)."""
+    if wants_stream(request):
+        return await flask_only('Streaming note lists')(request)
+    try:
+        args = request.query_params
+        limit = parse_limit(args.get('limit'), default=DEFAULT_LIMIT, maximum=MAX_LIMIT)
+        fields = parse_fields(args.get('fields'), args.get('view'))
+        coll = await notes_collection(request)
+        etag = list_etag(request, await read_watermark(coll.database))
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        docs, next_cursor = await fetch_page(coll, live({}), limit, cursor=args.get('cursor'),
+                                             projection=note_projection(fields))
+        body = {'notes': [doc_to_dict(d, fields) for d in docs], 'next_cursor': next_cursor}
+        return conditional(JSONResponse(body), etag)
+    except ValueError as e:
+        return error(str(e), 400)
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500, type='server_error')
+
+
+async def create_note(request):
+    try:
+        data = await read_json(request)
+        if not data or 'title' not in data or 'content' not in data:
+            return error('Title and content are required', 400)
+        doc = await insert_note(await notes_collection(request), make_note_doc(data['title'], data['content']))
+        return conditional(JSONResponse(doc_to_dict(doc), 201), note_etag(doc))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_note(request):
+    oid = parse_object_id(request.path_params['note_id'])
+    if oid is None:
+        return error('Invalid note id', 400)
+    try:
+        doc = await (await notes_collection(request)).find_one(live({'_id': oid}))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+    if not doc:
+        return error('Note not found', 404)
+    if if_none_match(request, note_etag(doc)):
+        return not_modified(note_etag(doc))
+    return conditional(JSONResponse(doc_to_dict(doc)), note_etag(doc))
+
+
+async def update_note(request):
+    """PUT /api/notes/{id}: `version` in the body (409) and If-Match (412) work as in the Flask app."""
+    try:
+        data = await read_json(request)
+        if not data:
+            return error('No data provided', 400)
+        coll = await notes_collection(request)
+        oid = parse_object_id(request.path_params['note_id'])
+        if oid is None:
+            return error('Invalid note id', 400)
+        update = note_update_fields(data)
+        if not update:
+            return error('No updatable fields provided', 400)
+        expected = data.get('version')
+        if expected is not None and (not isinstance(expected, int) or isinstance(expected, bool)):
+            return error('version must be an integer', 400)
+        query = precondition_query(request, oid)
+        if query is None:
+            return error('Precondition failed', 412)
+        if expected is not None and 'version' in query and query['version'] != version_filter(expected)['version']:
+            # If-Match and the body name different versions; at least one of them is stale
+            return error('Precondition failed', 412)
+
+        current = await coll.find_one(live({'_id': oid}))
+        if current is None:
+            return error('Note not found', 404)
+        if expected is not None and current.get('version', 0) != expected:
+            return version_conflict(current)
+        if is_noop_update(current, update) and version_matches(query, current):
+            return conditional(JSONResponse(doc_to_dict(current)), note_etag(current))
+
+        if expected is not None:
+            query.update(version_filter(expected))
+        update['updated_at'] = datetime.utcnow()
+        update['change_seq'] = await bump_watermark(coll.database)
+        result = await coll.find_one_and_update(query, {'$set': update, '$inc': {'version': 1}},
+                                                return_document=ReturnDocument.AFTER)
+        if not result:
+            if expected is not None:
+                current = await coll.find_one(live({'_id': oid}))
+                if current is not None and current.get('version', 0) != expected:
+                    return version_conflict(current)
+            return await write_missed(coll, query)
+        await bump_watermark(coll.database)
+        return conditional(JSONResponse(doc_to_dict(result)), note_etag(result))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def patch_note(request):
+    """PATCH /api/notes/{id}: text edits against `base_version`, as in the Flask route (409 / 422 / 400)."""
+    try:
+        data = await read_json(request) or {}
+        base_version = data.get('base_version')
+        if not isinstance(base_version, int) or isinstance(base_version, bool):
+            return error('base_version must be an integer', 400)
+        if not isinstance(data.get('checksum'), str):
+            return error('checksum is required', 400)
+        oid = parse_object_id(request.path_params['note_id'])
+        if oid is None:
+            return error('Invalid note id', 400)
+
+        coll = await notes_collection(request)
+        current = await coll.find_one(live({'_id': oid}))
+        if current is None:
+            return error('Note not found', 404)
+        if current.get('version', 0) != base_version:
+            return version_conflict(current)
+        try:
+            content = apply_ops(current.get('content', ''), data.get('ops', []))
+        except DeltaError as e:
+            return error(str(e), 422)
+        if content_hash(content) != data['checksum']:
+            return error('Checksum mismatch', 422)
+
+        update = note_update_fields({'content': content, **({'title': data['title']} if 'title' in data else {})})
+        if is_noop_update(current, update):
+            return conditional(JSONResponse(doc_to_dict(current, PATCH_RESPONSE_FIELDS)), note_etag(current))
+        update['updated_at'] = datetime.utcnow()
+        update['change_seq'] = await bump_watermark(coll.database)
+        result = await coll.find_one_and_update({**live({'_id': oid}), **version_filter(base_version)},
+                                                {'$set': update, '$inc': {'version': 1}},
+                                                return_document=ReturnDocument.AFTER)
+        if not result:
+            current = await coll.find_one(live({'_id': oid}))
+            if current is None:
+                return error('Note not found', 404)
+            return version_conflict(current)
+        await bump_watermark(coll.database)
+        return conditional(JSONResponse(doc_to_dict(result, PATCH_RESPONSE_FIELDS)), note_etag(result))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_changes(request):
+    """GET /api/notes/changes: delta sync with the same tokens as the Flask app (src/sync.py)."""
+    try:
+        args = request.query_params
+        limit = parse_limit(args.get('limit'), default=SYNC_DEFAULT_LIMIT, maximum=1000)
+        fields = parse_fields(args.get('fields'), args.get('view'))
+        coll = await notes_collection(request)
+        now_millis = int(time.time() * 1000)
+        # read before querying so anything committed later has a higher change_seq
+        watermark = await read_watermark(coll.database)
+        query, since_seq, since_millis = changes_query(args.get('since'), now_millis)
+        found = await coll.find(query, changes_projection(note_projection(fields))).sort('change_seq', 1) \
+            .limit(limit + 1).to_list(limit + 1)
+        docs, next_token, has_more = changes_page(found, limit, watermark, since_seq, since_millis, now_millis)
+    except SyncTokenExpired as e:
+        return error(str(e), 410)
+    except (SyncTokenError, ValueError) as e:
+        return error(str(e), 400)
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500, type='server_error')
+    return JSONResponse({
+        'changed': [doc_to_dict(d, fields) for d in docs if not d.get('deleted')],
+        'deleted': [str(d['_id']) for d in docs if d.get('deleted')],
+        'next_token': next_token,
+        'has_more': has_more,
+    })
+
+
+async def delete_note(request):
+    oid = parse_object_id(request.path_params['note_id'])
+    if oid is None:
+        return error('Invalid note id', 400)
+    query = precondition_query(request, oid)
+    if query is None:
+        return error('Precondition failed', 412)
+    try:
+        coll = await notes_collection(request)
+        result = await coll.update_one(query, tombstone_update(await bump_watermark(coll.database)))
+        if result.modified_count == 0:
+            return await write_missed(coll, query)
+        await bump_watermark(coll.database)
+        return Response(status_code=204)
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def save_translations(coll, doc, by_language):
+    if not by_language:
+        return
+    update_doc = {f'translations.{target}.{name}': value
+                  for target, translated in by_language.items() for name, value in translated.items()}
+    update_doc['updated_at'] = datetime.utcnow()
+    update_doc['change_seq'] = await bump_watermark(coll.database)
+    await coll.update_one(live({'_id': doc.get('_id')}), {'$set': update_doc, '$inc': {'version': 1}})
+    await bump_watermark(coll.database)
+
+
+async def translate_note(request):
+    """POST /api/notes/{id}/translate: same request and response shapes as the Flask route."""
+    oid = parse_object_id(request.path_params['note_id'])
+    if oid is None:
+        return error('Invalid note id', 400)
+    try:
+        coll = await notes_collection(request)
+        doc = await coll.find_one(live({'_id': oid}))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500)
+    if not doc:
+        return error('Note not found', 404)
+
+    data = await read_json(request) or {}
+    model_name, token, mode = data.get('model'), data.get('token'), data.get('mode')
+    if mode is not None and mode not in llm.TRANSLATE_MODES:
+        return error(f"mode must be one of {', '.join(llm.TRANSLATE_MODES)}", 400)
+    to = data.get('to', 'English')
+    try:
+        targets = parse_targets(to)
+    except ValueError as e:
+        return error(str(e), 400)
+    fields = {'title': doc.get('title', ''), 'content': doc.get('content', '')}
+    if isinstance(to, list) and wants_ndjson(request):
+        return await flask_only('Streaming translations')(request)
+    if wants_async(request, data):
+        if token:
+            return error('token cannot be combined with async; jobs use the server token', 400)
+        return await enqueue_job(request, 'translate', {'note_id': str(doc['_id']), 'to': to, 'model': model_name,
+                                                        'mode': mode})
+
+    try:
+        if not isinstance(to, list):
+            translated, errors = await llm_async.translate_fields(fields, targets[0], model_name, token, mode)
+            if translation_failed(fields, translated, errors):
+                return error('; '.join(f'{name}: {msg}' for name, msg in errors.items()), 502, errors=errors)
+            await save_translations(coll, doc, {targets[0]: translated})
+            body = {'id': str(doc['_id']),
+                    'translated_title': translated.get('title'),
+                    'translated_content': translated.get('content')}
+            if errors:
+                body['errors'] = errors
+            return JSONResponse(body)
+
+        saved, failed = {}, {}
+        for target, translated, errors in await llm_async.translate_languages(fields, targets, model_name, token,
+                                                                             mode):
+            if not translation_failed(fields, translated, errors):
+                saved[target] = translated
+            if errors:
+                failed[target] = errors
+        if not saved:
+            return error('No language could be translated', 502, errors=failed)
+        await save_translations(coll, doc, saved)
+        body = {'id': str(doc['_id']), 'translations': saved}
+        if failed:
+            body['errors'] = failed
+        return JSONResponse(body)
+    except RuntimeError as e:
+        return error(str(e), 502)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def generate_note(request):
+    data = await read_json(request) or {}
+    prompt = data.get('prompt')
+    if not prompt or not isinstance(prompt, str):
+        return error('prompt must be a non-empty string', 400)
+    model_name = data.get('model')
+    api_token = data.get('token') or data.get('api_token')
+    if wants_async(request, data):
+        if api_token:
+            return error('token cannot be combined with async; jobs use the server token', 400)
+        try:
+            return await enqueue_job(request, 'generate', {'prompt': prompt, 'model': model_name})
+        except RuntimeError as e:
+            return error(str(e), 503)
+    try:
+        generated = await llm_async.generate_note(prompt, model_name=model_name, api_token=api_token)
+    except Exception as e:
+        return error('LLM generation failed', 502, detail=str(e))
+    doc = make_note_doc(generated.get('title') or '', generated.get('content') or '')
+    try:
+        await insert_note(await notes_collection(request), doc)
+        return conditional(JSONResponse(doc_to_dict(doc), 201), note_etag(doc))
+    except RuntimeError as e:
+        return error(str(e), 503)
+    except Exception as e:
+        return error('Failed to save generated note', 500, detail=str(e))
+
+
+# --- Jobs --------------------------------------------------------------------
+
+async def get_job(request):
+    """GET /api/jobs/{id}: status of a background job, as in src/routes/job.py."""
+    oid = parse_object_id(request.path_params['job_id'])
+    if oid is None:
+        return error('Invalid job id', 400)
+    try:
+        doc = await (await jobs_collection(request)).find_one({'_id': oid})
+        if not doc:
+            return error('Job not found', 404)
+        return JSONResponse(jobs.job_to_dict(doc))
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500, type='server_error')
+
+
+# --- Users -------------------------------------------------------------------
+
+async def get_users(request):
+    try:
+        docs = await database(request).users.find().to_list(None)
+        return JSONResponse([user_doc_to_dict(d) for d in docs])
+    except RuntimeError as e:
+        return error(str(e), 503, type='configuration_error')
+    except Exception as e:
+        return error(str(e), 500, type='server_error')
+
+
+async def create_user(request):
+    data = await read_json(request)
+    if not data or 'username' not in data or 'email' not in data:
+        return error('username and email required', 400)
+    doc = make_user_doc(data['username'], data['email'])
+    doc['_id'] = (await database(request).users.insert_one(doc)).inserted_id
+    return JSONResponse(user_doc_to_dict(doc), 201)
+
+
+async def get_user(request):
+    oid = parse_object_id(request.path_params['user_id'])
+    if oid is None:
+        return error('Invalid user id', 400)
+    doc = await database(request).users.find_one({'_id': oid})
+    if not doc:
+        return error('User not found', 404)
+    return JSONResponse(user_doc_to_dict(doc))
+
+
+async def update_user(request):
+    data = await read_json(request) or {}
+    oid = parse_object_id(request.path_params['user_id'])
+    if oid is None:
+        return error('Invalid user id', 400)
+    update = {k: data[k] for k in ('username', 'email') if k in data}
+    if not update:
+        return error('No updatable fields provided', 400)
+    result = await database(request).users.find_one_and_update({'_id': oid}, {'$set': update},
+                                                               return_document=ReturnDocument.AFTER)
+    if not result:
+        return error('User not found', 404)
+    return JSONResponse(user_doc_to_dict(result))
+
+
+async def delete_user(request):
+    oid = parse_object_id(request.path_params['user_id'])
+    if oid is None:
+        return error('Invalid user id', 400)
+    result = await database(request).users.delete_one({'_id': oid})
+    if result.deleted_count == 0:
+        return error('User not found', 404)
+    return Response(status_code=204)
+
+
+# --- App ---------------------------------------------------------------------
+
+async def health_check(request):
+    status = {'status': 'ok', 'service': 'NoteTaker API', 'server': 'asgi',
+              'mongodb_uri_set': request.app.state.mongo_uri_configured, 'database': 'not_tested'}
+    db = request.app.state.db
+    if db is None:
+        status.update(database='not_configured', status='degraded',
+                      message='MONGODB_URI environment variable not set')
+        return JSONResponse(status, 503)
+    try:
+        await db.command('ping')
+    except Exception as e:
+        status.update(database='error', database_error=str(e), status='degraded')
+        return JSONResponse(status, 503)
+    status.update(database='connected', status='healthy')
+    return JSONResponse(status)
+
+
+async def stats(request):
+    return JSONResponse(metrics.snapshot())
+
+
+# Mixed deployments: writes made here do not touch the Flask app's in-process state. Its search index
+# picks them up only on the next rebuild (SEARCH_INDEX_MAX_AGE, default 300 s) and its note cache keeps
+# serving the previous version until NOTE_CACHE_TTL expires, whatever NOTE_CACHE_BACKEND is. Translations
+# cached here stay in this process's memory.
+routes = [
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/stats', stats, methods=['GET']),
+    Route('/api/notes', get_notes, methods=['GET']),
+    Route('/api/notes', create_note, methods=['POST']),
+    Route('/api/notes/generate', admitted('generate', generate_note), methods=['POST']),
+    Route('/api/notes/generate/stream', flask_only('Streaming generation'), methods=['POST']),
+    # before /api/notes/{note_id}, which would otherwise take these paths as note ids
+    Route('/api/notes/changes', get_changes, methods=['GET']),
+    Route('/api/notes/search', flask_only('Search'), methods=['GET']),
+    Route('/api/notes/batch', flask_only('Batch writes'), methods=['POST']),
+    Route('/api/notes/{note_id}', get_note, methods=['GET']),
+    Route('/api/notes/{note_id}', update_note, methods=['PUT']),
+    Route('/api/notes/{note_id}', patch_note, methods=['PATCH']),
+    Route('/api/notes/{note_id}', delete_note, methods=['DELETE']),
+    Route('/api/notes/{note_id}/translate', admitted('translate', translate_note), methods=['POST']),
+    Route('/api/notes/{note_id}/translate/stream', flask_only('Streaming translations'), methods=['POST']),
+    Route('/api/jobs/{job_id}', get_job, methods=['GET']),
+    Route('/api/users', get_users, methods=['GET']),
+    Route('/api/users', create_user, methods=['POST']),
+    Route('/api/users/{user_id}', get_user, methods=['GET']),
+    Route('/api/users/{user_id}', update_user, methods=['PUT']),
+    Route('/api/users/{user_id}', delete_user, methods=['DELETE']),
+]
+
+
+def create_app(db=None, mongo_uri=None, db_name=None):
+    """Build the ASGI app around a motor database (`db`), or one created from `mongo_uri`."""
+    mongo_uri = mongo_uri or os.environ.get('MONGODB_URI') or os.environ.get('MONGO_URI')
+    client = None
+    if db is None and mongo_uri:
+        client = AsyncIOMotorClient(mongo_uri, **mongo_settings.client_options())
+        db = client[db_name or os.environ.get('MONGO_DB_NAME', 'notetaker_db')]
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        warmup = os.environ.get('MONGO_WARMUP', 'background').lower()
+        if client is not None and warmup != 'off':
+            # connect before the first request needs it; `background` lets requests in meanwhile
+            task = asyncio.ensure_future(client.admin.command('ping'))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            if warmup == 'eager':
+                await asyncio.wait([task])
+        yield
+        await llm_async.clients.aclose()
+        if client is not None:
+            client.close()
+
+    app = Starlette(routes=routes, lifespan=lifespan,
+                    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                                           allow_headers=['*'], expose_headers=['ETag', 'Retry-After'])])
+    app.state.db = db
+    app.state.mongo_uri_configured = bool(mongo_uri)
+    app.state.note_indexes_ready = False
+    app.state.job_indexes_ready = False
+    return app
+
+
+metrics.register('llm_admission', admission.controller.stats)
+metrics.register('llm_async_clients', llm_async.clients.stats)
+metrics.register('llm_resilience', llm.guards.stats)
+metrics.register('llm_router', llm.router.stats)
+# In memory only: the Mongo-backed level uses the blocking driver.
+if llm.translation_cache is None and os.environ.get('TRANSLATION_CACHE', 'on').lower() not in ('off', 'none', '0'):
+    from src.translation_cache import TranslationCache
+    llm.translation_cache = TranslationCache.from_env(None)
+    metrics.register('translation_cache', llm.translation_cache.stats)
+
+app = create_app()
@@ -0,0 +1,211 @@
+"""Read-through cache for single-note reads.
+
+Documents are stored BSON-encoded, so every hit hands back a private copy and
+the same bytes work for the in-process and the shared (Redis) backend.
+
+Configuration (environment):
+- NOTE_CACHE_BACKEND: `memory` (default), `redis` or `none`
+- NOTE_CACHE_SIZE: max entries for the memory backend (default 1024)
+- NOTE_CACHE_TTL: seconds an entry lives (default 30). With the memory
+  backend this bounds how long another worker's write can go unseen.
+- NOTE_CACHE_URL: Redis URL for the redis backend
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+
+try:
+    import redis
+except ImportError:  # optional: only needed for NOTE_CACHE_BACKEND=redis
+    redis = None
+
+
+class MemoryBackend:
+    """Size-bounded LRU with per-entry expiry. Thread-safe."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments; eviction follows the server's maxmemory-policy."""
+
+    def __init__(self, url, prefix='notetaker:'):
+        if redis is None:
+            raise RuntimeError('NOTE_CACHE_BACKEND=redis requires the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, value, ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self._prefix + '*'):
+            self._client.delete(key)
+
+    def size(self):
+        return None
+
+
+class DocumentCache:
+    """Read-through cache of Mongo documents keyed by a string id, with hit/miss counters.
+
+    A miss only stores what it loaded if the id was not invalidated while the
+    loader ran; otherwise a write landing between the read and the store would
+    leave the old document cached for the whole TTL. Invalidations are tracked
+    per process, so with the redis backend another worker's write can still be
+    missed until the entry expires.
+    """
+
+    # invalidation counters, shared by ids hashing to the same slot (a collision only skips a store)
+    GENERATION_SLOTS = 4096
+
+    def __init__(self, backend, ttl=30, namespace='note'):
+        self.backend = backend
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.stale_loads = 0
+        self._generations = [0] * self.GENERATION_SLOTS
+        self._lock = threading.Lock()
+
+    def _slot(self, doc_id):
+        return hash(str(doc_id)) % self.GENERATION_SLOTS
+
+    def _key(self, doc_id):
+        return f'{self.namespace}:{doc_id}'
+
+    def get(self, doc_id, loader):
+        """Return the cached document for `doc_id`, calling `loader()` on a miss.
+
+        Missing documents (loader returns None) are not cached. Backend
+        failures fall through to the loader.
+        """
+        key = self._key(doc_id)
+        try:
+            raw = self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            raw = None
+        if raw is not None:
+            self.hits += 1
+            return bson.decode(raw)
+        self.misses += 1
+        slot = self._slot(doc_id)
+        generation = self._generations[slot]
+        doc = loader()
+        if doc is not None:
+            with self._lock:
+                stale = self._generations[slot] != generation
+                if stale:
+                    self.stale_loads += 1
+                else:
+                    self.put(doc_id, doc)
+        return doc
+
+    def put(self, doc_id, doc):
+        try:
+            self.backend.set(self._key(doc_id), bson.encode(doc), self.ttl)
+        except Exception:
+            self.errors += 1
+
+    def invalidate(self, *doc_ids):
+        for doc_id in doc_ids:
+            with self._lock:
+                self._generations[self._slot(doc_id)] += 1
+            try:
+                self.backend.delete(self._key(doc_id))
+            except Exception:
+                self.errors += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'errors': self.errors,
+            'stale_loads': self.stale_loads,
+            'evictions': self.backend.evictions,
+            'size': self.backend.size(),
+            'ttl': self.ttl,
+        }
+
+
+class NullBackend:
+    """Caching disabled: every lookup misses."""
+
+    evictions = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+def note_cache_from_env():
+    kind = os.environ.get('NOTE_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.environ.get('NOTE_CACHE_TTL', '30'))
+    if kind == 'redis':
+        backend = RedisBackend(os.environ.get('NOTE_CACHE_URL', 'redis://localhost:6379/0'))
+    elif kind in ('none', 'off', '0'):
+        backend = NullBackend()
+    else:
+        backend = MemoryBackend(int(os.environ.get('NOTE_CACHE_SIZE', '1024')))
+    return DocumentCache(backend, ttl=ttl)
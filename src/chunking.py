@@ -0,0 +1,148 @@
+"""Split long texts into translation chunks that respect Markdown structure.
+
+A text becomes an ordered list of segments. Segments with `translate=True`
+are prose chunks under a token budget. The other segments are copied through
+unchanged: fenced code blocks and the blank lines between chunks. Joining
+every segment's text gives back the original exactly.
+
+Paragraphs (blank-line separated) are packed greedily into chunks. A
+paragraph over the budget is split at sentence ends; a single sentence over
+the budget becomes a chunk of its own.
+"""
+import re
+from typing import List, NamedTuple
+
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_PARAGRAPH_BREAK = re.compile(r'(\n[ \t]*\n\s*)')
+# Split before the whitespace after . ! ? and right after CJK full stops (which need no space).
+_SENTENCE_END = re.compile(r'(?<=[.!?])(?=\s)|(?<=[。！？])')
+
+
+class Segment(NamedTuple):
+    text: str
+    translate: bool
+
+
+def estimate_tokens(text):
+    """Rough token count: about 4 ASCII characters per token, one token per other character."""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def split_blocks(text):
+    """Split `text` into paragraphs (translate=True), separators and fenced code blocks."""
+    blocks = []
+    prose = []
+    fence = None
+    code = []
+    for line in text.splitlines(keepends=True):
+        if fence is None:
+            match = _FENCE.match(line)
+            if match:
+                blocks.extend(_paragraphs(''.join(prose)))
+                prose = []
+                fence = match.group(1)[0] * 3
+                code = [line]
+            else:
+                prose.append(line)
+        else:
+            code.append(line)
+            if line.lstrip().startswith(fence):
+                blocks.append(Segment(''.join(code), False))
+                fence = None
+    if fence is not None:
+        # unterminated fence: keep the rest verbatim
+        blocks.append(Segment(''.join(code), False))
+    blocks.extend(_paragraphs(''.join(prose)))
+    return blocks
+
+
+def _paragraphs(text):
+    out = []
+    for i, part in enumerate(_PARAGRAPH_BREAK.split(text)):
+        if part:
+            # odd indexes are the captured separators
+            out.append(Segment(part, i % 2 == 0 and bool(part.strip())))
+    return out
+
+
+def _sentences(paragraph, budget):
+    """Pack the sentences of an over-budget paragraph into pieces under `budget`."""
+    pieces, current, tokens = [], '', 0
+    for sentence in _SENTENCE_END.split(paragraph):
+        n = estimate_tokens(sentence)
+        if current and tokens + n > budget:
+            pieces.append(current)
+            current, tokens = '', 0
+        current += sentence
+        tokens += n
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text, budget) -> List[Segment]:
+    """Split `text` into segments whose translatable chunks stay under `budget` tokens."""
+    out = []
+    current = []
+    tokens = 0
+
+    def flush():
+        # separators at the end of a chunk stay outside it
+        trailing = []
+        while current and not current[-1].translate:
+            trailing.insert(0, current.pop())
+        if current:
+            out.append(Segment(''.join(s.text for s in current), True))
+        out.extend(trailing)
+        current.clear()
+
+    for block in split_blocks(text):
+        if not block.translate:
+            if block.text.strip():
+                # code block: never part of a chunk
+                flush()
+                tokens = 0
+                out.append(block)
+            elif current:
+                current.append(block)
+            else:
+                out.append(block)
+            continue
+        pieces = [block.text] if estimate_tokens(block.text) <= budget else _sentences(block.text, budget)
+        for piece in pieces:
+            n = estimate_tokens(piece)
+            if current and tokens + n > budget:
+                flush()
+                tokens = 0
+            current.append(Segment(piece, True))
+            tokens += n
+    flush()
+    return out
+
+
+def split_sentences(text) -> List[Segment]:
+    """Split `text` into one translatable segment per sentence (code blocks and separators pass through)."""
+    out = []
+    for block in split_blocks(text):
+        if not block.translate:
+            out.append(block)
+            continue
+        for sentence in _SENTENCE_END.split(block.text):
+            if sentence:
+                out.append(Segment(sentence, bool(sentence.strip())))
+    return out
+
+
+def reassemble(segments, translations):
+    """Join segments, replacing chunk i with translations[i] and keeping its surrounding whitespace."""
+    out = []
+    for i, segment in enumerate(segments):
+        if not segment.translate:
+            out.append(segment.text)
+            continue
+        text = segment.text
+        lead = text[:len(text) - len(text.lstrip())]
+        trail = text[len(text.rstrip()):]
+        out.append(lead + translations[i].strip() + trail)
+    return ''.join(out)
@@ -0,0 +1,280 @@
+"""Persistent background jobs for slow (LLM) work.
+
+Routes enqueue a job document into the `jobs` collection and answer 202 with
+its id; a worker claims queued jobs, runs the registered handler inside an
+app context and stores the result, retrying failures with exponential
+backoff. Claims carry a lease that the worker renews while the handler runs,
+so a job whose worker died is picked up again once the lease expires; one
+that dies on its last attempt is marked failed instead.
+
+Workers run as threads inside the web process (JOB_WORKERS, default 2, or 0
+on Vercel) or as a separate process:
+
+    JOB_WORKERS=0 python src/main.py     # web only
+    python -m src.jobs --threads 4       # worker only
+
+Configuration (environment):
+- JOB_WORKERS: worker threads started by src/main.py (default 2, 0 when VERCEL is set; 0 disables)
+- JOB_MAX_ATTEMPTS: tries per job before it is marked failed (default 3)
+- JOB_RETRY_BASE_SECONDS: backoff before retry n is base * 2**(n-1) (default 2)
+- JOB_LEASE_SECONDS: how long a claim lasts without renewal before another worker may take over
+  (default 300); a running job renews it every third of that
+- JOB_POLL_SECONDS: idle poll interval (default 1)
+- JOB_TTL_DAYS: finished jobs are deleted after this many days (default 7)
+"""
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', '2'))
+LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '300'))
+POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '1'))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+
+JOB_INDEXES = [
+    # claim order: oldest runnable job first
+    ([('status', ASCENDING), ('run_after', ASCENDING)], {'name': 'status_run_after'}),
+    ([('finished_at', ASCENDING)], {
+        'name': 'finished_ttl',
+        'expireAfterSeconds': int(float(os.environ.get('JOB_TTL_DAYS', '7')) * 86400),
+    }),
+]
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(params) returning a JSON-serializable result
+HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (e.g. the note was deleted)."""
+
+
+def handler(kind):
+    """Register the decorated function as the handler for jobs of `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def ensure_job_indexes(coll):
+    for keys, options in JOB_INDEXES:
+        coll.create_index(keys, **options)
+
+
+def new_job(kind, params, max_attempts=None):
+    """A queued job document, ready to insert."""
+    now = datetime.utcnow()
+    return {
+        'kind': kind,
+        'params': params,
+        'status': QUEUED,
+        'attempts': 0,
+        'max_attempts': max_attempts or MAX_ATTEMPTS,
+        'created_at': now,
+        'updated_at': now,
+        'run_after': now,
+    }
+
+
+def enqueue(coll, kind, params, max_attempts=None):
+    """Insert a queued job and return its id."""
+    job_id = coll.insert_one(new_job(kind, params, max_attempts)).inserted_id
+    _wake.set()
+    return job_id
+
+
+def job_to_dict(doc):
+    out = {
+        'id': doc.get('_id'),
+        'kind': doc.get('kind'),
+        'status': doc.get('status'),
+        'attempts': doc.get('attempts', 0),
+        'max_attempts': doc.get('max_attempts'),
+        'created_at': doc.get('created_at'),
+        'updated_at': doc.get('updated_at'),
+    }
+    for key in ('result', 'error', 'finished_at'):
+        if doc.get(key) is not None:
+            out[key] = doc[key]
+    return out
+
+
+def fail_abandoned(coll, now=None):
+    """Mark running jobs whose lease expired on their last attempt as failed; returns how many."""
+    now = now or datetime.utcnow()
+    result = coll.update_many(
+        {'status': RUNNING, 'lease_until': {'$lt': now}, '$expr': {'$gte': ['$attempts', '$max_attempts']}},
+        {'$set': {'status': FAILED, 'error': 'Worker lost the job lease on its last attempt',
+                  'finished_at': now, 'updated_at': now},
+         '$unset': {'lease_until': '', 'lease': ''}})
+    return result.modified_count
+
+
+def claim(coll, worker_id):
+    """Atomically take the next runnable job (queued and due, or running with an expired lease and attempts left)."""
+    now = datetime.utcnow()
+    fail_abandoned(coll, now)
+    return coll.find_one_and_update(
+        {'$or': [
+            {'status': QUEUED, 'run_after': {'$lte': now}},
+            {'status': RUNNING, 'lease_until': {'$lt': now}, '$expr': {'$lt': ['$attempts', '$max_attempts']}},
+        ]},
+        # `lease` identifies this claim, so a worker whose lease was taken over cannot overwrite the new outcome
+        {'$set': {'status': RUNNING, 'worker': worker_id, 'lease': ObjectId(), 'updated_at': now,
+                  'lease_until': now + timedelta(seconds=LEASE_SECONDS)},
+         '$inc': {'attempts': 1}},
+        sort=[('run_after', ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def renew_lease(coll, job):
+    """Extend this claim's lease; False once another worker has taken the job over."""
+    result = coll.update_one({'_id': job['_id'], 'lease': job['lease'], 'status': RUNNING},
+                             {'$set': {'lease_until': datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}})
+    return result.matched_count == 1
+
+
+def _keep_lease(coll, job, done):
+    while not done.wait(LEASE_SECONDS / 3):
+        try:
+            if not renew_lease(coll, job):
+                return
+        except Exception:
+            logger.exception('Failed to renew the lease of job %s', job['_id'])
+
+
+def run_job(coll, job):
+    """Run one claimed job and record the outcome. Returns the final status."""
+    now = datetime.utcnow
+    fn = HANDLERS.get(job['kind'])
+    done = threading.Event()
+    keeper = threading.Thread(target=_keep_lease, args=(coll, job, done), name=f"job-lease-{job['_id']}",
+                              daemon=True)
+    keeper.start()
+    try:
+        if fn is None:
+            raise PermanentJobError(f"No handler for job kind {job['kind']!r}")
+        result = fn(job.get('params') or {})
+    except Exception as e:
+        retry = not isinstance(e, PermanentJobError) and job['attempts'] < job.get('max_attempts', MAX_ATTEMPTS)
+        update = {'error': str(e), 'updated_at': now()}
+        if retry:
+            delay = RETRY_BASE_SECONDS * 2 ** (job['attempts'] - 1)
+            update.update(status=QUEUED, run_after=now() + timedelta(seconds=delay))
+        else:
+            update.update(status=FAILED, finished_at=now())
+        coll.update_one({'_id': job['_id'], 'lease': job['lease']},
+                        {'$set': update, '$unset': {'lease_until': ''}})
+        logger.warning('Job %s (%s) attempt %s failed: %s', job['_id'], job['kind'], job['attempts'], e)
+        return update['status']
+    finally:
+        done.set()
+    coll.update_one({'_id': job['_id'], 'lease': job['lease']},
+                    {'$set': {'status': SUCCEEDED, 'result': result, 'finished_at': now(), 'updated_at': now()},
+                     '$unset': {'lease_until': '', 'error': ''}})
+    return SUCCEEDED
+
+
+# Set by enqueue() so in-process workers pick new jobs up without waiting for the next poll.
+_wake = threading.Event()
+
+
+class JobWorker:
+    """Pool of threads that claim and run jobs inside `app`'s context."""
+
+    def __init__(self, app, threads=2, poll_interval=POLL_SECONDS):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._threads = []
+        self.counts = {SUCCEEDED: 0, FAILED: 0, QUEUED: 0}
+
+    def start(self):
+        for i in range(self.threads):
+            t = threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        _wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def run_pending(self):
+        """Run jobs until none is runnable; returns how many ran."""
+        ran = 0
+        with self.app.app_context():
+            coll = self.app.config['MONGO_DB'].jobs
+            while not self._stop.is_set():
+                job = claim(coll, self.worker_id)
+                if job is None:
+                    return ran
+                status = run_job(coll, job)
+                # QUEUED here means "failed, retry scheduled"
+                self.counts[status] += 1
+                ran += 1
+        return ran
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception('Job worker error')
+            _wake.wait(self.poll_interval)
+            _wake.clear()
+
+    def stats(self):
+        return {
+            'worker': self.worker_id,
+            'threads': self.threads,
+            'succeeded': self.counts[SUCCEEDED],
+            'failed': self.counts[FAILED],
+            'retried': self.counts[QUEUED],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs (translate/generate) outside the web process')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('JOB_WORKER_THREADS', '2')))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # The web app's own worker threads are not wanted in this process.
+    os.environ['JOB_WORKERS'] = '0'
+    from src.main import app
+    # Use the imported module, not this __main__ copy: the routes register their handlers there.
+    from src import jobs
+    if app.config.get('MONGO_DB') is None:
+        print('MONGODB_URI is not set; nothing to work on', file=sys.stderr)
+        return 2
+    jobs.ensure_job_indexes(app.config['MONGO_DB'].jobs)
+    worker = jobs.JobWorker(app, threads=args.threads).start()
+    print(f'[jobs] {worker.worker_id} running {args.threads} worker thread(s)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop(timeout=5)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
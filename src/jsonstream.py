@@ -0,0 +1,134 @@
+"""Incremental parser for a streamed flat JSON object of string values.
+
+Used to turn a model's token stream for `{"title": "...", "content": "..."}`
+into per-field text deltas while it is still being generated. Anything before
+the first `{` (prose, a code fence) is skipped; non-string values and nesting
+are not supported and stop the parser, after which the caller falls back to
+parsing the complete text.
+"""
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONFieldStream:
+    """Feed chunks in, get (key, text) deltas out.
+
+    `feed(chunk)` returns a list of (key, text) pairs; consecutive pairs for
+    the same key are pieces of one string value. `values` holds everything
+    decoded so far.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.failed = False
+        self._state = 'start'  # start, key_or_end, key, colon, value, string, comma, done
+        self._key = None
+        self._buf = []
+        self._escape = None  # None, '' (after backslash) or the hex digits of a \u escape
+        self._high_surrogate = None
+
+    @property
+    def done(self):
+        return self._state == 'done'
+
+    def feed(self, chunk):
+        out = []
+        for ch in chunk:
+            if self.failed or self._state == 'done':
+                break
+            self._step(ch, out)
+        return [(key, text) for key, text in _merge(out)]
+
+    def _step(self, ch, out):
+        state = self._state
+        if state == 'start':
+            if ch == '{':
+                self._state = 'key_or_end'
+        elif state in ('key_or_end', 'comma', 'colon', 'value'):
+            if ch.isspace():
+                return
+            if state == 'key_or_end' and ch == '}':
+                self._state = 'done'
+            elif state == 'key_or_end' and ch == '"':
+                self._state, self._buf = 'key', []
+            elif state == 'comma' and ch == ',':
+                self._state = 'key_or_end'
+            elif state == 'comma' and ch == '}':
+                self._state = 'done'
+            elif state == 'colon' and ch == ':':
+                self._state = 'value'
+            elif state == 'value' and ch == '"':
+                self._state = 'string'
+                self.values.setdefault(self._key, '')
+            else:
+                self.failed = True
+        elif state in ('key', 'string'):
+            text = self._string_char(ch)
+            if text is None:
+                return
+            if text is _END:
+                if state == 'key':
+                    self._key = ''.join(self._buf)
+                    self._state = 'colon'
+                else:
+                    self._state = 'comma'
+                return
+            if state == 'key':
+                self._buf.append(text)
+            else:
+                self.values[self._key] += text
+                out.append((self._key, text))
+
+    def _string_char(self, ch):
+        """Decode one character inside a string: text, None (need more input) or _END."""
+        if self._escape is None:
+            if ch == '\\':
+                self._escape = ''
+                return None
+            if ch == '"':
+                return _END
+            return self._surrogate(None) + ch if self._high_surrogate else ch
+        if self._escape == '' and ch != 'u':
+            self._escape = None
+            if ch not in _ESCAPES:
+                self.failed = True
+                return None
+            return _ESCAPES[ch]
+        if self._escape == '':
+            self._escape = 'u'
+            return None
+        self._escape += ch
+        if len(self._escape) < 5:
+            return None
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            self.failed = True
+            return None
+        self._escape = None
+        return self._surrogate(code)
+
+    def _surrogate(self, code):
+        # Join a \uD83D\uDE00-style surrogate pair; a lone surrogate is passed through as-is.
+        pending, self._high_surrogate = self._high_surrogate, None
+        if code is None:
+            return chr(pending)
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return chr(pending) if pending else None
+        if 0xDC00 <= code < 0xE000 and pending:
+            return chr(0x10000 + ((pending - 0xD800) << 10) + (code - 0xDC00))
+        return (chr(pending) if pending else '') + chr(code)
+
+
+_END = object()
+
+
+def _merge(pairs):
+    merged = []
+    for key, text in pairs:
+        if merged and merged[-1][0] == key:
+            merged[-1][1] += text
+        else:
+            merged.append([key, text])
+    return merged
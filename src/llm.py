@@ -2,9 +2,27 @@
 import os
 import sys
 import argparse
-from typing import List, Dict, Optional
+import hashlib
+import threading
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
 
-from openai import OpenAI
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+
+try:
+    from src.chunking import chunk_text, estimate_tokens, reassemble
+    from src.singleflight import SingleFlight
+    from src.resilience import CallerGroup, ResilientCaller
+    from src.model_router import AUTO, ModelRouter
+except ImportError:  # run as a script: python src/llm.py
+    from chunking import chunk_text, estimate_tokens, reassemble
+    from singleflight import SingleFlight
+    from resilience import CallerGroup, ResilientCaller
+    from model_router import AUTO, ModelRouter
 from dotenv import load_dotenv
 from requests import HTTPError
 
@@ -14,6 +32,147 @@ env_token = os.environ.get("GITHUB_TOKEN")
 endpoint = "https://models.github.ai/inference"
 model = "openai/gpt-4.1-mini"
 
+# Chooses the model per call when several candidates are configured (LLM_MODELS); see src/model_router.py.
+router = ModelRouter.from_env(model)
+
+
+def default_model():
+    """Model used when a caller does not name one: AUTO (routed) if routing is configured, else `model`."""
+    return AUTO if router.enabled else model
+
+
+def _complete(task, m, messages, temperature, api_token, sized_text):
+    """call_llm_model, routed across candidate models when `m` is AUTO."""
+    if m != AUTO:
+        return call_llm_model(m, messages, temperature=temperature, top_p=1.0, api_token=api_token)
+    return router.call(task, estimate_tokens(sized_text), lambda chosen: call_llm_model(
+        chosen, messages, temperature=temperature, top_p=1.0, api_token=api_token))
+
+
+def _stream_model(task, m, sized_text):
+    # a stream cannot switch models half way, so it just takes the router's first choice
+    return router.candidates(task, estimate_tokens(sized_text))[0] if m == AUTO else m
+
+
+# Bump when the translation prompt changes so cached translations made with the old prompt are not reused.
+PROMPT_VERSION = 2
+
+# Optional TranslationCache consulted by translate(); configured by src/main.py.
+translation_cache = None
+# Identical translate/generate calls in flight at the same time share one LLM request.
+flights = SingleFlight()
+
+
+def _credential(api_token):
+    # Shared results (single-flight and the translation cache) are keyed by this hash of the token, so callers
+    # never get a result obtained with someone else's credentials, and a caller without a token never gets one.
+    return hashlib.sha256((api_token or env_token or '').encode('utf-8')).hexdigest()[:16]
+
+
+def _flight_key(kind, m, api_token, *parts):
+    digest = hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return (kind, m, _credential(api_token), digest)
+
+
+# Optional TranslationMemory used by translate_fields() when given a note_id; configured by src/main.py.
+translation_memory = None
+
+
+class ClientManager:
+    """Reuses OpenAI clients per (endpoint, token) over one shared keep-alive connection pool.
+
+    Clients are cheap wrappers once the pool is shared, so the LRU bound only
+    keeps per-request tokens from growing the cache without limit. Evicted
+    clients are dropped, not closed, because closing would close the shared pool.
+
+    Configuration (environment):
+    - LLM_TIMEOUT: read/write timeout in seconds (default 60)
+    - LLM_CONNECT_TIMEOUT: connect timeout in seconds (default 10)
+    - LLM_POOL_MAX_CONNECTIONS: connections in the shared pool (default 20)
+    - LLM_POOL_MAX_KEEPALIVE: idle connections kept open (default 10)
+    - LLM_KEEPALIVE_EXPIRY: seconds an idle connection stays open (default 30)
+    - LLM_CLIENT_CACHE_SIZE: distinct (endpoint, token) clients kept (default 16)
+    """
+
+    def __init__(self, max_clients=16, timeout=60.0, connect_timeout=10.0,
+                 max_connections=20, max_keepalive=10, keepalive_expiry=30.0):
+        self.max_clients = max_clients
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self._http = None
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(max_clients=int(env('LLM_CLIENT_CACHE_SIZE', '16')),
+                   timeout=float(env('LLM_TIMEOUT', '60')),
+                   connect_timeout=float(env('LLM_CONNECT_TIMEOUT', '10')),
+                   max_connections=int(env('LLM_POOL_MAX_CONNECTIONS', '20')),
+                   max_keepalive=int(env('LLM_POOL_MAX_KEEPALIVE', '10')),
+                   keepalive_expiry=float(env('LLM_KEEPALIVE_EXPIRY', '30')))
+
+    def get(self, base_url, api_key):
+        # Hash the token so raw credentials are not kept around as dict keys.
+        key = (base_url, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return client
+            if self._http is None:
+                self._http = self._new_http()
+            client = self._new_client(base_url, api_key)
+            self._clients[key] = client
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def _new_http(self):
+        return DefaultHttpxClient(timeout=self.timeout, limits=self.limits)
+
+    def _new_client(self, base_url, api_key):
+        # Retries are done by `guards` (src/resilience.py), so the SDK's own are turned off.
+        return OpenAI(base_url=base_url, api_key=api_key, http_client=self._http, timeout=self.timeout,
+                      max_retries=0)
+
+    def close(self):
+        with self._lock:
+            self._clients.clear()
+            if self._http is not None:
+                self._http.close()
+                self._http = None
+
+    def stats(self):
+        return {
+            'clients': len(self._clients),
+            'max_clients': self.max_clients,
+            'created': self.created,
+            'reused': self.reused,
+            'evictions': self.evictions,
+            'pool_max_connections': self.limits.max_connections,
+            'pool_max_keepalive': self.limits.max_keepalive_connections,
+            'timeout': self.timeout.read,
+            'connect_timeout': self.timeout.connect,
+        }
+
+
+clients = ClientManager.from_env()
+
+# Deadline, retries, optional hedging and circuit breaker around every model call, kept per model so a
+# failing model only opens its own circuit. With routing on, each model gets the shorter per-candidate
+# deadline, leaving time to fall back.
+guards = CallerGroup(lambda: ResilientCaller.from_env(deadline=router.candidate_deadline if router.enabled else None))
+
 # A function to call an LLM model and return the response
 def call_llm_model(model, messages, temperature=1.0, top_p=1.0, api_token: str = None):
     """Call the configured LLM and return text. Raises RuntimeError on failures with readable message."""
@@ -22,10 +181,11 @@ def call_llm_model(model, messages, temperature=1.0, top_p=1.0, api_token: str =
         raise RuntimeError("No API token provided. Set GITHUB_TOKEN in the environment or pass --token on the command line.")
 
     try:
-        client = OpenAI(base_url=endpoint, api_key=token_to_use)
-        response = client.chat.completions.create(
+        client = clients.get(endpoint, token_to_use)
+        response = guards.get(model).call(lambda timeout: client.chat.completions.create(
             messages=messages,
-            temperature=temperature, top_p=top_p, model=model)
+            temperature=temperature, top_p=top_p, model=model,
+            timeout=min(timeout, clients.timeout.read)))
         return response.choices[0].message.content
     except HTTPError as e:
         # requests HTTPError (if wrapped)
@@ -35,64 +195,366 @@ def call_llm_model(model, messages, temperature=1.0, top_p=1.0, api_token: str =
         raise RuntimeError(f"Failed to call LLM API: {e}") from e
 
 # A function to translate to target language
-def translate(text: str, target_language: str = "English", model_name: Optional[str] = None, api_token: Optional[str] = None) -> str:
-    """Translate text to target language using the configured LLM model."""
-    m = model_name or model
-    system_prompt = "You are a helpful translator. Translate the user's text into the target language preserving meaning and tone. Reply with translated text only."
+def _parse_json_object(raw):
+    """Parse the JSON object in a model reply, tolerating code fences and surrounding prose."""
+    # Some models may wrap JSON in text; try to locate a JSON object
+    text = raw.strip()
+    # If text contains markdown or code fences, attempt to strip them
+    if text.startswith("```"):
+        # remove code fence
+        parts = text.split('\n')
+        # remove first and last line if fence closing present
+        if parts[-1].strip().startswith('```'):
+            text = '\n'.join(parts[1:-1]).strip()
+
+    # Find first { and last }
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end != -1 and end > start:
+        json_text = text[start:end+1]
+    else:
+        json_text = text
+
+    parsed = json.loads(json_text)
+    if not isinstance(parsed, dict):
+        raise ValueError('expected a JSON object')
+    return parsed
+
+
+def _translation_messages(text, target_language):
+    system_prompt = ("You are a helpful translator. Translate the user's text into the target language preserving meaning and tone. "
+                     "Keep any Markdown formatting unchanged. Reply with translated text only.")
     user_prompt = f"Translate to {target_language}:\n\n{text}"
-    
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    
-    return call_llm_model(m, messages, temperature=0.2, top_p=1.0, api_token=api_token)
 
 
-def generate_note(prompt: str, model_name: Optional[str] = None, api_token: Optional[str] = None) -> Dict[str, str]:
-    """Generate a note (title + content) from a user prompt using the configured LLM.
+def _cache_lookup(text, target_language, m, api_token):
+    """Return (key, cached translation) from the translation cache; key is None when not cacheable."""
+    cache = translation_cache
+    if cache is None or not cache.cacheable(text):
+        return None, None
+    key = cache.key(text, target_language, m, PROMPT_VERSION, _credential(api_token))
+    return key, cache.get(key)
 
-    Returns a dict: { 'title': str, 'content': str }
-    Raises RuntimeError on failure with readable message.
+
+def _cache_store(key, result, started, target_language, m):
+    cache = translation_cache
+    if cache is not None and key is not None and result:
+        cache.put(key, result, (time.perf_counter() - started) * 1000, target_language=target_language, model=m)
+
+
+def stream_llm_model(model, messages, temperature=1.0, top_p=1.0, api_token: str = None):
+    """Like call_llm_model, but yields the reply as text deltas while the model produces it."""
+    token_to_use = api_token or env_token
+    if not token_to_use:
+        raise RuntimeError("No API token provided. Set GITHUB_TOKEN in the environment or pass --token on the command line.")
+
+    try:
+        client = clients.get(endpoint, token_to_use)
+        # Retries only cover opening the stream; once tokens have been forwarded a failure is final.
+        stream = guards.get(model).call(lambda timeout: client.chat.completions.create(
+            messages=messages,
+            temperature=temperature, top_p=top_p, model=model, stream=True,
+            timeout=min(timeout, clients.timeout.read)), hedge=False)
+    except Exception as e:
+        raise RuntimeError(f"Failed to call LLM API: {e}") from e
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        raise RuntimeError(f"LLM stream interrupted: {e}") from e
+    finally:
+        stream.close()
+
+
+# Texts longer than this (estimated tokens) are translated in chunks, in parallel.
+CHUNK_TOKENS = int(os.environ.get('LLM_CHUNK_TOKENS', '800'))
+# Extra rounds for the chunks that failed; chunks that succeeded are not sent again.
+CHUNK_RETRIES = int(os.environ.get('LLM_CHUNK_RETRIES', '1'))
+# Separate from _executor: chunk tasks are submitted from tasks already running there.
+_chunk_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LLM_CHUNK_WORKERS', '4')), thread_name_prefix='llm-chunk')
+
+
+def _translate_chunked(segments, target_language, m, api_token):
+    """Translate the chunks of a chunk_text() split concurrently and reassemble them in order."""
+    pending = [i for i, segment in enumerate(segments) if segment.translate]
+    total = len(pending)
+    results = {}
+    error = None
+    for _ in range(1 + CHUNK_RETRIES):
+        futures = {i: _chunk_executor.submit(translate, segments[i].text, target_language, m, api_token)
+                   for i in pending}
+        pending = []
+        for i, future in futures.items():
+            try:
+                results[i] = future.result()
+            except RuntimeError as e:
+                pending.append(i)
+                error = e
+        if not pending:
+            return reassemble(segments, results)
+    raise RuntimeError(f"{len(pending)} of {total} chunks failed to translate: {error}")
+
+
+def _translate_uncached(text, target_language, m, api_token, key=None):
+    """Call the model for `text` (in chunks when it is long) and cache the result under `key`.
+
+    Concurrent calls for the same text, language, model and token share one request.
+    """
+    return flights.do(_flight_key('translate', m, api_token, text, target_language, PROMPT_VERSION),
+                      lambda: _translate_text(text, target_language, m, api_token, key))
+
+
+def _translate_text(text, target_language, m, api_token, key):
+    started = time.perf_counter()
+    segments = chunk_text(text, CHUNK_TOKENS) if estimate_tokens(text) > CHUNK_TOKENS else None
+    if segments is not None and sum(segment.translate for segment in segments) > 1:
+        result = _translate_chunked(segments, target_language, m, api_token)
+    else:
+        result = _complete('translate', m, _translation_messages(text, target_language), 0.2, api_token, text)
+    _cache_store(key, result, started, target_language, m)
+    return result
+
+
+# A function to translate to target language
+def translate(text: str, target_language: str = "English", model_name: Optional[str] = None, api_token: Optional[str] = None) -> str:
+    """Translate text to target language using the configured LLM model.
+
+    Texts over CHUNK_TOKENS are split on paragraph/sentence boundaries
+    (src/chunking.py) and the chunks translated concurrently.
+    """
+    m = model_name or default_model()
+    key, cached = _cache_lookup(text, target_language, m, api_token)
+    if cached is not None:
+        return cached
+    return _translate_uncached(text, target_language, m, api_token, key)
+
+
+def _translate_segment_batch(batch, target_language, m, api_token):
+    system_prompt = (
+        "You are a helpful translator. The user sends a JSON array of consecutive text segments from one document. "
+        "Translate each segment into the target language preserving meaning, tone and Markdown formatting, "
+        "using the other segments as context. Reply with a JSON array of the same length holding only the "
+        "translations, in the same order."
+    )
+    user_prompt = f"Translate to {target_language}:\n\n{json.dumps(batch, ensure_ascii=False)}"
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    raw = _complete('translate', m, messages, 0.2, api_token, user_prompt)
+    start, end = raw.find('['), raw.rfind(']')
+    try:
+        parsed = json.loads(raw[start:end + 1]) if start != -1 and end > start else None
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, list) or len(parsed) != len(batch) or not all(isinstance(t, str) for t in parsed):
+        raise RuntimeError(f"Model did not return {len(batch)} aligned segment translations")
+    return parsed
+
+
+def translate_segments(segments: List[str], target_language: str = "English", model_name: Optional[str] = None,
+                       api_token: Optional[str] = None) -> List[str]:
+    """Translate a list of segments (sentences) with as few calls as possible; the result is aligned with the input.
+
+    Segments are packed into batches under CHUNK_TOKENS; several batches run concurrently.
+    """
+    m = model_name or default_model()
+    batches, current, tokens = [], [], 0
+    for segment in segments:
+        n = estimate_tokens(segment)
+        if current and tokens + n > CHUNK_TOKENS:
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(segment)
+        tokens += n
+    if current:
+        batches.append(current)
+    if len(batches) == 1:
+        return _translate_segment_batch(batches[0], target_language, m, api_token)
+    futures = [_chunk_executor.submit(_translate_segment_batch, batch, target_language, m, api_token) for batch in batches]
+    return [text for future in futures for text in future.result()]
+
+
+def translate_stream(text: str, target_language: str = "English", model_name: Optional[str] = None,
+                     api_token: Optional[str] = None):
+    """Streaming translate(): yields text deltas; a cached translation is yielded in one piece.
+
+    The complete translation is cached only if the stream finishes.
     """
-    m = model_name or model
+    m = model_name or default_model()
+    key, cached = _cache_lookup(text, target_language, m, api_token)
+    if cached is not None:
+        yield cached
+        return
+    started = time.perf_counter()
+    parts = []
+    for delta in stream_llm_model(_stream_model('translate', m, text), _translation_messages(text, target_language),
+                                  temperature=0.2, top_p=1.0, api_token=api_token):
+        parts.append(delta)
+        yield delta
+    _cache_store(key, ''.join(parts), started, target_language, m)
+
+
+# How translate_fields spends LLM calls on a multi-field note:
+# - concurrent: one call per field, issued in parallel
+# - combined: one structured (JSON) call for all fields; fields missing from the reply are retried concurrently
+# - sequential: one call per field, one after the other
+TRANSLATE_MODES = ('concurrent', 'combined', 'sequential')
+DEFAULT_TRANSLATE_MODE = os.environ.get('LLM_TRANSLATE_MODE', 'concurrent')
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LLM_MAX_WORKERS', '8')), thread_name_prefix='llm')
+# Languages translated at once by a single translate_languages call.
+FANOUT_CONCURRENCY = int(os.environ.get('LLM_FANOUT_CONCURRENCY', '4'))
+
+
+def _combined_messages(fields, target_language):
+    system_prompt = (
+        "You are a helpful translator. The user sends a JSON object whose values are texts. "
+        "Translate every value into the target language preserving meaning, tone and formatting. "
+        "Reply with a JSON object with exactly the same keys and the translated texts as values."
+    )
+    user_prompt = f"Translate to {target_language}:\n\n{json.dumps(fields, ensure_ascii=False)}"
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    return messages
+
+
+def _combined_result(fields, raw):
+    """Pick the translated fields out of a structured reply (fields it leaves out or blanks are dropped)."""
+    parsed = _parse_json_object(raw)
+    return {name: parsed[name].strip() for name in fields if isinstance(parsed.get(name), str) and parsed[name].strip()}
+
+
+def _translate_combined(fields, target_language, m, api_token):
+    messages = _combined_messages(fields, target_language)
+    raw = _complete('translate', m, messages, 0.2, api_token, messages[-1]['content'])
+    return _combined_result(fields, raw)
+
+
+def translate_fields(fields: Dict[str, str], target_language: str = "English", model_name: Optional[str] = None,
+                     api_token: Optional[str] = None, mode: Optional[str] = None,
+                     note_id: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Translate several named texts (e.g. title and content) into one language.
+
+    Returns (translations, errors): every field ends up in exactly one of the
+    two dicts, so callers can keep the fields that succeeded. Empty texts are
+    returned as '' without calling the model.
+
+    With a `note_id` and a configured translation memory that already holds
+    sentences for this note, language and model, only sentences not
+    translated before are sent to the model (in one batched call). Otherwise
+    the fields are translated per `mode` and the result seeds the memory.
+    """
+    mode = mode or DEFAULT_TRANSLATE_MODE
+    if mode not in TRANSLATE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(TRANSLATE_MODES)}")
+    m = model_name or default_model()
+    translations, errors, pending, keys = {}, {}, {}, {}
+    for name, text in fields.items():
+        if not text:
+            translations[name] = ''
+            continue
+        keys[name], cached = _cache_lookup(text, target_language, m, api_token)
+        if cached is not None:
+            translations[name] = cached
+        else:
+            pending[name] = text
+
+    memory = translation_memory if note_id else None
+    if memory is not None and pending and memory.has_segments(note_id, target_language, m):
+        started = time.perf_counter()
+        remembered = memory.translate_fields(note_id, pending, target_language, m,
+                                             lambda batch: translate_segments(batch, target_language, m, api_token))
+        for name, result in remembered.items():
+            translations[name] = result
+            del pending[name]
+            _cache_store(keys[name], result, started, target_language, m)
+
+    fresh = dict(pending)
+
+    # Fields the structured reply does not cover fall through to per-field calls below.
+    # Long fields are left out of it so they can be chunked.
+    combinable = {name: text for name, text in pending.items() if estimate_tokens(text) <= CHUNK_TOKENS}
+    if mode == 'combined' and len(combinable) > 1:
+        started = time.perf_counter()
+        try:
+            combined = _translate_combined(combinable, target_language, m, api_token)
+        except (RuntimeError, ValueError):
+            combined = {}
+        for name, result in combined.items():
+            translations[name] = result
+            del pending[name]
+            _cache_store(keys[name], result, started, target_language, m)
+
+    def one(name):
+        return _translate_uncached(pending[name], target_language, m, api_token, keys[name])
+
+    if mode == 'sequential' or len(pending) <= 1:
+        for name in pending:
+            try:
+                translations[name] = one(name)
+            except RuntimeError as e:
+                errors[name] = str(e)
+    else:
+        futures = {name: _executor.submit(one, name) for name in pending}
+        for name, future in futures.items():
+            try:
+                translations[name] = future.result()
+            except RuntimeError as e:
+                errors[name] = str(e)
+    if memory is not None and fresh:
+        memory.remember(note_id, fresh, translations, target_language, m)
+    return translations, errors
+
+
+def translate_languages(fields: Dict[str, str], targets: List[str], model_name: Optional[str] = None,
+                        api_token: Optional[str] = None, mode: Optional[str] = None,
+                        max_concurrency: Optional[int] = None, note_id: Optional[str] = None):
+    """Translate `fields` into several languages in parallel.
+
+    Yields (target, translations, errors) per language in completion order.
+    At most `max_concurrency` languages are in flight; each runs
+    translate_fields, whose own per-field calls go to the shared pool.
+    """
+    workers = max(1, min(max_concurrency or FANOUT_CONCURRENCY, len(targets)))
+    # A pool per call rather than the shared one: language tasks block on field tasks in the shared pool.
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-fanout')
+    try:
+        futures = {pool.submit(translate_fields, fields, target, model_name, api_token, mode, note_id): target
+                   for target in targets}
+        for future in as_completed(futures):
+            translations, errors = future.result()
+            yield futures[future], translations, errors
+    finally:
+        # If the consumer stops early (client went away) do not start the languages still queued.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _generate_messages(prompt):
     system_prompt = (
         "You are a helpful assistant that writes short notes. "
         "Given a user prompt, produce a concise title (one line) and a content body. "
         "Respond in JSON with keys 'title' and 'content' only."
     )
 
-    user_prompt = f"Generate a note for the following request:\n\n{prompt}\n\nRespond with valid JSON: { '{"title":"...","content":"..."}' }"
+    user_prompt = f'Generate a note for the following request:\n\n{prompt}\n\nRespond with valid JSON: {{"title":"...","content":"..."}}'
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
 
-    raw = call_llm_model(m, messages, temperature=0.8, top_p=1.0, api_token=api_token)
 
-    # Try to parse JSON from model output
-    import json
+def parse_generated_note(raw: str) -> Dict[str, str]:
+    """Turn a generate_note model reply into { 'title', 'content' }; raises RuntimeError if it is not JSON."""
     try:
-        # Some models may wrap JSON in text; try to locate a JSON object
-        text = raw.strip()
-        # If text contains markdown or code fences, attempt to strip them
-        if text.startswith("```"):
-            # remove code fence
-            parts = text.split('\n')
-            # remove first and last line if fence closing present
-            if parts[-1].strip().startswith('```'):
-                text = '\n'.join(parts[1:-1]).strip()
-
-        # Find first { and last }
-        start = text.find('{')
-        end = text.rfind('}')
-        if start != -1 and end != -1 and end > start:
-            json_text = text[start:end+1]
-        else:
-            json_text = text
-
-        parsed = json.loads(json_text)
+        parsed = _parse_json_object(raw)
         title = parsed.get('title') or parsed.get('Title') or ''
         content = parsed.get('content') or parsed.get('Content') or ''
         if not title and content:
@@ -104,6 +566,27 @@ def generate_note(prompt: str, model_name: Optional[str] = None, api_token: Opti
     except Exception as e:
         raise RuntimeError(f"Failed to parse LLM output as JSON: {e}. Raw output: {raw}")
 
+
+def generate_note(prompt: str, model_name: Optional[str] = None, api_token: Optional[str] = None) -> Dict[str, str]:
+    """Generate a note (title + content) from a user prompt using the configured LLM.
+
+    Returns a dict: { 'title': str, 'content': str }
+    Raises RuntimeError on failure with readable message.
+    """
+    m = model_name or default_model()
+    # Identical concurrent prompts (e.g. a client retrying after a timeout) share one generation.
+    raw = flights.do(_flight_key('generate', m, api_token, prompt),
+                     lambda: _complete('generate', m, _generate_messages(prompt), 0.8, api_token, prompt))
+    return parse_generated_note(raw)
+
+
+def generate_note_stream(prompt: str, model_name: Optional[str] = None, api_token: Optional[str] = None):
+    """Streaming generate_note(): yields raw reply deltas; the caller parses them (see src/jsonstream.py)."""
+    m = model_name or default_model()
+    return stream_llm_model(_stream_model('generate', m, prompt), _generate_messages(prompt),
+                            temperature=0.8, top_p=1.0, api_token=api_token)
+
+
 # Run the main function if this script is executed
 def _parse_args():
     parser = argparse.ArgumentParser(description="Translate text using configured LLM")
@@ -0,0 +1,169 @@
+"""Async counterparts of the src/llm.py calls, used by the ASGI app (src/asgi.py).
+
+Prompts, reply parsing, the translation cache, chunking, model routing and
+the per-model retry/circuit-breaker policy (`llm.guards`) are shared with src/llm.py.
+Only the transport is different. Calls go through AsyncOpenAI clients over
+one shared httpx.AsyncClient pool and are awaited on the event loop, so a
+slow model call does not hold a thread.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src import llm
+from src.chunking import chunk_text, estimate_tokens, reassemble
+from src.model_router import AUTO
+
+
+class AsyncClientManager(llm.ClientManager):
+    """ClientManager handing out AsyncOpenAI clients over a shared httpx.AsyncClient."""
+
+    def _new_http(self):
+        return DefaultAsyncHttpxClient(timeout=self.timeout, limits=self.limits)
+
+    def _new_client(self, base_url, api_key):
+        return AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=self._http, timeout=self.timeout,
+                           max_retries=0)
+
+    async def aclose(self):
+        with self._lock:
+            self._clients.clear()
+            http, self._http = self._http, None
+        if http is not None:
+            await http.aclose()
+
+
+clients = AsyncClientManager.from_env()
+
+
+async def call_llm_model(model, messages, temperature=1.0, top_p=1.0, api_token: str = None):
+    """Async call_llm_model: returns the reply text, raises RuntimeError on failures."""
+    token_to_use = api_token or llm.env_token
+    if not token_to_use:
+        raise RuntimeError("No API token provided. Set GITHUB_TOKEN in the environment or pass --token on the command line.")
+
+    try:
+        client = clients.get(llm.endpoint, token_to_use)
+        response = await llm.guards.get(model).call_async(lambda timeout: client.chat.completions.create(
+            messages=messages,
+            temperature=temperature, top_p=top_p, model=model,
+            timeout=min(timeout, clients.timeout.read)))
+        return response.choices[0].message.content
+    except Exception as e:
+        raise RuntimeError(f"Failed to call LLM API: {e}") from e
+
+
+async def _complete(task, m, messages, temperature, api_token, sized_text):
+    if m != AUTO:
+        return await call_llm_model(m, messages, temperature=temperature, top_p=1.0, api_token=api_token)
+    return await llm.router.call_async(task, estimate_tokens(sized_text), lambda chosen: call_llm_model(
+        chosen, messages, temperature=temperature, top_p=1.0, api_token=api_token))
+
+
+async def _translate_chunked(segments, target_language, m, api_token):
+    pending = [i for i, segment in enumerate(segments) if segment.translate]
+    total = len(pending)
+    results = {}
+    error = None
+    for _ in range(1 + llm.CHUNK_RETRIES):
+        outcomes = await asyncio.gather(*(translate(segments[i].text, target_language, m, api_token) for i in pending),
+                                        return_exceptions=True)
+        failed = []
+        for i, outcome in zip(pending, outcomes):
+            if isinstance(outcome, RuntimeError):
+                failed.append(i)
+                error = outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[i] = outcome
+        pending = failed
+        if not pending:
+            return reassemble(segments, results)
+    raise RuntimeError(f"{len(pending)} of {total} chunks failed to translate: {error}")
+
+
+async def translate(text, target_language="English", model_name=None, api_token=None):
+    """Async translate(): cached, chunked and routed like the sync version."""
+    m = model_name or llm.default_model()
+    key, cached = llm._cache_lookup(text, target_language, m, api_token)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    segments = chunk_text(text, llm.CHUNK_TOKENS) if estimate_tokens(text) > llm.CHUNK_TOKENS else None
+    if segments and sum(1 for s in segments if s.translate) > 1:
+        result = await _translate_chunked(segments, target_language, m, api_token)
+    else:
+        result = await _complete('translate', m, llm._translation_messages(text, target_language), 0.2, api_token,
+                                 text)
+    llm._cache_store(key, result, started, target_language, m)
+    return result
+
+
+async def translate_fields(fields: Dict[str, str], target_language: str = "English", model_name: Optional[str] = None,
+                           api_token: Optional[str] = None, mode: Optional[str] = None):
+    """Async translate_fields(): returns (translations, errors). The translation memory is not used."""
+    mode = mode or llm.DEFAULT_TRANSLATE_MODE
+    if mode not in llm.TRANSLATE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(llm.TRANSLATE_MODES)}")
+    m = model_name or llm.default_model()
+    translations, errors, pending = {}, {}, {}
+    for name, text in fields.items():
+        if not text:
+            translations[name] = ''
+            continue
+        key, cached = llm._cache_lookup(text, target_language, m, api_token)
+        if cached is not None:
+            translations[name] = cached
+        else:
+            pending[name] = text
+
+    combinable = {name: text for name, text in pending.items() if estimate_tokens(text) <= llm.CHUNK_TOKENS}
+    if mode == 'combined' and len(combinable) > 1:
+        messages = llm._combined_messages(combinable, target_language)
+        try:
+            combined = llm._combined_result(combinable, await _complete('translate', m, messages, 0.2, api_token,
+                                                                        messages[-1]['content']))
+        except (RuntimeError, ValueError):
+            combined = {}
+        for name, result in combined.items():
+            translations[name] = result
+            del pending[name]
+
+    async def one(name):
+        try:
+            translations[name] = await translate(pending[name], target_language, m, api_token)
+        except RuntimeError as e:
+            errors[name] = str(e)
+
+    if mode == 'sequential':
+        for name in pending:
+            await one(name)
+    else:
+        await asyncio.gather(*(one(name) for name in pending))
+    return translations, errors
+
+
+async def translate_languages(fields: Dict[str, str], targets: List[str], model_name: Optional[str] = None,
+                              api_token: Optional[str] = None, mode: Optional[str] = None,
+                              max_concurrency: Optional[int] = None):
+    """Translate `fields` into several languages, at most `max_concurrency` at once.
+
+    Returns [(target, translations, errors)] in the order of `targets`.
+    """
+    limit = asyncio.Semaphore(max(1, max_concurrency or llm.FANOUT_CONCURRENCY))
+
+    async def one(target):
+        async with limit:
+            return (target,) + await translate_fields(fields, target, model_name, api_token, mode)
+
+    return await asyncio.gather(*(one(target) for target in targets))
+
+
+async def generate_note(prompt: str, model_name: Optional[str] = None, api_token: Optional[str] = None):
+    """Async generate_note(): returns {'title': ..., 'content': ...}."""
+    m = model_name or llm.default_model()
+    raw = await _complete('generate', m, llm._generate_messages(prompt), 0.8, api_token, prompt)
+    return llm.parse_generated_note(raw)
@@ -13,11 +13,17 @@ if os.path.exists(env_path):
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
 from pymongo import MongoClient
+from src.json_provider import FastJSONProvider
+from src import metrics, mongo_settings
 
 # Initialize Flask
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+# Encode ObjectId/datetime natively (orjson when installed) instead of per-field str()/isoformat()
+app.json_provider_class = FastJSONProvider
+app.json = FastJSONProvider(app)
+
 # Enable CORS for all routes
 CORS(app)
 
@@ -36,10 +42,14 @@ db = None
 if MONGO_URI:
     try:
         print(f"[MongoDB] Creating MongoDB client...")
-        # Don't connect immediately - let pymongo connect lazily on first operation
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, connectTimeoutMS=10000)
+        # pymongo connects lazily; the warm-up below (MONGO_WARMUP) connects before the first request needs it.
+        # Pool size, compression, concerns and timeouts come from MONGO_* variables (src/mongo_settings.py)
+        mongo_options = mongo_settings.client_options()
+        client = MongoClient(MONGO_URI, **mongo_options)
         db = client[MONGO_DB_NAME]
         print(f"[MongoDB] ✓ Client created (will connect on first use)")
+        mongo_settings.start_warm_up(client)
+        metrics.register('mongo', lambda: mongo_settings.stats(options=mongo_options))
     except Exception as e:
         print(f"[MongoDB] ✗ Client creation failed: {e}")
         db = None
@@ -82,12 +92,50 @@ def health_check():
     
     return jsonify(status), 200
 
+# Counters from the caches and other subsystems that register with src.metrics
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify(metrics.snapshot())
+
 # register blueprints (import after db is configured to avoid circular imports)
 from src.routes.user import user_bp
 from src.routes.note import note_bp
+from src.routes.job import job_bp
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(note_bp, url_prefix='/api')
+app.register_blueprint(job_bp, url_prefix='/api')
+
+# Pooled LLM clients (see src/llm.py ClientManager)
+from src import llm
+metrics.register('llm_clients', llm.clients.stats)
+metrics.register('llm_singleflight', llm.flights.stats)
+metrics.register('llm_resilience', llm.guards.stats)
+metrics.register('llm_router', llm.router.stats)
+
+# Rate and concurrency limits for the LLM routes (see src/admission.py)
+from src import admission
+metrics.register('llm_admission', admission.controller.stats)
+
+# Content-addressed translation cache: in-process LRU in front of the translation_cache collection
+if os.environ.get('TRANSLATION_CACHE', 'on').lower() not in ('off', 'none', '0'):
+    from src.translation_cache import TranslationCache
+    llm.translation_cache = TranslationCache.from_env(db['translation_cache'] if db is not None else None)
+    metrics.register('translation_cache', llm.translation_cache.stats)
+
+# Sentence-level translation memory: re-translating an edited note only sends the changed sentences
+if db is not None and os.environ.get('TRANSLATION_MEMORY', 'on').lower() not in ('off', 'none', '0'):
+    from src.translation_memory import TranslationMemory
+    llm.translation_memory = TranslationMemory.from_env(db['translation_memory'])
+    metrics.register('translation_memory', llm.translation_memory.stats)
+
+# Background job workers for async translate/generate (run `python -m src.jobs` instead with JOB_WORKERS=0).
+# No threads by default on Vercel: serverless functions are frozen between requests, so they would not finish jobs there.
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '0' if os.environ.get('VERCEL') else '2'))
+if db is not None and JOB_WORKERS > 0:
+    from src.jobs import JobWorker
+    job_worker = JobWorker(app, threads=JOB_WORKERS).start()
+    metrics.register('jobs', job_worker.stats)
 
 # Only serve static files when running locally (not on Vercel)
 # On Vercel, static files are served from public/ directory
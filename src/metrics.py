@@ -0,0 +1,23 @@
+"""Registry of subsystem statistics served by GET /api/stats."""
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def register(name, provider):
+    """Expose `provider()` (returning a JSON-serializable dict) under `name`."""
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot():
+    with _lock:
+        providers = dict(_providers)
+    out = {}
+    for name, provider in providers.items():
+        try:
+            out[name] = provider()
+        except Exception as e:
+            out[name] = {'error': str(e)}
+    return out
@@ -0,0 +1,193 @@
+"""Pick the model for each LLM call from observed latency and errors, with fallback.
+
+Candidates are configured per task. Short inputs (titles, single
+sentences) go to the candidate with the lowest rolling p50. Longer inputs
+keep the configured order, which lists the preferred model first. A model
+whose p95 or error rate is over the limit moves to the end of the list.
+A call that fails upstream (5xx, 429, timeouts, an open circuit) falls
+through to the next candidate; client errors such as a missing or rejected
+token are raised at once and say nothing about the model's health.
+Observations older than the window are forgotten, so a demoted model gets
+another chance.
+
+Configuration (environment):
+- LLM_MODELS: comma-separated candidates (default: just llm.model, which disables routing)
+- LLM_MODELS_TRANSLATE / LLM_MODELS_GENERATE: per-task candidates (default LLM_MODELS)
+- LLM_ROUTER_SHORT_TOKENS: inputs up to this many estimated tokens count as short (default 200)
+- LLM_ROUTER_MAX_P95_SECONDS: slower models are demoted (default 20)
+- LLM_ROUTER_MAX_ERROR_RATE: more failing models are demoted (default 0.5)
+- LLM_ROUTER_WINDOW_SECONDS: how long observations count (default 300)
+- LLM_ROUTER_CANDIDATE_DEADLINE_SECONDS: deadline of each candidate's calls, retries included, so
+  a failing model leaves time for the next one (default 30)
+"""
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    from src.resilience import CircuitOpenError, causes, is_upstream_failure
+except ImportError:  # run as a script: python src/llm.py
+    from resilience import CircuitOpenError, causes, is_upstream_failure
+
+# Model name meaning "let the router choose".
+AUTO = 'auto'
+
+# Observations needed before a model can be judged slow or failing.
+MIN_SAMPLES = 5
+
+
+class ModelStats:
+    """Rolling (time-bounded) latency and error record for one model."""
+
+    def __init__(self, window_seconds=300, max_samples=500):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)  # (at, seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, ok))
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def summary(self):
+        samples = self._recent()
+        latencies = sorted(seconds for _, seconds, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else None
+
+        return {
+            'calls': len(samples),
+            'error_rate': round(errors / len(samples), 4) if samples else None,
+            'p50': pct(50),
+            'p95': pct(95),
+        }
+
+
+class ModelRouter:
+    def __init__(self, models, task_models=None, short_tokens=200, max_p95=20.0, max_error_rate=0.5,
+                 window_seconds=300, candidate_deadline=30.0):
+        self.models = list(models)
+        self.task_models = {task: list(m) for task, m in (task_models or {}).items() if m}
+        self.short_tokens = short_tokens
+        self.max_p95 = max_p95
+        self.max_error_rate = max_error_rate
+        self.stats_by_model = {}
+        self.window_seconds = window_seconds
+        self.candidate_deadline = candidate_deadline
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, default_model):
+        def models(name, default):
+            raw = os.environ.get(name)
+            return [m.strip() for m in raw.split(',') if m.strip()] if raw else default
+
+        base = models('LLM_MODELS', [default_model])
+        env = os.environ.get
+        return cls(base,
+                   task_models={'translate': models('LLM_MODELS_TRANSLATE', None),
+                                'generate': models('LLM_MODELS_GENERATE', None)},
+                   short_tokens=int(env('LLM_ROUTER_SHORT_TOKENS', '200')),
+                   max_p95=float(env('LLM_ROUTER_MAX_P95_SECONDS', '20')),
+                   max_error_rate=float(env('LLM_ROUTER_MAX_ERROR_RATE', '0.5')),
+                   window_seconds=float(env('LLM_ROUTER_WINDOW_SECONDS', '300')),
+                   candidate_deadline=float(env('LLM_ROUTER_CANDIDATE_DEADLINE_SECONDS', '30')))
+
+    @property
+    def enabled(self):
+        """Routing only matters with more than one candidate for some task."""
+        return len(self.models) > 1 or any(len(m) > 1 for m in self.task_models.values())
+
+    def _stats(self, model):
+        with self._lock:
+            stats = self.stats_by_model.get(model)
+            if stats is None:
+                stats = self.stats_by_model[model] = ModelStats(self.window_seconds)
+            return stats
+
+    def healthy(self, summary):
+        if summary['calls'] < MIN_SAMPLES:
+            return True
+        if summary['error_rate'] > self.max_error_rate:
+            return False
+        return summary['p95'] is None or summary['p95'] <= self.max_p95
+
+    def candidates(self, task, input_tokens):
+        """Models to try for this call, best first."""
+        models = self.task_models.get(task) or self.models
+        summaries = {m: self._stats(m).summary() for m in models}
+        healthy = [m for m in models if self.healthy(summaries[m])]
+        if input_tokens <= self.short_tokens:
+            # unmeasured models sort first so they get measured
+            healthy.sort(key=lambda m: summaries[m]['p50'] or 0.0)
+        demoted = sorted((m for m in models if m not in healthy), key=lambda m: summaries[m]['error_rate'] or 0.0)
+        return healthy + demoted
+
+    def _failed(self, model, seconds, error):
+        """Record a failed call; re-raises `error` unless another candidate could do better."""
+        if any(isinstance(e, CircuitOpenError) for e in causes(error)):
+            return  # already counted when the model's calls were failing
+        if not is_upstream_failure(error):
+            raise error
+        self._stats(model).record(seconds, False)
+
+    def call(self, task, input_tokens, fn):
+        """Run fn(model) on the best candidate, falling back to the next one when the model fails upstream."""
+        error = None
+        for i, model in enumerate(self.candidates(task, input_tokens)):
+            if i:
+                with self._lock:
+                    self.fallbacks += 1
+            started = time.monotonic()
+            try:
+                result = fn(model)
+            except RuntimeError as e:
+                self._failed(model, time.monotonic() - started, e)
+                error = e
+                continue
+            self._stats(model).record(time.monotonic() - started, True)
+            return result
+        raise error
+
+    async def call_async(self, task, input_tokens, fn):
+        """`call` for a coroutine function: awaits fn(model) on each candidate in turn."""
+        error = None
+        for i, model in enumerate(self.candidates(task, input_tokens)):
+            if i:
+                with self._lock:
+                    self.fallbacks += 1
+            started = time.monotonic()
+            try:
+                result = await fn(model)
+            except RuntimeError as e:
+                self._failed(model, time.monotonic() - started, e)
+                error = e
+                continue
+            self._stats(model).record(time.monotonic() - started, True)
+            return result
+        raise error
+
+    def stats(self):
+        with self._lock:
+            models = dict(self.stats_by_model)
+        out = {}
+        for name, stats in models.items():
+            summary = stats.summary()
+            out[name] = {
+                'calls': summary['calls'],
+                'error_rate': summary['error_rate'],
+                'p50_ms': round(summary['p50'] * 1000, 1) if summary['p50'] is not None else None,
+                'p95_ms': round(summary['p95'] * 1000, 1) if summary['p95'] is not None else None,
+                'healthy': self.healthy(summary),
+            }
+        return {'enabled': self.enabled, 'fallbacks': self.fallbacks, 'models': out}
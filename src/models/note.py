@@ -1,26 +1,224 @@
 from datetime import datetime
+import hashlib
 from bson import ObjectId
+import os
 
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 
-def doc_to_dict(doc):
-    if not doc:
-        return None
+
+# Indexes the note routes rely on; created once per process by ensure_note_indexes.
+NOTE_INDEXES = [
+    # keyset pagination for GET /api/notes: sort on (updated_at, _id) descending
+    ([('updated_at', DESCENDING), ('_id', DESCENDING)], {'name': 'updated_at_id_desc'}),
+    # delta sync: GET /api/notes/changes scans change_seq ascending
+    ([('change_seq', ASCENDING)], {'name': 'change_seq'}),
+    # tombstones are purged once every client has had time to sync them
+    ([('deleted_at', ASCENDING)], {
+        'name': 'tombstone_ttl',
+        'expireAfterSeconds': int(float(os.environ.get('TOMBSTONE_TTL_DAYS', '30')) * 86400),
+    }),
+]
+
+# Deleted notes stay behind as tombstones for delta sync; every read of live
+# notes must exclude them.
+LIVE = {'deleted': {'$ne': True}}
+
+
+def live(query):
+    """Restrict a notes query to live (non-tombstone) documents."""
+    return {**query, **LIVE}
+
+
+def tombstone_update(change_seq):
+    """Update turning a note into a tombstone: drop its payload, keep id and change_seq."""
+    now = datetime.utcnow()
     return {
-        'id': str(doc.get('_id')),
-        'title': doc.get('title', ''),
-        'content': doc.get('content', ''),
-        'created_at': doc.get('created_at').isoformat() if doc.get('created_at') else None,
-        'updated_at': doc.get('updated_at').isoformat() if doc.get('updated_at') else None,
-        'translations': doc.get('translations', {})
+        '$set': {'deleted': True, 'deleted_at': now, 'updated_at': now, 'change_seq': change_seq},
+        '$unset': {'title': '', 'content': '', 'snippet': '', 'translations': ''},
+        '$inc': {'version': 1},
     }
 
 
+def ensure_note_indexes(coll):
+    """Create the note indexes (idempotent; Mongo ignores existing identical indexes)."""
+    for keys, options in NOTE_INDEXES:
+        coll.create_index(keys, **options)
+
+
+SNIPPET_LENGTH = 160
+
+# API field name -> Mongo document field
+NOTE_FIELDS = {
+    'id': '_id',
+    'title': 'title',
+    'content': 'content',
+    'snippet': 'snippet',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'translations': 'translations',
+    'version': 'version',
+}
+
+_FIELD_DEFAULTS = {'title': '', 'content': '', 'translations': {}, 'version': 0}
+
+# Compact list view used by the sidebar: no content or translations.
+SUMMARY_FIELDS = ('id', 'title', 'snippet', 'created_at', 'updated_at')
+
+
+def make_snippet(content, length=SNIPPET_LENGTH):
+    """Whitespace-collapsed preview of `content`, cut at a word boundary."""
+    text = ' '.join((content or '').split())
+    if len(text) <= length:
+        return text
+    cut = text.rfind(' ', 0, length)
+    return text[:cut if cut > length // 2 else length].rstrip() + '…'
+
+
+def parse_fields(fields=None, view=None):
+    """Resolve the `fields=` / `view=` query args to a tuple of API field names.
+
+    Returns None for the full representation. Raises ValueError on unknown names.
+    """
+    if fields:
+        names = tuple(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+        unknown = [n for n in names if n not in NOTE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return ('id',) + tuple(n for n in names if n != 'id')
+    if view == 'summary':
+        return SUMMARY_FIELDS
+    if view not in (None, '', 'full'):
+        raise ValueError("view must be 'summary' or 'full'")
+    return None
+
+
+def note_projection(fields):
+    """Mongo projection for the given API fields (None means every field).
+
+    `updated_at` is always fetched because list pagination keys on it. Notes
+    written before snippets existed have none until
+    scripts/backfill_notes.py has been run.
+    """
+    if fields is None:
+        return None
+    projection = {NOTE_FIELDS[f]: 1 for f in fields}
+    projection['updated_at'] = 1
+    return projection
+
+
+def note_etag(doc):
+    """Strong validator for a single note: changes whenever its version is bumped."""
+    return f"{doc.get('_id')}-{doc.get('version', 0)}"
+
+
+def etag_version(etags, note_id):
+    """Pick the version this note's tag carries out of an If-Match header, or None."""
+    prefix = f'{note_id}-'
+    for tag in etags.as_set():
+        if tag.startswith(prefix) and tag[len(prefix):].isdigit():
+            return int(tag[len(prefix):])
+    return None
+
+
+def version_filter(version):
+    """Match a note whose version is `version` (notes older than versioning count as 0)."""
+    return {'version': {'$in': [0, None]}} if version == 0 else {'version': version}
+
+
+def version_matches(query, doc):
+    """True when `doc` passes the version condition (if any) of a write filter built with version_filter."""
+    return 'version' not in query or query['version'] == version_filter(doc.get('version', 0))['version']
+
+
+# Collection-level change watermark used to validate cached note lists without
+# reading any notes, and as the sequence behind delta-sync tokens. A write
+# bumps it twice: once beforehand to get the `change_seq` it stamps on the
+# note, and once after it lands so no list cached in between stays valid.
+WATERMARK_ID = 'notes'
+
+
+def bump_watermark(db, by=1):
+    """Advance the watermark by `by` and return its new value (the last sequence number reserved)."""
+    doc = db.counters.find_one_and_update({'_id': WATERMARK_ID}, {'$inc': {'seq': by}},
+                                          upsert=True, return_document=ReturnDocument.AFTER)
+    return doc['seq']
+
+
+def read_watermark(db):
+    doc = db.counters.find_one({'_id': WATERMARK_ID})
+    return doc['seq'] if doc else 0
+
+
+def doc_to_dict(doc, fields=None):
+    if not doc:
+        return None
+    # ObjectId and datetime values are passed through untouched; the app's
+    # JSON provider (src/json_provider.py) encodes them natively.
+    if fields is None:
+        return {
+            'id': doc.get('_id'),
+            'title': doc.get('title', ''),
+            'content': doc.get('content', ''),
+            'snippet': doc['snippet'] if 'snippet' in doc else make_snippet(doc.get('content')),
+            'created_at': doc.get('created_at'),
+            'updated_at': doc.get('updated_at'),
+            'translations': doc.get('translations', {}),
+            'version': doc.get('version', 0)
+        }
+    out = {}
+    for f in fields:
+        if f == 'snippet' and 'snippet' not in doc:
+            out[f] = make_snippet(doc.get('content'))
+        else:
+            out[f] = doc.get(NOTE_FIELDS[f], _FIELD_DEFAULTS.get(f))
+    return out
+
+
+def content_hash(content):
+    """Digest of a note's content, used to detect no-op saves without comparing full bodies."""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def note_update_fields(data):
+    """Translate a client update payload into a `$set` document (empty if nothing is updatable)."""
+    update = {}
+    if 'title' in data:
+        update['title'] = data['title']
+    if 'content' in data:
+        update['content'] = data['content']
+        update['snippet'] = make_snippet(data['content'])
+        update['content_hash'] = content_hash(data['content'])
+    if 'translations' in data and isinstance(data['translations'], dict):
+        # set individual translation keys under translations map
+        for k, v in data['translations'].items():
+            update[f'translations.{k}'] = v
+    return update
+
+
+def is_noop_update(doc, update):
+    """True when applying the `$set` document `update` would leave `doc` unchanged."""
+    for key, value in update.items():
+        if key in ('content', 'snippet'):
+            continue  # covered by content_hash
+        if key == 'content_hash':
+            current = doc.get('content_hash') or content_hash(doc.get('content'))
+        elif key.startswith('translations.'):
+            current = doc.get('translations', {}).get(key.split('.', 1)[1])
+        else:
+            current = doc.get(key)
+        if current != value:
+            return False
+    return True
+
+
 def make_note_doc(title, content):
     now = datetime.utcnow()
     return {
         'title': title,
         'content': content,
+        'snippet': make_snippet(content),
+        'content_hash': content_hash(content),
+        'version': 1,
         'created_at': now,
         'updated_at': now
     }
-
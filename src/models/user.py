@@ -5,7 +5,7 @@ def user_doc_to_dict(doc):
     if not doc:
         return None
     return {
-        'id': str(doc.get('_id')),
+        'id': doc.get('_id'),
         'username': doc.get('username'),
         'email': doc.get('email')
     }
@@ -0,0 +1,159 @@
+"""MongoClient options and connection warm-up, configured from the environment.
+
+`client_options()` returns keyword arguments for MongoClient (and motor's
+AsyncIOMotorClient). Unset variables keep the driver defaults, except for
+the two timeouts src/main.py always set. `start_warm_up(client)` opens
+connections before the first request needs them: server selection, the TLS
+handshake and authentication then happen at startup instead of inside the
+first request after a cold start.
+
+Configuration (environment):
+- MONGO_MIN_POOL_SIZE / MONGO_MAX_POOL_SIZE: connections kept open / allowed per server
+  (driver defaults 0 / 100); with a minimum the driver refills the pool in the background
+- MONGO_MAX_IDLE_TIME_MS: close connections idle for longer than this
+- MONGO_WAIT_QUEUE_TIMEOUT_MS: how long an operation waits for a free connection
+- MONGO_COMPRESSORS: wire compression in order of preference, from `zstd`, `snappy` and `zlib`.
+  Compressors whose Python package is not installed (zstandard, python-snappy) are skipped,
+  and the server picks the first one it also supports. The default is `zstd,snappy`, so
+  compression is off unless one of those packages is installed; zlib needs no package and is
+  only used when listed. `none` disables compression
+- MONGO_ZLIB_LEVEL: zlib compression level (-1..9)
+- MONGO_READ_PREFERENCE: primary (default), primaryPreferred, secondary, secondaryPreferred or
+  nearest. Reads from secondaries may not see the caller's latest write (ETags, version checks)
+- MONGO_READ_CONCERN: e.g. `local` or `majority`
+- MONGO_WRITE_CONCERN: `w` value, e.g. `majority` or `1`; MONGO_WRITE_TIMEOUT_MS and
+  MONGO_JOURNAL (`on`/`off`) go with it
+- MONGO_TIMEOUT_MS: client-side operation timeout; the driver also sends it as maxTimeMS, so
+  the server stops work nobody is waiting for
+- MONGO_SERVER_SELECTION_TIMEOUT_MS (default 5000) and MONGO_CONNECT_TIMEOUT_MS (default 10000)
+- MONGO_APP_NAME: shown in server logs and currentOp (default `notetaker`)
+- MONGO_WARMUP: `background` (default) warms up on a thread, `eager` before the app starts
+  serving, `off` not at all
+- MONGO_WARMUP_CONNECTIONS: connections opened by the warm-up (default: the minimum pool size, at least 1)
+"""
+import importlib.util
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# compressor -> Python package pymongo needs for it (None: built in)
+COMPRESSOR_PACKAGES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': None}
+DEFAULT_COMPRESSORS = 'zstd,snappy'
+
+READ_PREFERENCES = ('primary', 'primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest')
+
+WARMUP_MODES = ('off', 'eager', 'background')
+
+
+def available_compressors(names):
+    """Keep the compressors pymongo can use here, in the given order."""
+    out = []
+    for name in names:
+        if name not in COMPRESSOR_PACKAGES:
+            raise ValueError(f"Unknown compressor {name!r}; use {', '.join(COMPRESSOR_PACKAGES)}")
+        package = COMPRESSOR_PACKAGES[name]
+        if package is None or importlib.util.find_spec(package) is not None:
+            out.append(name)
+    return out
+
+
+def _int(env, name):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else None
+
+
+def client_options(env=None):
+    """MongoClient keyword arguments from the environment (or the `env` mapping)."""
+    env = os.environ if env is None else env
+    options = {
+        'serverSelectionTimeoutMS': _int(env, 'MONGO_SERVER_SELECTION_TIMEOUT_MS') or 5000,
+        'connectTimeoutMS': _int(env, 'MONGO_CONNECT_TIMEOUT_MS') or 10000,
+        'appname': env.get('MONGO_APP_NAME', 'notetaker'),
+    }
+    for name, option in (('MONGO_MIN_POOL_SIZE', 'minPoolSize'), ('MONGO_MAX_POOL_SIZE', 'maxPoolSize'),
+                         ('MONGO_MAX_IDLE_TIME_MS', 'maxIdleTimeMS'),
+                         ('MONGO_WAIT_QUEUE_TIMEOUT_MS', 'waitQueueTimeoutMS'),
+                         ('MONGO_TIMEOUT_MS', 'timeoutMS'), ('MONGO_ZLIB_LEVEL', 'zlibCompressionLevel')):
+        value = _int(env, name)
+        if value is not None:
+            options[option] = value
+
+    requested = env.get('MONGO_COMPRESSORS', DEFAULT_COMPRESSORS)
+    if requested.lower() != 'none':
+        compressors = available_compressors([c.strip() for c in requested.split(',') if c.strip()])
+        if compressors:
+            options['compressors'] = ','.join(compressors)
+
+    read_preference = env.get('MONGO_READ_PREFERENCE')
+    if read_preference:
+        if read_preference not in READ_PREFERENCES:
+            raise ValueError(f"MONGO_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+        options['readPreference'] = read_preference
+    if env.get('MONGO_READ_CONCERN'):
+        options['readConcernLevel'] = env['MONGO_READ_CONCERN']
+    w = env.get('MONGO_WRITE_CONCERN')
+    if w:
+        options['w'] = int(w) if w.isdigit() else w
+    if _int(env, 'MONGO_WRITE_TIMEOUT_MS') is not None:
+        options['wTimeoutMS'] = _int(env, 'MONGO_WRITE_TIMEOUT_MS')
+    if env.get('MONGO_JOURNAL'):
+        options['journal'] = env['MONGO_JOURNAL'].lower() in ('1', 'on', 'true', 'yes')
+    return options
+
+
+# Outcome of the last warm-up, served under `mongo` by GET /api/stats.
+warmup_state = {'mode': 'off', 'status': 'not_started'}
+
+
+def warm_up(client, connections=1):
+    """Select a server and open `connections` pooled connections by pinging on that many threads at once."""
+    started = time.perf_counter()
+    client.admin.command('ping')
+    if connections > 1:
+        # concurrent pings each need their own connection, so the pool grows to `connections`
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            list(pool.map(lambda _: client.admin.command('ping'), range(connections)))
+    return time.perf_counter() - started
+
+
+def start_warm_up(client, mode=None, connections=None, env=None):
+    """Warm `client` up according to MONGO_WARMUP; never raises (a failed warm-up only costs the first request)."""
+    env = os.environ if env is None else env
+    mode = mode or env.get('MONGO_WARMUP', 'background').lower()
+    if mode not in WARMUP_MODES:
+        logger.warning('[MongoDB] MONGO_WARMUP=%s is not one of %s; warming up in the background',
+                       mode, ', '.join(WARMUP_MODES))
+        mode = 'background'
+    if connections is None:
+        connections = max(1, _int(env, 'MONGO_WARMUP_CONNECTIONS') or _int(env, 'MONGO_MIN_POOL_SIZE') or 1)
+    warmup_state.clear()
+    warmup_state.update(mode=mode, status='off' if mode == 'off' else 'running', connections=connections)
+    if mode == 'off':
+        return None
+
+    def run():
+        try:
+            seconds = warm_up(client, connections)
+            warmup_state.update(status='done', seconds=round(seconds, 3))
+            logger.info('[MongoDB] warmed up %s connection(s) in %.0f ms', connections, seconds * 1000)
+        except Exception as e:
+            warmup_state.update(status='failed', error=str(e))
+            logger.warning('[MongoDB] warm-up failed: %s', e)
+
+    if mode == 'eager':
+        run()
+        return None
+    thread = threading.Thread(target=run, name='mongo-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def stats(options=None):
+    out = {'warmup': dict(warmup_state)}
+    if options is not None:
+        out['options'] = {k: v for k, v in options.items() if k != 'appname'}
+    return out
@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Sort order shared by the list query and the compound index backing it.
+KEYSET_SORT = [('updated_at', -1), ('_id', -1)]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class CursorError(ValueError):
+    """Raised when a client supplies a malformed pagination cursor or limit."""
+
+
+def parse_limit(raw, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Parse the `limit` query arg, clamping it to [1, maximum] (maximum=None: no cap)."""
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise CursorError('limit must be an integer')
+    if value < 1:
+        raise CursorError('limit must be positive')
+    return min(value, maximum) if maximum else value
+
+
+def _to_millis(dt):
+    # Mongo stores datetimes with millisecond precision, so encoding at that
+    # precision round-trips exactly.
+    return int((dt - _EPOCH) // timedelta(milliseconds=1))
+
+
+def encode_cursor(doc):
+    """Build an opaque cursor pointing just after `doc` in keyset order."""
+    updated_at = doc.get('updated_at')
+    payload = [_to_millis(updated_at) if updated_at else None, str(doc['_id'])]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (updated_at, ObjectId) from an opaque cursor string."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        millis, oid = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        updated_at = _EPOCH + timedelta(milliseconds=millis) if millis is not None else None
+        return updated_at, ObjectId(oid)
+    except Exception:
+        raise CursorError('Invalid cursor')
+
+
+def keyset_filter(cursor):
+    """Mongo filter selecting documents strictly after `cursor` in KEYSET_SORT order."""
+    updated_at, oid = decode_cursor(cursor)
+    if updated_at is None:
+        # Documents without updated_at sort last; only the _id tiebreak remains.
+        return {'updated_at': None, '_id': {'$lt': oid}}
+    return {'$or': [
+        {'updated_at': {'$lt': updated_at}},
+        {'updated_at': updated_at, '_id': {'$lt': oid}},
+        {'updated_at': None},
+    ]}
+
+
+def keyset_query(query, cursor=None):
+    """Combine `query` with the keyset filter for `cursor`, if any."""
+    if not cursor:
+        return query
+    return {'$and': [query, keyset_filter(cursor)]} if query else keyset_filter(cursor)
+
+
+def fetch_page(coll, query, limit, cursor=None, projection=None):
+    """Fetch one keyset page.
+
+    Reads at most `limit + 1` documents so memory stays bounded by the page
+    size. Returns (docs, next_cursor) where next_cursor is None on the last page.
+    """
+    docs = list(coll.find(keyset_query(query, cursor), projection).sort(KEYSET_SORT).limit(limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
+
+
+def stream_page(docs, limit, page):
+    """Yield at most `limit` of `docs` (a cursor read with limit + 1).
+
+    Sets page['next_cursor'] to the cursor after the last yielded document
+    when more were left; closes `docs` when done.
+    """
+    try:
+        last = None
+        for n, doc in enumerate(docs):
+            if limit and n == limit:
+                page['next_cursor'] = encode_cursor(last)
+                return
+            last = doc
+            yield doc
+    finally:
+        close = getattr(docs, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,351 @@
+"""Deadlines, retries, hedging and a circuit breaker for calls to the LLM endpoint.
+
+`ResilientCaller.call(fn)` runs `fn(timeout=seconds_left)` against one upstream
+(src/llm.py keeps one per model in a `CallerGroup`, so a failing model only
+opens its own circuit):
+- the whole call, retries included, must finish within a deadline;
+- retryable failures (timeouts, connection errors, 429, 5xx) are retried
+  with jittered exponential backoff;
+- with hedging on, if an attempt has not answered after the observed p95
+  latency a duplicate is sent and the first answer wins (hedges spend tokens,
+  so this is off by default). The first attempt runs on a thread of its own and
+  only hedges use the bounded hedge pool; when it is busy the hedge is skipped;
+- after enough consecutive retryable failures the circuit opens and calls
+  fail immediately until a trial call succeeds.
+
+Configuration (environment):
+- LLM_DEADLINE_SECONDS: total time per call including retries (default 90)
+- LLM_RETRIES: extra attempts after a retryable failure (default 2)
+- LLM_RETRY_BASE_SECONDS / LLM_RETRY_MAX_SECONDS: backoff base and cap (defaults 0.5 / 8)
+- LLM_HEDGE: `on` to enable hedged requests (default off)
+- LLM_HEDGE_MIN_SAMPLES: latencies observed before hedging starts (default 20)
+- LLM_HEDGE_WORKERS: hedges in flight at once, per model (default 8)
+- LLM_BREAKER_FAILURES: consecutive failures that open the circuit (default 5)
+- LLM_BREAKER_RESET_SECONDS: how long it stays open before a trial call (default 30)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+try:
+    import openai
+except ImportError:  # classification falls back to the generic checks below
+    openai = None
+
+
+class CircuitOpenError(RuntimeError):
+    """The endpoint has been failing; calls are refused until the reset timeout passes."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """The call (including retries) ran out of time."""
+
+
+def causes(exc):
+    """`exc` and the exceptions it was raised from, outermost first."""
+    while exc is not None:
+        yield exc
+        exc = exc.__cause__
+
+
+def is_retryable(exc):
+    """Whether `exc` is a transient upstream failure worth retrying (and counting against the circuit)."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if openai is not None:
+        if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+def is_upstream_failure(exc):
+    """Whether `exc` (or an exception it wraps) means the upstream is unwell: a retryable error or a deadline.
+
+    Client-side problems (a missing or rejected token, a 400) are not: another model would fail the same way.
+    """
+    return any(isinstance(e, DeadlineExceeded) or is_retryable(e) for e in causes(exc))
+
+
+def _in_thread(fn, timeout):
+    """Run fn(timeout=...) on a new daemon thread; returns a Future for its result."""
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(timeout=timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name='llm-call', daemon=True).start()
+    return future
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (seconds)."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; half-open (one trial call) after `reset_timeout`."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.opened_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open':
+                wait_for = self.opened_at + self.reset_timeout - time.monotonic()
+                if wait_for > 0:
+                    raise CircuitOpenError(f'LLM endpoint is failing; not calling it for another {wait_for:.0f}s')
+                self.state = 'half_open'
+            if self._trial_in_flight:
+                raise CircuitOpenError('LLM endpoint is failing; a trial call is in progress')
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened_count += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a trial call that neither succeeded nor failed upstream (e.g. a 400)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ResilientCaller:
+    """Wraps calls to one upstream with a deadline, retries, optional hedging and a circuit breaker."""
+
+    def __init__(self, deadline=90.0, retries=2, retry_base=0.5, retry_max=8.0,
+                 hedge=False, hedge_min_samples=20, breaker=None, max_hedge_workers=8):
+        self.deadline = deadline
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        # Only hedges run in the pool, and only when a worker is free, so hedging never queues or caps primaries.
+        self._pool = ThreadPoolExecutor(max_workers=max_hedge_workers, thread_name_prefix='llm-hedge') if hedge else None
+        self._hedge_slots = threading.BoundedSemaphore(max_hedge_workers)
+        self._lock = threading.Lock()
+        self.counts = {'calls': 0, 'failures': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'hedges_skipped': 0,
+                       'deadline_exceeded': 0, 'short_circuited': 0}
+
+    @classmethod
+    def from_env(cls, deadline=None):
+        """Build from the LLM_* variables; `deadline` overrides LLM_DEADLINE_SECONDS."""
+        env = os.environ.get
+        breaker = CircuitBreaker(failure_threshold=int(env('LLM_BREAKER_FAILURES', '5')),
+                                 reset_timeout=float(env('LLM_BREAKER_RESET_SECONDS', '30')))
+        return cls(deadline=deadline or float(env('LLM_DEADLINE_SECONDS', '90')),
+                   retries=int(env('LLM_RETRIES', '2')),
+                   retry_base=float(env('LLM_RETRY_BASE_SECONDS', '0.5')),
+                   retry_max=float(env('LLM_RETRY_MAX_SECONDS', '8')),
+                   hedge=env('LLM_HEDGE', 'off').lower() in ('1', 'on', 'true', 'yes'),
+                   hedge_min_samples=int(env('LLM_HEDGE_MIN_SAMPLES', '20')),
+                   max_hedge_workers=int(env('LLM_HEDGE_WORKERS', '8')),
+                   breaker=breaker)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (attempt - 1)))
+
+    def call(self, fn, hedge=True):
+        """Run `fn(timeout=...)` under the deadline/retry/hedge/breaker policy and return its result."""
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self._count('short_circuited')
+                raise
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise DeadlineExceeded(f'LLM call exceeded its {self.deadline:.0f}s deadline')
+                if hedge and self._pool is not None and self.latency.count() >= self.hedge_min_samples:
+                    result = self._hedged(fn, remaining)
+                else:
+                    result = fn(timeout=remaining)
+            except Exception as e:
+                attempt += 1
+                pause = self._after_failure(e, attempt, deadline)
+                if pause is None:
+                    raise
+                time.sleep(pause)
+                continue
+            self.breaker.record_success()
+            self.latency.add(time.monotonic() - started)
+            return result
+
+    async def call_async(self, fn):
+        """`call` for a coroutine function (without hedging), for the ASGI app: awaits `fn(timeout=...)`."""
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self._count('short_circuited')
+                raise
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise DeadlineExceeded(f'LLM call exceeded its {self.deadline:.0f}s deadline')
+                try:
+                    result = await asyncio.wait_for(fn(timeout=remaining), remaining)
+                except asyncio.TimeoutError:
+                    # also what a timing-out fn raises; only wait_for expiring means the deadline passed
+                    if time.monotonic() < deadline:
+                        raise
+                    raise DeadlineExceeded(f'LLM call exceeded its {self.deadline:.0f}s deadline')
+            except Exception as e:
+                attempt += 1
+                pause = self._after_failure(e, attempt, deadline)
+                if pause is None:
+                    raise
+                await asyncio.sleep(pause)
+                continue
+            self.breaker.record_success()
+            self.latency.add(time.monotonic() - started)
+            return result
+
+    def _after_failure(self, e, attempt, deadline):
+        """Record failed attempt number `attempt`; returns the pause before retrying, or None to give up."""
+        retryable = is_retryable(e)
+        if isinstance(e, DeadlineExceeded):
+            self._count('deadline_exceeded')
+        if retryable or isinstance(e, DeadlineExceeded):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+        pause = self.backoff(attempt)
+        if not retryable or attempt > self.retries or time.monotonic() + pause >= deadline:
+            self._count('failures')
+            return None
+        self._count('retries')
+        return pause
+
+    def _hedged(self, fn, remaining):
+        end = time.monotonic() + remaining
+        # the primary gets a thread of its own: it starts at once and its latency has no queueing in it
+        primary = _in_thread(fn, remaining)
+        done, _ = wait([primary], timeout=self.latency.percentile(95))
+        if done:
+            return primary.result()
+        if not self._hedge_slots.acquire(blocking=False):
+            # every hedge worker is busy; wait for the primary rather than queue a hedge behind them
+            self._count('hedges_skipped')
+            done, _ = wait([primary], timeout=max(end - time.monotonic(), 0))
+            if not done:
+                raise DeadlineExceeded('LLM call exceeded its deadline')
+            return primary.result()
+        self._count('hedges')
+        hedge = self._pool.submit(fn, timeout=max(end - time.monotonic(), 0.001))
+        hedge.add_done_callback(lambda _: self._hedge_slots.release())
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(end - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded('LLM call exceeded its deadline')
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    # the slower request is left to finish on its own; its answer is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        with self._lock:
+            out = dict(self.counts)
+        out.update({
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.opened_count,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'hedging': self.hedge,
+            'deadline_seconds': self.deadline,
+            'retries_per_call': self.retries,
+        })
+        return out
+
+
+class CallerGroup:
+    """One ResilientCaller per upstream key (a model name), created by `factory` on first use."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._callers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            caller = self._callers.get(key)
+            if caller is None:
+                caller = self._callers[key] = self.factory()
+            return caller
+
+    def stats(self):
+        with self._lock:
+            callers = dict(self._callers)
+        return {key: caller.stats() for key, caller in callers.items()}
@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request, current_app, url_for
+from bson import ObjectId
+
+from src import jobs
+
+job_bp = Blueprint('job', __name__)
+
+
+def jobs_collection():
+    """Get jobs collection with error handling"""
+    db = current_app.config.get('MONGO_DB')
+    if db is None:
+        raise RuntimeError("Database not connected. Please check MONGODB_URI environment variable.")
+    coll = db.jobs
+    if not current_app.config.get('JOB_INDEXES_READY'):
+        try:
+            jobs.ensure_job_indexes(coll)
+            current_app.config['JOB_INDEXES_READY'] = True
+        except Exception:
+            current_app.logger.exception('Failed to ensure job indexes')
+    return coll
+
+
+def wants_async():
+    """True when the client asked for a job instead of waiting: `"async": true` or `Prefer: respond-async`."""
+    data = request.get_json(silent=True) or {}
+    if data.get('async') is True:
+        return True
+    prefer = request.headers.get('Prefer', '')
+    return any(p.strip().lower() == 'respond-async' for p in prefer.split(','))
+
+
+def enqueue_job(kind, params):
+    return jobs.enqueue(jobs_collection(), kind, params)
+
+
+def accepted(job_id):
+    """202 response pointing at the job's status URL."""
+    location = url_for('job.get_job', job_id=str(job_id))
+    response = jsonify({'job_id': str(job_id), 'status': jobs.QUEUED, 'location': location})
+    response.headers['Location'] = location
+    response.headers['Preference-Applied'] = 'respond-async'
+    return response, 202
+
+
+@job_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background job; `result` is set once it succeeded, `error` after a failed attempt."""
+    try:
+        oid = ObjectId(job_id)
+    except Exception:
+        return jsonify({'error': 'Invalid job id'}), 400
+    try:
+        doc = jobs_collection().find_one({'_id': oid})
+        if not doc:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(jobs.job_to_dict(doc))
+    except RuntimeError as e:
+        return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e), 'type': 'server_error'}), 500
@@ -1,9 +1,27 @@
-from flask import Blueprint, jsonify, request, current_app
-from src.models.note import doc_to_dict, make_note_doc
+from flask import Blueprint, jsonify, request, current_app, stream_with_context
+from src.models.note import (doc_to_dict, make_note_doc, note_update_fields, is_noop_update, content_hash,
+                             ensure_note_indexes, parse_fields, note_projection, note_etag, etag_version,
+                             version_filter, version_matches, bump_watermark, read_watermark, live,
+                             tombstone_update)
+from src.sync import SyncTokenError, SyncTokenExpired, fetch_changes
+from src.pagination import (KEYSET_SORT, DEFAULT_LIMIT, MAX_LIMIT, parse_limit, fetch_page, keyset_query,
+                            stream_page)
+from src.search import IndexHolder
+from src.cache import note_cache_from_env
+from src import metrics
+from src.textdelta import DeltaError, apply_ops
+from src.streaming import NDJSON, STREAM_BATCH_SIZE, stream_mode, stream_documents, sse_response
 from bson import ObjectId
-from pymongo import ReturnDocument
-from src.llm import translate, generate_note
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from src.llm import (TRANSLATE_MODES, translate_fields, translate_languages, translate_stream, generate_note,
+                     generate_note_stream, parse_generated_note)
+from src.jsonstream import JSONFieldStream
+from src import jobs
+from src.routes.job import wants_async, enqueue_job, accepted
+from src.admission import admit
 from datetime import datetime
+import hashlib
 
 note_bp = Blueprint('note', __name__)
 
@@ -13,22 +31,145 @@ def notes_collection():
     db = current_app.config.get('MONGO_DB')
     if db is None:
         raise RuntimeError("Database not connected. Please check MONGODB_URI environment variable.")
-    return db.notes
+    coll = db.notes
+    if not current_app.config.get('NOTE_INDEXES_READY'):
+        try:
+            ensure_note_indexes(coll)
+            current_app.config['NOTE_INDEXES_READY'] = True
+        except Exception:
+            # Queries still work without the indexes, just slower; retry on the next request.
+            current_app.logger.exception('Failed to ensure note indexes')
+    return coll
+
+
+def note_cache():
+    """Get the app's read-through cache for single notes"""
+    cache = current_app.extensions.get('note_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('note_cache', note_cache_from_env())
+        metrics.register('note_cache', cache.stats)
+    return cache
+
+
+def load_note(coll, oid):
+    """Read a live note through the cache"""
+    return note_cache().get(str(oid), lambda: coll.find_one(live({'_id': oid})))
+
+
+def refresh_note(coll, oid):
+    """Re-read a note from the database, replacing any cached copy"""
+    note_cache().invalidate(str(oid))
+    return load_note(coll, oid)
+
+
+def search_holder():
+    """Get the app's full-text search index holder"""
+    return current_app.extensions.setdefault('note_search', IndexHolder())
+
+
+def index_note(doc):
+    """Reflect a written note in the search index, if it has been built"""
+    index = search_holder().current()
+    if index is not None:
+        index.add(str(doc['_id']), doc.get('title', ''), doc.get('content', ''))
+
+
+def unindex_note(note_id):
+    index = search_holder().current()
+    if index is not None:
+        index.remove(str(note_id))
+
+
+def list_etag(coll):
+    """ETag for a list response: the collection watermark plus the query args"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(args.encode('utf-8')).hexdigest()[:12]
+    return f'notes-{read_watermark(coll.database)}-{digest}'
+
+
+def conditional(response, etag):
+    """Attach a strong ETag and ask clients to revalidate before reusing a cached copy"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(etag):
+    return conditional(current_app.response_class(status=304), etag)
+
+
+def precondition_query(oid):
+    """Filter for a write guarded by If-Match; None when the header cannot match this note"""
+    query = live({'_id': oid})
+    if request.if_match and not request.if_match.star_tag:
+        expected = etag_version(request.if_match, oid)
+        if expected is None:
+            return None
+        query.update(version_filter(expected))
+    return query
+
+
+def write_missed(coll, query):
+    """Explain why a guarded write matched nothing: 412 if the note exists, else 404"""
+    if len(query) > 2 and coll.count_documents(live({'_id': query['_id']}), limit=1):
+        return jsonify({'error': 'Precondition failed'}), 412
+    return jsonify({'error': 'Note not found'}), 404
 
 
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
-    """Get all notes, ordered by most recently updated"""
+    """Get one page of notes, ordered by most recently updated.
+
+    Query args:
+    - limit: page size (default 50, max 200)
+    - cursor: opaque `next_cursor` value from the previous page
+    - fields: comma-separated subset of note fields to return
+    - view: `summary` for id, title, snippet and timestamps only
+    - stream=1 or `Accept: application/x-ndjson`: stream every note from
+      `cursor` onwards (limit is optional) straight off the Mongo cursor;
+      with stream=1, next_cursor is set when `limit` cut the list short
+
+    Response: { notes: [...], next_cursor: str | null }, with an ETag that
+    changes whenever any note is written; If-None-Match yields 304.
+    """
     try:
+        mode = stream_mode()
+        limit = parse_limit(request.args.get('limit'), default=None if mode else DEFAULT_LIMIT,
+                            maximum=None if mode else MAX_LIMIT)
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
         coll = notes_collection()
-        docs = coll.find().sort('updated_at', -1)
-        return jsonify([doc_to_dict(d) for d in docs])
+        etag = list_etag(coll)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        if mode:
+            docs = coll.find(keyset_query(live({}), request.args.get('cursor')), note_projection(fields))
+            docs = docs.sort(KEYSET_SORT).batch_size(STREAM_BATCH_SIZE).limit(limit + 1 if limit else 0)
+            page = {'next_cursor': None}
+            response = stream_documents(mode, stream_page(docs, limit, page), lambda d: doc_to_dict(d, fields),
+                                        extra=lambda: page)
+            return conditional(response, etag)
+        docs, next_cursor = fetch_page(coll, live({}), limit, cursor=request.args.get('cursor'),
+                                       projection=note_projection(fields))
+        response = jsonify({'notes': [doc_to_dict(d, fields) for d in docs], 'next_cursor': next_cursor})
+        return conditional(response, etag)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except RuntimeError as e:
         return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
     except Exception as e:
         return jsonify({'error': str(e), 'type': 'server_error'}), 500
 
 
+def insert_note(coll, doc):
+    """Insert a new note document, stamping change_seq and updating the caches and search index."""
+    doc['change_seq'] = bump_watermark(coll.database)
+    doc['_id'] = coll.insert_one(doc).inserted_id
+    bump_watermark(coll.database)
+    note_cache().invalidate(str(doc['_id']))
+    index_note(doc)
+    return doc
+
+
 @note_bp.route('/notes', methods=['POST'])
 def create_note():
     """Create a new note"""
@@ -38,21 +179,21 @@ def create_note():
             return jsonify({'error': 'Title and content are required'}), 400
 
         coll = notes_collection()
-        doc = make_note_doc(data['title'], data['content'])
-        result = coll.insert_one(doc)
-        doc['_id'] = result.inserted_id
-        return jsonify(doc_to_dict(doc)), 201
+        doc = insert_note(coll, make_note_doc(data['title'], data['content']))
+        return conditional(jsonify(doc_to_dict(doc)), note_etag(doc)), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 
 @note_bp.route('/notes/generate', methods=['POST'])
+@admit('generate')
 def generate_note_endpoint():
     """Generate a note using the LLM and persist it.
 
     Request JSON: { "prompt": "..." }
-    Response: 201 with created note JSON on success.
+    Response: 201 with created note JSON on success, or 202 with a job id
+    when `"async": true` / `Prefer: respond-async` is sent (see GET /api/jobs/<id>).
     """
     data = request.get_json(silent=True) or {}
     prompt = data.get('prompt')
@@ -61,6 +202,13 @@ def generate_note_endpoint():
 
     model_name = data.get('model')
     api_token = data.get('token') or data.get('api_token')
+    if wants_async():
+        if api_token:
+            return jsonify({'error': 'token cannot be combined with async; jobs use the server token'}), 400
+        try:
+            return accepted(enqueue_job('generate', {'prompt': prompt, 'model': model_name}))
+        except RuntimeError as re:
+            return jsonify({'error': str(re)}), 503
 
     try:
         generated = generate_note(prompt, model_name=model_name, api_token=api_token)
@@ -73,10 +221,8 @@ def generate_note_endpoint():
 
     doc = make_note_doc(title, content)
     try:
-        coll = notes_collection()
-        res = coll.insert_one(doc)
-        doc['_id'] = res.inserted_id
-        return jsonify(doc_to_dict(doc)), 201
+        insert_note(notes_collection(), doc)
+        return conditional(jsonify(doc_to_dict(doc)), note_etag(doc)), 201
     except RuntimeError as re:
         return jsonify({'error': str(re)}), 503
     except Exception as e:
@@ -84,22 +230,77 @@ def generate_note_endpoint():
         return jsonify({'error': 'Failed to save generated note', 'detail': str(e)}), 500
 
 
+@jobs.handler('generate')
+def generate_job(params):
+    generated = generate_note(params['prompt'], model_name=params.get('model'))
+    doc = insert_note(notes_collection(), make_note_doc(generated.get('title') or '', generated.get('content') or ''))
+    return doc_to_dict(doc)
+
+
+@note_bp.route('/notes/generate/stream', methods=['POST'])
+@admit('generate')
+def generate_note_stream_endpoint():
+    """Streaming variant of /notes/generate, as Server-Sent Events.
+
+    Events: `delta` { field, text } while the title and content are being
+    written, then `done` with the saved note, or `error` { error }. Nothing is
+    saved unless the whole reply arrives and parses.
+    """
+    data = request.get_json(silent=True) or {}
+    prompt = data.get('prompt')
+    if not prompt or not isinstance(prompt, str):
+        return jsonify({'error': 'prompt must be a non-empty string'}), 400
+    model_name = data.get('model')
+    api_token = data.get('token') or data.get('api_token')
+
+    def events():
+        parser = JSONFieldStream()
+        raw = []
+        try:
+            for delta in generate_note_stream(prompt, model_name=model_name, api_token=api_token):
+                raw.append(delta)
+                for field, text in parser.feed(delta):
+                    yield 'delta', {'field': field, 'text': text}
+            generated = parse_generated_note(''.join(raw))
+        except RuntimeError as e:
+            current_app.logger.exception('LLM generate failed')
+            yield 'error', {'error': 'LLM generation failed', 'detail': str(e)}
+            return
+        try:
+            doc = insert_note(notes_collection(), make_note_doc(generated['title'], generated['content']))
+            yield 'done', doc_to_dict(doc)
+        except Exception as e:
+            current_app.logger.exception('Failed to save generated note')
+            yield 'error', {'error': 'Failed to save generated note', 'detail': str(e)}
+
+    return sse_response(events())
+
+
 @note_bp.route('/notes/<note_id>', methods=['GET'])
 def get_note(note_id):
-    """Get a specific note by ID"""
+    """Get a specific note by ID (honours If-None-Match)"""
     coll = notes_collection()
     try:
-        doc = coll.find_one({'_id': ObjectId(note_id)})
+        oid = ObjectId(note_id)
     except Exception:
         return jsonify({'error': 'Invalid note id'}), 400
+    doc = load_note(coll, oid)
+    if doc and request.if_none_match.contains(note_etag(doc)):
+        return not_modified(note_etag(doc))
     if not doc:
         return jsonify({'error': 'Note not found'}), 404
-    return jsonify(doc_to_dict(doc))
+    return conditional(jsonify(doc_to_dict(doc)), note_etag(doc))
 
 
 @note_bp.route('/notes/<note_id>', methods=['PUT'])
 def update_note(note_id):
-    """Update a specific note"""
+    """Update a specific note.
+
+    Optional concurrency control: a `version` in the body must equal the
+    note's current version or the update is rejected with 409 (the response
+    carries the current note); If-Match works the same way with 412.
+    Saves that would not change anything return the note without writing.
+    """
     try:
         data = request.json
         if not data:
@@ -111,96 +312,607 @@ def update_note(note_id):
         except Exception:
             return jsonify({'error': 'Invalid note id'}), 400
 
-        update = {}
-        if 'title' in data:
-            update['title'] = data['title']
-        if 'content' in data:
-            update['content'] = data['content']
-        if 'translations' in data and isinstance(data['translations'], dict):
-            # set individual translation keys under translations map
-            for k, v in data['translations'].items():
-                update[f'translations.{k}'] = v
+        update = note_update_fields(data)
         if not update:
             return jsonify({'error': 'No updatable fields provided'}), 400
-
+        expected = data.get('version')
+        if expected is not None and (not isinstance(expected, int) or isinstance(expected, bool)):
+            return jsonify({'error': 'version must be an integer'}), 400
+
+        query = precondition_query(oid)
+        if query is None:
+            return jsonify({'error': 'Precondition failed'}), 412
+        if expected is not None and 'version' in query and query['version'] != version_filter(expected)['version']:
+            # If-Match and the body name different versions; at least one of them is stale
+            return jsonify({'error': 'Precondition failed'}), 412
+
+        current = load_note(coll, oid)
+        fresh = False
+        if current is not None and expected is not None and current.get('version', 0) != expected:
+            # the cache may lag writes made by other workers; confirm before rejecting
+            current, fresh = refresh_note(coll, oid), True
+            if current is not None and current.get('version', 0) != expected:
+                return version_conflict(current)
+        if current is None:
+            return jsonify({'error': 'Note not found'}), 404
+        if is_noop_update(current, update):
+            if expected is None and not fresh:
+                # without a client version a cached copy could hide another worker's write
+                current = refresh_note(coll, oid)
+            # a no-op needs no write, provided the If-Match version (if any) is the current one
+            if current is not None and is_noop_update(current, update) and version_matches(query, current):
+                return conditional(jsonify(doc_to_dict(current)), note_etag(current))
+
+        if expected is not None:
+            query.update(version_filter(expected))
         update['updated_at'] = __import__('datetime').datetime.utcnow()
-        result = coll.find_one_and_update({'_id': oid}, {'$set': update}, return_document=ReturnDocument.AFTER)
+        update['change_seq'] = bump_watermark(coll.database)
+        result = coll.find_one_and_update(query, {'$set': update, '$inc': {'version': 1}},
+                                          return_document=ReturnDocument.AFTER)
+        note_cache().invalidate(str(oid))
         if not result:
+            if expected is not None:
+                current = refresh_note(coll, oid)
+                if current is not None and current.get('version', 0) != expected:
+                    return version_conflict(current)
+            return write_missed(coll, query)
+        bump_watermark(coll.database)
+        if 'title' in update or 'content' in update:
+            index_note(result)
+        return conditional(jsonify(doc_to_dict(result)), note_etag(result))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# What a PATCH response sends back: everything but the (possibly large) content.
+PATCH_RESPONSE_FIELDS = ('id', 'title', 'snippet', 'created_at', 'updated_at', 'version')
+
+
+@note_bp.route('/notes/<note_id>', methods=['PATCH'])
+def patch_note(note_id):
+    """Apply text edits to a note's content (see src/textdelta.py for the op format).
+
+    Request JSON: { "base_version": int, "ops": [...], "checksum": sha256 hex
+    of the resulting content, "title"?: str }
+    409 when base_version is not the current version and 422 when the ops do
+    not apply or the checksum does not match; clients fall back to PUT.
+    Response: the note without `content` and `translations`.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        base_version = data.get('base_version')
+        if not isinstance(base_version, int) or isinstance(base_version, bool):
+            return jsonify({'error': 'base_version must be an integer'}), 400
+        if not isinstance(data.get('checksum'), str):
+            return jsonify({'error': 'checksum is required'}), 400
+        try:
+            oid = ObjectId(note_id)
+        except Exception:
+            return jsonify({'error': 'Invalid note id'}), 400
+
+        coll = notes_collection()
+        current = load_note(coll, oid)
+        if current is not None and current.get('version', 0) != base_version:
+            current = refresh_note(coll, oid)
+        if current is None:
             return jsonify({'error': 'Note not found'}), 404
-        return jsonify(doc_to_dict(result))
+        if current.get('version', 0) != base_version:
+            return version_conflict(current)
+
+        try:
+            content = apply_ops(current.get('content', ''), data.get('ops', []))
+        except DeltaError as e:
+            return jsonify({'error': str(e)}), 422
+        if content_hash(content) != data['checksum']:
+            return jsonify({'error': 'Checksum mismatch'}), 422
+
+        update = note_update_fields({'content': content, **({'title': data['title']} if 'title' in data else {})})
+        if is_noop_update(current, update):
+            return conditional(jsonify(doc_to_dict(current, PATCH_RESPONSE_FIELDS)), note_etag(current))
+
+        update['updated_at'] = datetime.utcnow()
+        update['change_seq'] = bump_watermark(coll.database)
+        result = coll.find_one_and_update({**live({'_id': oid}), **version_filter(base_version)},
+                                          {'$set': update, '$inc': {'version': 1}},
+                                          return_document=ReturnDocument.AFTER)
+        note_cache().invalidate(str(oid))
+        if not result:
+            current = refresh_note(coll, oid)
+            if current is None:
+                return jsonify({'error': 'Note not found'}), 404
+            return version_conflict(current)
+        bump_watermark(coll.database)
+        index_note(result)
+        return conditional(jsonify(doc_to_dict(result, PATCH_RESPONSE_FIELDS)), note_etag(result))
+    except RuntimeError as e:
+        return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def version_conflict(current):
+    """409 response for a stale `version`, carrying the note as it is now"""
+    body = {'error': 'Version conflict', 'current_version': current.get('version', 0),
+            'note': doc_to_dict(current)}
+    return conditional(jsonify(body), note_etag(current)), 409
+
+
 @note_bp.route('/notes/<note_id>', methods=['DELETE'])
 def delete_note(note_id):
-    """Delete a specific note"""
+    """Delete a specific note, leaving a tombstone for delta sync (honours If-Match like PUT)"""
     coll = notes_collection()
     try:
         oid = ObjectId(note_id)
     except Exception:
         return jsonify({'error': 'Invalid note id'}), 400
-    result = coll.delete_one({'_id': oid})
-    if result.deleted_count == 0:
-        return jsonify({'error': 'Note not found'}), 404
+    query = precondition_query(oid)
+    if query is None:
+        return jsonify({'error': 'Precondition failed'}), 412
+    result = coll.update_one(query, tombstone_update(bump_watermark(coll.database)))
+    note_cache().invalidate(str(oid))
+    if result.modified_count == 0:
+        return write_missed(coll, query)
+    bump_watermark(coll.database)
+    unindex_note(oid)
     return '', 204
 
 
+BATCH_MAX_OPERATIONS = 1000
+
+
+@note_bp.route('/notes/batch', methods=['POST'])
+def batch_notes():
+    """Create, update and delete many notes in one unordered bulk write.
+
+    Request JSON: { "operations": [
+        { "op": "create", "title": "...", "content": "..." },
+        { "op": "update", "id": "...", "title"?, "content"?, "translations"?, "version"? },
+        { "op": "delete", "id": "...", "version"? }
+    ] }
+    `version` makes an update/delete conditional, like If-Match on PUT/DELETE.
+
+    Response: { results: [{ index, op, ok, status, id?, error? }, ...] } in
+    request order; each item succeeds or fails on its own.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}), 400
+
+    try:
+        coll = notes_collection()
+        results = [None] * len(operations)
+        planned = []  # (request index, op, note id, $set fields or None, expected version)
+        seen = set()
+        for i, item in enumerate(operations):
+            op = item.get('op') if isinstance(item, dict) else None
+            if op == 'create':
+                if 'title' not in item or 'content' not in item:
+                    results[i] = batch_error(i, op, 400, 'Title and content are required')
+                else:
+                    planned.append((i, op, ObjectId(), None, None))
+            elif op in ('update', 'delete'):
+                try:
+                    oid = ObjectId(item.get('id'))
+                except Exception:
+                    results[i] = batch_error(i, op, 400, 'Invalid note id')
+                    continue
+                if oid in seen:
+                    results[i] = batch_error(i, op, 400, 'Note appears more than once in the batch')
+                    continue
+                seen.add(oid)
+                fields = note_update_fields(item) if op == 'update' else None
+                if op == 'update' and not fields:
+                    results[i] = batch_error(i, op, 400, 'No updatable fields provided')
+                else:
+                    planned.append((i, op, oid, fields, item.get('version')))
+            else:
+                results[i] = batch_error(i, op, 400, "op must be 'create', 'update' or 'delete'")
+
+        # one read to resolve existence and versions for every update/delete
+        targets = [oid for _, op, oid, _, _ in planned if op != 'create']
+        versions = {d['_id']: d.get('version', 0)
+                    for d in coll.find(live({'_id': {'$in': targets}}), {'version': 1})} if targets else {}
+        writable = []
+        for entry in planned:
+            i, op, oid, _, expected = entry
+            if op != 'create' and oid not in versions:
+                results[i] = batch_error(i, op, 404, 'Note not found')
+            elif expected is not None and expected != versions[oid]:
+                results[i] = batch_error(i, op, 409, 'Version conflict')
+            else:
+                writable.append(entry)
+
+        if writable:
+            first_seq = bump_watermark(coll.database, by=len(writable)) - len(writable) + 1
+            now = datetime.utcnow()
+            requests, created = [], {}
+            for n, (i, op, oid, fields, _) in enumerate(writable):
+                seq = first_seq + n
+                if op == 'create':
+                    doc = make_note_doc(operations[i]['title'], operations[i]['content'])
+                    doc.update({'_id': oid, 'change_seq': seq})
+                    created[oid] = doc
+                    requests.append(InsertOne(doc))
+                elif op == 'update':
+                    query = {**live({'_id': oid}), **version_filter(versions[oid])}
+                    requests.append(UpdateOne(query, {'$set': {**fields, 'updated_at': now, 'change_seq': seq},
+                                                      '$inc': {'version': 1}}))
+                else:
+                    query = {**live({'_id': oid}), **version_filter(versions[oid])}
+                    requests.append(UpdateOne(query, tombstone_update(seq)))
+            try:
+                outcome = coll.bulk_write(requests, ordered=False).bulk_api_result
+                failed = {}
+            except BulkWriteError as bwe:
+                outcome = bwe.details
+                failed = {e['index']: e.get('errmsg', 'Write failed') for e in outcome.get('writeErrors', [])}
+            bump_watermark(coll.database)
+            note_cache().invalidate(*(str(oid) for _, _, oid, _, _ in writable))
+
+            guarded = [(n, oid) for n, (_, op, oid, _, _) in enumerate(writable) if op != 'create' and n not in failed]
+            if outcome.get('nMatched', 0) < len(guarded):
+                # a note changed between the version read and the write; find which by its change_seq
+                stamped = {d['_id']: d.get('change_seq')
+                           for d in coll.find({'_id': {'$in': [oid for _, oid in guarded]}}, {'change_seq': 1})}
+                for n, oid in guarded:
+                    if stamped.get(oid) != first_seq + n:
+                        failed[n] = 'Version conflict'
+
+            reindex = []
+            for n, (i, op, oid, fields, _) in enumerate(writable):
+                if n in failed:
+                    status = 409 if failed[n] == 'Version conflict' else 500
+                    results[i] = batch_error(i, op, status, failed[n])
+                    continue
+                status = {'create': 201, 'update': 200, 'delete': 204}[op]
+                results[i] = {'index': i, 'op': op, 'ok': True, 'status': status, 'id': str(oid)}
+                if op == 'create':
+                    index_note(created[oid])
+                elif op == 'delete':
+                    unindex_note(oid)
+                elif 'title' in fields or 'content' in fields:
+                    reindex.append(oid)
+            if reindex and search_holder().current() is not None:
+                for doc in coll.find({'_id': {'$in': reindex}}, {'title': 1, 'content': 1}):
+                    index_note(doc)
+
+        return jsonify({'results': results})
+    except RuntimeError as e:
+        return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e), 'type': 'server_error'}), 500
+
+
+def batch_error(index, op, status, message):
+    return {'index': index, 'op': op, 'ok': False, 'status': status, 'error': message}
+
+
+@note_bp.route('/notes/changes', methods=['GET'])
+def get_changes():
+    """Delta sync: notes created, updated or deleted since a sync token.
+
+    Query args:
+    - since: `next_token` from the previous call; omit for a full sync
+    - limit: max changes per call (default 500, max 1000)
+    - fields / view: as for GET /api/notes
+
+    Response: { changed: [...notes], deleted: [ids], next_token, has_more }
+    Responds 410 when the token is older than tombstone retention.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'), default=500, maximum=1000)
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+        coll = notes_collection()
+        docs, next_token, has_more = fetch_changes(coll, request.args.get('since'), limit,
+                                                   projection=note_projection(fields))
+    except SyncTokenExpired as e:
+        return jsonify({'error': str(e)}), 410
+    except (SyncTokenError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e), 'type': 'server_error'}), 500
+    return jsonify({
+        'changed': [doc_to_dict(d, fields) for d in docs if not d.get('deleted')],
+        'deleted': [str(d['_id']) for d in docs if d.get('deleted')],
+        'next_token': next_token,
+        'has_more': has_more,
+    })
+
+
+def ranked_notes(coll, hits, fields, batch_size=STREAM_BATCH_SIZE):
+    """Yield serialized notes for ranked search hits, loading them a batch at a time"""
+    for start in range(0, len(hits), batch_size):
+        batch = hits[start:start + batch_size]
+        query = live({'_id': {'$in': [ObjectId(i) for i, _ in batch]}})
+        docs = {str(d['_id']): d for d in coll.find(query, note_projection(fields))}
+        for note_id, score in batch:
+            if note_id in docs:
+                note = doc_to_dict(docs[note_id], fields)
+                note['score'] = round(score, 4)
+                yield note
+
+
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    """Search notes by title or content"""
+    """Full-text search over title and content, ranked by BM25.
+
+    Query args: q, limit (default 20, max 200), offset (default 0), fields, view,
+    stream (as for GET /api/notes; streams every hit unless limit is given)
+    Response: { notes: [...each with a `score`], total: int }
+    """
     q = request.args.get('q', '')
+    mode = stream_mode()
+    try:
+        limit = parse_limit(request.args.get('limit'), default=None if mode else 20,
+                            maximum=None if mode else MAX_LIMIT)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        fields = parse_fields(request.args.get('fields'), request.args.get('view'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     if not q:
-        return jsonify([])
-    coll = notes_collection()
-    docs = coll.find({'$or': [{'title': {'$regex': q, '$options': 'i'}}, {'content': {'$regex': q, '$options': 'i'}}]}).sort('updated_at', -1)
-    return jsonify([doc_to_dict(d) for d in docs])
+        return jsonify({'notes': [], 'total': 0})
+    try:
+        coll = notes_collection()
+        index = search_holder().get(coll)
+        total, hits = index.search(q, limit=limit or len(index), offset=offset)
+        if mode:
+            response = stream_documents(mode, ranked_notes(coll, hits, fields), lambda note: note,
+                                        extra={'total': total})
+            response.headers['X-Total-Count'] = str(total)
+            return response
+        return jsonify({'notes': list(ranked_notes(coll, hits, fields)), 'total': total})
+    except RuntimeError as e:
+        return jsonify({'error': str(e), 'type': 'configuration_error'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e), 'type': 'server_error'}), 500
+
+
+# Most languages one translate request may ask for.
+MAX_TARGET_LANGUAGES = 20
+
+
+def parse_targets(raw):
+    """Validate the `to` field (one language or a list); returns the languages, de-duplicated."""
+    targets = raw if isinstance(raw, list) else [raw]
+    if not targets or len(targets) > MAX_TARGET_LANGUAGES:
+        raise ValueError(f'to must name between 1 and {MAX_TARGET_LANGUAGES} languages')
+    for target in targets:
+        # language names become field names under `translations`
+        if not isinstance(target, str) or not target.strip() or '.' in target or target.startswith('$'):
+            raise ValueError('Each target language must be a non-empty name without "." or a leading "$"')
+    return list(dict.fromkeys(targets))
+
+
+def translation_failed(fields, translated, errors):
+    """True when nothing was actually translated (empty fields do not count)."""
+    return bool(errors) and not any(fields[name] for name in translated)
+
+
+def save_translations(coll, doc, by_language):
+    """Persist {language: {field: text}} under the note's `translations` map in one $set."""
+    if not by_language:
+        return
+    update_doc = {f'translations.{target}.{name}': value
+                  for target, translated in by_language.items() for name, value in translated.items()}
+    update_doc['updated_at'] = datetime.utcnow()
+    update_doc['change_seq'] = bump_watermark(coll.database)
+    coll.update_one(live({'_id': doc.get('_id')}), {'$set': update_doc, '$inc': {'version': 1}})
+    note_cache().invalidate(str(doc.get('_id')))
+    bump_watermark(coll.database)
+
+
+def language_result(target, translated, errors):
+    result = {'language': target,
+              'translated_title': translated.get('title'),
+              'translated_content': translated.get('content')}
+    if errors:
+        result['errors'] = errors
+    return result
 
 
 @note_bp.route('/notes/<note_id>/translate', methods=['POST'])
+@admit('translate')
 def translate_note(note_id):
     """Translate a note's content using the configured LLM.
 
     Request JSON (optional fields):
-    - to: target language (default: English)
+    - to: target language (default: English), or a list of languages
     - model: model name to use (optional)
     - token: API token to override environment (optional)
+    - mode: `concurrent` (default), `combined` (one structured call) or `sequential`
+
+    Response: { id, translated_title, translated_content }. If only one of the
+    two fails, the other is still saved and the failure is listed under `errors`;
+    if both fail the response is 502.
 
-    Response: { id, translated_content }
+    With a list of languages they are translated in parallel (at most
+    LLM_FANOUT_CONCURRENCY at a time) and saved together in one update. The
+    response is { id, translations: {lang: {title, content}}, errors: {lang: {...}} },
+    or, with `Accept: application/x-ndjson`, one line per language as it
+    completes followed by a final { id, done, saved } line.
+
+    `"async": true` or `Prefer: respond-async` queues the work instead and
+    answers 202 with a job id (see GET /api/jobs/<id>).
     """
     coll = notes_collection()
     try:
-        doc = coll.find_one({'_id': ObjectId(note_id)})
+        doc = load_note(coll, ObjectId(note_id))
     except Exception:
         return jsonify({'error': 'Invalid note id'}), 400
     if not doc:
         return jsonify({'error': 'Note not found'}), 404
 
     data = request.json or {}
-    target = data.get('to', 'English')
     model_name = data.get('model')
     token = data.get('token')
-
+    mode = data.get('mode')
+    if mode is not None and mode not in TRANSLATE_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(TRANSLATE_MODES)}"}), 400
     try:
-        # Translate title and content separately
-        original_title = doc.get('title', '')
-        original_content = doc.get('content', '')
+        targets = parse_targets(data.get('to', 'English'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    fields = {'title': doc.get('title', ''), 'content': doc.get('content', '')}
+
+    if isinstance(data.get('to'), list) and stream_mode() == 'ndjson':
+        return stream_translations(coll, doc, fields, targets, model_name, token, mode)
+    if wants_async():
+        if token:
+            return jsonify({'error': 'token cannot be combined with async; jobs use the server token'}), 400
+        return accepted(enqueue_job('translate', {'note_id': str(doc['_id']), 'to': data.get('to', 'English'),
+                                                  'model': model_name, 'mode': mode}))
 
-        translated_title = translate(original_title, target_language=target, model_name=model_name, api_token=token) if original_title else ''
-        translated_content = translate(original_content, target_language=target, model_name=model_name, api_token=token) if original_content else ''
-
-        # persist the translation into the note document under a `translations` map as an object per language
-        update_doc = {
-            f'translations.{target}.title': translated_title,
-            f'translations.{target}.content': translated_content,
-            'updated_at': datetime.utcnow()
-        }
-        coll.find_one_and_update({'_id': doc.get('_id')}, {'$set': update_doc}, return_document=ReturnDocument.AFTER)
-
-        return jsonify({'id': str(doc.get('_id')), 'translated_title': translated_title, 'translated_content': translated_content})
+    try:
+        body, status = run_translation(coll, doc, data.get('to', 'English'), model_name, token, mode)
+        return jsonify(body), status
     except RuntimeError as e:
         # Likely API/token errors
         return jsonify({'error': str(e)}), 502
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+def run_translation(coll, doc, to, model_name=None, token=None, mode=None):
+    """Translate `doc` into `to` (a language or a list of them) and save the result.
+
+    Returns (body, status) for the translate response; shared by the route
+    and the background job.
+    """
+    fields = {'title': doc.get('title', ''), 'content': doc.get('content', '')}
+    targets = parse_targets(to)
+
+    if not isinstance(to, list):
+        target = targets[0]
+        translated, errors = translate_fields(fields, target_language=target, model_name=model_name,
+                                              api_token=token, mode=mode, note_id=str(doc['_id']))
+        if translation_failed(fields, translated, errors):
+            # nothing was actually translated: report it as a failed upstream call
+            return {'error': '; '.join(f'{name}: {msg}' for name, msg in errors.items()), 'errors': errors}, 502
+
+        # persist the translation into the note document under a `translations` map as an object per language
+        save_translations(coll, doc, {target: translated})
+
+        body = {'id': str(doc.get('_id')),
+                'translated_title': translated.get('title'),
+                'translated_content': translated.get('content')}
+        if errors:
+            body['errors'] = errors
+        return body, 200
+
+    saved, failed = {}, {}
+    for target, translated, errors in translate_languages(fields, targets, model_name=model_name, api_token=token,
+                                                         mode=mode, note_id=str(doc['_id'])):
+        if translation_failed(fields, translated, errors):
+            failed[target] = errors
+            continue
+        saved[target] = translated
+        if errors:
+            failed[target] = errors
+    if not saved:
+        return {'error': 'No language could be translated', 'errors': failed}, 502
+    save_translations(coll, doc, saved)
+    body = {'id': str(doc.get('_id')), 'translations': saved}
+    if failed:
+        body['errors'] = failed
+    return body, 200
+
+
+def stream_translations(coll, doc, fields, targets, model_name, token, mode):
+    """NDJSON fan-out: one line per language as it completes, then a final { id, done, saved } line."""
+    results = translate_languages(fields, targets, model_name=model_name, api_token=token, mode=mode,
+                                  note_id=str(doc['_id']))
+    dumps = current_app.json.dumps
+
+    def generate():
+        saved = {}
+        try:
+            for target, translated, errors in results:
+                if not translation_failed(fields, translated, errors):
+                    saved[target] = translated
+                yield dumps(language_result(target, translated, errors)) + '\n'
+            save_translations(coll, doc, saved)
+            yield dumps({'id': str(doc.get('_id')), 'done': True, 'saved': list(saved)}) + '\n'
+        except Exception as e:
+            yield dumps({'id': str(doc.get('_id')), 'done': False, 'error': str(e)}) + '\n'
+        finally:
+            results.close()
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=NDJSON)
+
+
+@jobs.handler('translate')
+def translate_job(params):
+    coll = notes_collection()
+    doc = load_note(coll, ObjectId(params['note_id']))
+    if not doc:
+        raise jobs.PermanentJobError('Note not found')
+    body, status = run_translation(coll, doc, params.get('to', 'English'), params.get('model'), None, params.get('mode'))
+    if status >= 500:
+        raise RuntimeError(body['error'])
+    return body
+
+
+@note_bp.route('/notes/<note_id>/translate/stream', methods=['POST'])
+@admit('translate')
+def translate_note_stream(note_id):
+    """Streaming variant of /notes/<id>/translate (one language), as Server-Sent Events.
+
+    Events: `delta` { field, text } as the title and then the content are
+    translated, then `done` with the usual translate response, or `error`.
+    The translation is saved once, after both fields have finished.
+    """
+    coll = notes_collection()
+    try:
+        doc = load_note(coll, ObjectId(note_id))
+    except Exception:
+        return jsonify({'error': 'Invalid note id'}), 400
+    if not doc:
+        return jsonify({'error': 'Note not found'}), 404
+
+    data = request.json or {}
+    try:
+        target = parse_targets(data.get('to', 'English'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(target) != 1:
+        return jsonify({'error': 'Streaming translates into one language at a time'}), 400
+    target = target[0]
+    model_name = data.get('model')
+    token = data.get('token')
+    fields = {'title': doc.get('title', ''), 'content': doc.get('content', '')}
+
+    def events():
+        translated, errors = {}, {}
+        for name, text in fields.items():
+            if not text:
+                translated[name] = ''
+                continue
+            parts = []
+            try:
+                for delta in translate_stream(text, target_language=target, model_name=model_name, api_token=token):
+                    parts.append(delta)
+                    yield 'delta', {'field': name, 'text': delta}
+                translated[name] = ''.join(parts)
+            except RuntimeError as e:
+                errors[name] = str(e)
+        if translation_failed(fields, translated, errors):
+            yield 'error', {'error': '; '.join(f'{name}: {msg}' for name, msg in errors.items()), 'errors': errors}
+            return
+        try:
+            save_translations(coll, doc, {target: translated})
+        except Exception as e:
+            yield 'error', {'error': str(e)}
+            return
+        body = {'id': str(doc.get('_id')),
+                'translated_title': translated.get('title'),
+                'translated_content': translated.get('content')}
+        if errors:
+            body['errors'] = errors
+        yield 'done', body
+
+    return sse_response(events())
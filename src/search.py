@@ -0,0 +1,135 @@
+"""In-process full-text search for notes.
+
+An inverted index over note titles and contents, ranked with Okapi BM25.
+The index is built lazily from the notes collection, kept current by the
+write routes in `note_bp`, and rebuilt after `SEARCH_INDEX_MAX_AGE` seconds
+so writes made by other worker processes eventually become searchable.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from src.models.note import LIVE
+
+# CJK text has no spaces between words, so runs of CJK characters are split
+# into overlapping bigrams; everything else is split on non-word characters.
+_CJK_RUN = '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+'
+_TOKEN_RE = re.compile(rf'({_CJK_RUN})|([^\W_]+)')
+
+TITLE_BOOST = 2
+
+
+def tokenize(text):
+    """Lowercase `text` and split it into index terms."""
+    tokens = []
+    if not text:
+        return tokens
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking. Thread-safe."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self._doc_terms = {}                # doc_id -> Counter of terms (for removal)
+        self._doc_len = {}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, doc_id, title, content):
+        """Index (or re-index) a note. Title terms count TITLE_BOOST times."""
+        terms = Counter(tokenize(content))
+        for term in tokenize(title):
+            terms[term] += TITLE_BOOST
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+            length = sum(terms.values())
+            self._doc_terms[doc_id] = terms
+            self._doc_len[doc_id] = length
+            self._total_len += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+
+    def search(self, query, limit=20, offset=0):
+        """Return (total_matches, [(doc_id, score), ...]) for one page of results."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not terms or not n_docs:
+                return 0, []
+            avg_len = self._total_len / n_docs
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return len(ranked), ranked[offset:offset + limit]
+
+
+class IndexHolder:
+    """Owns the process-wide SearchIndex and rebuilds it when it goes stale."""
+
+    def __init__(self, max_age=None):
+        if max_age is None:
+            max_age = float(os.environ.get('SEARCH_INDEX_MAX_AGE', '300'))
+        self.max_age = max_age
+        self._index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, coll):
+        """Return a fresh-enough index, (re)building it from `coll` if needed."""
+        with self._lock:
+            if self._index is None or time.monotonic() - self._built_at > self.max_age:
+                self._index = build_index(coll)
+                self._built_at = time.monotonic()
+            return self._index
+
+    def current(self):
+        """Return the index if it has been built, else None (writes before the first search are picked up by the build)."""
+        return self._index
+
+
+def build_index(coll, batch_size=500):
+    """Build a SearchIndex by streaming every note's title and content."""
+    index = SearchIndex()
+    for doc in coll.find(LIVE, {'title': 1, 'content': 1}).batch_size(batch_size):
+        index.add(str(doc['_id']), doc.get('title', ''), doc.get('content', ''))
+    return index
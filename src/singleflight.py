@@ -0,0 +1,65 @@
+"""Coalesce identical concurrent calls into one.
+
+The first caller for a key runs the function; callers arriving with the same
+key while it is running wait for it and get the same result (or exception).
+Nothing is cached: once the call returns, the next caller starts a new one.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe single-flight group with counters for calls made and calls shared."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn):
+        """Return fn(), sharing one execution among concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.deduplicated += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        total = self.executed + self.deduplicated
+        return {
+            'executed': self.executed,
+            'deduplicated': self.deduplicated,
+            'dedup_ratio': round(self.deduplicated / total, 4) if total else None,
+            'in_flight': in_flight,
+        }
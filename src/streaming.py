@@ -0,0 +1,87 @@
+from flask import current_app, request, stream_with_context
+
+NDJSON = 'application/x-ndjson'
+
+# Documents encoded per chunk written to the socket.
+STREAM_BATCH_SIZE = 200
+
+
+def stream_mode():
+    """Return 'ndjson', 'json' or None depending on how the client asked for the response.
+
+    NDJSON is selected with `Accept: application/x-ndjson`; a streamed JSON
+    document (same shape as the buffered one) with `?stream=1`.
+    """
+    if request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON:
+        return 'ndjson'
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return 'json'
+    return None
+
+
+def _encoded_batches(docs, serialize, batch_size):
+    dumps = current_app.json.dumps
+    batch = []
+    try:
+        for doc in docs:
+            batch.append(dumps(serialize(doc)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        # release the server-side cursor if the client went away mid-stream
+        close = getattr(docs, 'close', None)
+        if close is not None:
+            close()
+
+
+def stream_documents(mode, docs, serialize, key='notes', extra=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream `docs` (any iterable, typically a PyMongo cursor) without buffering the result.
+
+    In 'json' mode the body is `{"<key>": [...], **extra}`; `extra` may be a
+    callable, called once every document has been sent. In 'ndjson' mode the
+    body is one serialized document per line and `extra` is dropped.
+    """
+    dumps = current_app.json.dumps
+
+    def generate_json():
+        yield '{%s:[' % dumps(key)
+        first = True
+        for batch in _encoded_batches(docs, serialize, batch_size):
+            yield (',' if not first else '') + ','.join(batch)
+            first = False
+        trailer = extra() if callable(extra) else extra
+        yield ']' + (',' + dumps(trailer)[1:] if trailer else '}')
+
+    def generate_ndjson():
+        for batch in _encoded_batches(docs, serialize, batch_size):
+            yield '\n'.join(batch) + '\n'
+
+    if mode == 'ndjson':
+        return current_app.response_class(stream_with_context(generate_ndjson()), mimetype=NDJSON)
+    return current_app.response_class(stream_with_context(generate_json()), mimetype='application/json')
+
+
+SSE = 'text/event-stream'
+
+
+def sse_response(events):
+    """Send an iterable of (event, data) pairs as Server-Sent Events.
+
+    A comment line goes out first so the client sees the response (and any
+    proxy flushes it) before the first event is ready.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield ': stream open\n\n'
+        for event, data in events:
+            yield f'event: {event}\ndata: {dumps(data)}\n\n'
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=SSE)
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx and similar proxies buffer responses unless told otherwise
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
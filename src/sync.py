@@ -0,0 +1,88 @@
+import base64
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from src.models.note import LIVE, read_watermark
+
+DEFAULT_LIMIT = 500
+
+# Writes allocate their change_seq before they land, so a slow write can
+# commit a sequence number lower than one a client has already synced past.
+# Notes updated within this window before the previous poll are re-sent to
+# cover such stragglers; clients apply changes idempotently.
+GRACE_SECONDS = float(os.environ.get('SYNC_GRACE_SECONDS', '10'))
+
+# Tokens older than the tombstone retention may have missed deletions.
+TOKEN_MAX_AGE_SECONDS = float(os.environ.get('TOMBSTONE_TTL_DAYS', '30')) * 86400
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SyncTokenError(ValueError):
+    """Malformed sync token."""
+
+
+class SyncTokenExpired(Exception):
+    """The token predates tombstone retention; the client must resync from scratch."""
+
+
+def encode_token(seq, at_millis, more=False):
+    """`more` marks a continuation page: it resumes strictly after `seq`, without the grace window."""
+    payload = [seq, at_millis, 1] if more else [seq, at_millis]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """Return (change_seq, issued_at_millis, more) from an opaque sync token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        seq, at_millis, *rest = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(seq), int(at_millis), bool(rest and rest[0])
+    except Exception:
+        raise SyncTokenError('Invalid sync token')
+
+
+def changes_query(since, now_millis):
+    """Return (query, since_seq, since_millis) selecting the notes changed since `since` (None: full sync)."""
+    if not since:
+        # a full sync has no deletions to report
+        return LIVE, 0, now_millis
+    since_seq, since_millis, more = decode_token(since)
+    if now_millis - since_millis > TOKEN_MAX_AGE_SECONDS * 1000:
+        raise SyncTokenExpired('Sync token expired; fetch the full note list again')
+    if more:
+        # the first page already covered the grace window; re-sending it on every page
+        # would never get past more than `limit` recent notes
+        return {'change_seq': {'$gt': since_seq}}, since_seq, since_millis
+    recent = _EPOCH + timedelta(milliseconds=since_millis) - timedelta(seconds=GRACE_SECONDS)
+    return {'$or': [{'change_seq': {'$gt': since_seq}}, {'updated_at': {'$gte': recent}}]}, since_seq, since_millis
+
+
+def changes_projection(projection):
+    return {**projection, 'change_seq': 1, 'deleted': 1} if projection is not None else None
+
+
+def changes_page(docs, limit, watermark, since_seq, since_millis, now_millis):
+    """Turn up to `limit + 1` docs sorted by change_seq into (docs, next_token, has_more)."""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        # resume strictly after the last change returned (keeping the original issue time for expiry)
+        return docs, encode_token(docs[-1].get('change_seq') or since_seq, since_millis, more=True), True
+    return docs, encode_token(max(watermark, since_seq), now_millis), False
+
+
+def fetch_changes(coll, since=None, limit=DEFAULT_LIMIT, projection=None):
+    """Collect notes changed since `since` (a token, or None for a full sync).
+
+    Returns (docs, next_token, has_more). `docs` includes tombstones
+    (documents with `deleted: True`); callers split them out.
+    """
+    now_millis = int(time.time() * 1000)
+    # read before querying so anything committed later has a higher change_seq
+    watermark = read_watermark(coll.database)
+    query, since_seq, since_millis = changes_query(since, now_millis)
+    docs = list(coll.find(query, changes_projection(projection)).sort('change_seq', 1).limit(limit + 1))
+    return changes_page(docs, limit, watermark, since_seq, since_millis, now_millis)
@@ -0,0 +1,59 @@
+"""Text edit operations for PATCH /api/notes/<id>.
+
+An edit list is a sequence of `{"pos": int, "del": int, "ins": str}` objects
+(or `[pos, del, ins]` triples) that all refer to positions in the *base*
+text: each removes `del` units starting at `pos` and inserts `ins` there.
+Operations must be sorted by `pos` and must not overlap.
+
+Positions and lengths count UTF-16 code units, which is what JavaScript
+string indices count, so a browser can compute edits with plain
+`String.prototype` arithmetic.
+"""
+
+MAX_OPS = 1000
+
+
+class DeltaError(ValueError):
+    """The edit list is malformed or does not fit the base text."""
+
+
+def _normalize(op):
+    if isinstance(op, dict):
+        pos, delete, insert = op.get('pos'), op.get('del', 0), op.get('ins', '')
+    elif isinstance(op, (list, tuple)) and len(op) == 3:
+        pos, delete, insert = op
+    else:
+        raise DeltaError('Each op must be {"pos", "del", "ins"} or [pos, del, ins]')
+    if not isinstance(pos, int) or not isinstance(delete, int) or isinstance(pos, bool) or isinstance(delete, bool):
+        raise DeltaError('pos and del must be integers')
+    if not isinstance(insert, str):
+        raise DeltaError('ins must be a string')
+    if pos < 0 or delete < 0:
+        raise DeltaError('pos and del must not be negative')
+    return pos, delete, insert
+
+
+def apply_ops(base, ops):
+    """Apply an edit list to `base` and return the resulting text."""
+    if not isinstance(ops, list):
+        raise DeltaError('ops must be a list')
+    if len(ops) > MAX_OPS:
+        raise DeltaError(f'At most {MAX_OPS} ops per patch')
+    units = base.encode('utf-16-le', 'surrogatepass')
+    length = len(units) // 2
+    out = []
+    cursor = 0
+    for op in ops:
+        pos, delete, insert = _normalize(op)
+        if pos < cursor:
+            raise DeltaError('ops must be sorted by pos and must not overlap')
+        if pos + delete > length:
+            raise DeltaError('op extends past the end of the base text')
+        out.append(units[cursor * 2:pos * 2])
+        out.append(insert.encode('utf-16-le', 'surrogatepass'))
+        cursor = pos + delete
+    out.append(units[cursor * 2:])
+    try:
+        return b''.join(out).decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise DeltaError('ops split a surrogate pair')
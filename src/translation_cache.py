@@ -0,0 +1,149 @@
+"""Content-addressed cache of LLM translations.
+
+Entries are keyed by sha256(text, target language, model, prompt version,
+credential), so identical text is translated once per language/model no
+matter which note it belongs to, and changing the prompt (llm.PROMPT_VERSION)
+retires old entries. `credential` is a hash of the API token the translation
+was made with: like the single-flight keys in src/llm.py, a result is only
+handed back to callers presenting the same token.
+An in-process LRU sits in front of the shared Mongo collection.
+
+Configuration (environment):
+- TRANSLATION_CACHE: set to `off` to disable (default on)
+- TRANSLATION_CACHE_TTL_DAYS: Mongo entries expire after this many days (default 30)
+- TRANSLATION_CACHE_MAX_DOCS: soft cap on Mongo entries; the oldest are trimmed (default 100000)
+- TRANSLATION_CACHE_MAX_CHARS: longer texts are not cached (default 20000)
+- TRANSLATION_CACHE_MEMORY_SIZE: in-process LRU entries (default 2048)
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from pymongo import ASCENDING
+
+from src.cache import MemoryBackend
+
+# Check the collection size against max_docs once every this many inserts.
+TRIM_EVERY = 100
+
+
+def translation_key(text, target_language, model, prompt_version, credential=''):
+    raw = json.dumps([text, target_language, model, prompt_version, credential], ensure_ascii=False,
+                     separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """Two-level (memory, then Mongo) translation cache with hit and saved-latency counters.
+
+    Collection failures are counted and treated as misses; translation never
+    fails because of the cache.
+    """
+
+    def __init__(self, collection=None, memory_size=2048, ttl_days=30, max_docs=100000, max_chars=20000):
+        self.collection = collection
+        self.memory = MemoryBackend(memory_size)
+        self.ttl_seconds = int(ttl_days * 86400)
+        self.max_docs = max_docs
+        self.max_chars = max_chars
+        self._indexes_ready = False
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_ms = 0.0
+
+    @classmethod
+    def from_env(cls, collection=None):
+        env = os.environ.get
+        return cls(collection,
+                   memory_size=int(env('TRANSLATION_CACHE_MEMORY_SIZE', '2048')),
+                   ttl_days=float(env('TRANSLATION_CACHE_TTL_DAYS', '30')),
+                   max_docs=int(env('TRANSLATION_CACHE_MAX_DOCS', '100000')),
+                   max_chars=int(env('TRANSLATION_CACHE_MAX_CHARS', '20000')))
+
+    key = staticmethod(translation_key)
+
+    def cacheable(self, text):
+        return 0 < len(text) <= self.max_chars
+
+    def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        self.collection.create_index([('created_at', ASCENDING)], name='translation_cache_ttl',
+                                     expireAfterSeconds=self.ttl_seconds)
+        self._indexes_ready = True
+
+    def get(self, key):
+        """Return the cached translation for `key`, or None."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            with self._lock:
+                self.memory_hits += 1
+                self.saved_ms += entry[1]
+            return entry[0]
+        doc = None
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({'_id': key}, {'translation': 1, 'latency_ms': 1})
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+        if doc is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        latency_ms = doc.get('latency_ms') or 0.0
+        self.memory.set(key, (doc['translation'], latency_ms), self.ttl_seconds)
+        with self._lock:
+            self.store_hits += 1
+            self.saved_ms += latency_ms
+        return doc['translation']
+
+    def put(self, key, translation, latency_ms, target_language=None, model=None):
+        self.memory.set(key, (translation, latency_ms), self.ttl_seconds)
+        if self.collection is None:
+            return
+        try:
+            self._ensure_indexes()
+            self.collection.update_one({'_id': key}, {'$setOnInsert': {
+                'translation': translation,
+                'target': target_language,
+                'model': model,
+                'latency_ms': round(latency_ms, 1),
+                'created_at': datetime.utcnow(),
+            }}, upsert=True)
+            with self._lock:
+                self._inserts += 1
+                trim = self.max_docs and self._inserts % TRIM_EVERY == 0
+            if trim:
+                self._trim()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+
+    def _trim(self):
+        excess = self.collection.estimated_document_count() - self.max_docs
+        if excess <= 0:
+            return
+        oldest = self.collection.find({}, {'_id': 1}).sort('created_at', ASCENDING).limit(excess)
+        self.collection.delete_many({'_id': {'$in': [d['_id'] for d in oldest]}})
+
+    def stats(self):
+        hits = self.memory_hits + self.store_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'saved_llm_ms': round(self.saved_ms, 1),
+            'errors': self.errors,
+            'memory_size': self.memory.size(),
+            'memory_evictions': self.memory.evictions,
+            'persistent': self.collection is not None,
+        }
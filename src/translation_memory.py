@@ -0,0 +1,150 @@
+"""Sentence-level translation memory for incremental re-translation.
+
+Each note's text is split into sentences (src/chunking.py) and every
+(note, language, model, source sentence) pair is stored with its translation
+in the `translation_memory` collection. The first translation of a note
+goes through the normal per-field path and seeds the memory with the
+sentences it can align. Re-translating an edited note then sends only the
+sentences that are new or changed to the model, in one batched call, and
+splices the stored translations back in around them.
+
+Configuration (environment):
+- TRANSLATION_MEMORY: set to `off` to disable (default on)
+- TRANSLATION_MEMORY_TTL_DAYS: entries not refreshed for this long expire (default 180)
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+from src.chunking import split_sentences, reassemble
+
+
+def segment_key(note_id, target_language, model, source):
+    raw = json.dumps([note_id, target_language, model, source], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """Per-note store of aligned source/target sentences.
+
+    Collection failures are counted and make translate_fields() return
+    nothing, so the caller falls back to translating whole fields.
+    """
+
+    def __init__(self, collection, ttl_days=180):
+        self.collection = collection
+        self.ttl_seconds = int(ttl_days * 86400)
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.translated = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, collection):
+        return cls(collection, ttl_days=float(os.environ.get('TRANSLATION_MEMORY_TTL_DAYS', '180')))
+
+    def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        self.collection.create_index([('note_id', ASCENDING), ('target', ASCENDING), ('model', ASCENDING)],
+                                     name='note_target_model')
+        self.collection.create_index([('updated_at', ASCENDING)], name='translation_memory_ttl',
+                                     expireAfterSeconds=self.ttl_seconds)
+        self._indexes_ready = True
+
+    def has_segments(self, note_id, target_language, model):
+        """Whether anything is stored for this note, language and model."""
+        try:
+            self._ensure_indexes()
+            return self.collection.find_one({'note_id': note_id, 'target': target_language, 'model': model},
+                                            {'_id': 1}) is not None
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return False
+
+    def remember(self, note_id, fields, translations, target_language, model):
+        """Store the sentence pairs of whole-field translations; returns how many were stored.
+
+        A field is only stored when its source and translation split into the
+        same number of sentences, so the pairs can be aligned by position.
+        """
+        pairs = {}
+        for name, text in fields.items():
+            if name not in translations:
+                continue
+            sources = [s.text.strip() for s in split_sentences(text) if s.translate]
+            targets = [s.text.strip() for s in split_sentences(translations[name]) if s.translate]
+            if sources and len(sources) == len(targets):
+                for source, target in zip(sources, targets):
+                    pairs.setdefault(segment_key(note_id, target_language, model, source), (source, target))
+        if not pairs:
+            return 0
+        try:
+            self._ensure_indexes()
+            now = datetime.utcnow()
+            self.collection.bulk_write([UpdateOne({'_id': key}, {'$set': {'updated_at': now}, '$setOnInsert': {
+                'note_id': note_id, 'target': target_language, 'model': model,
+                'source': source, 'translation': target}}, upsert=True)
+                for key, (source, target) in pairs.items()], ordered=False)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return 0
+        return len(pairs)
+
+    def translate_fields(self, note_id, fields, target_language, model, translate_batch):
+        """Translate {name: text} for one note, reusing stored sentence translations.
+
+        `translate_batch(list_of_sentences)` must return the translations in
+        the same order. Returns {name: translation}; empty if anything failed.
+        """
+        try:
+            self._ensure_indexes()
+            split = {name: split_sentences(text) for name, text in fields.items()}
+            sources = {}
+            for segments in split.values():
+                for segment in segments:
+                    if segment.translate:
+                        source = segment.text.strip()
+                        sources.setdefault(segment_key(note_id, target_language, model, source), source)
+            known = {doc['_id']: doc['translation']
+                     for doc in self.collection.find({'_id': {'$in': list(sources)}}, {'translation': 1})}
+            missing = [key for key in sources if key not in known]
+            if missing:
+                translated = translate_batch([sources[key] for key in missing])
+                known.update(zip(missing, translated))
+            now = datetime.utcnow()
+            ops = [UpdateOne({'_id': key}, {'$set': {'updated_at': now}, '$setOnInsert': {
+                'note_id': note_id, 'target': target_language, 'model': model,
+                'source': sources[key], 'translation': known[key]}}, upsert=True) for key in sources]
+            if ops:
+                # refreshing updated_at keeps live sentences; ones the note no longer contains expire by TTL
+                self.collection.bulk_write(ops, ordered=False)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return {}
+        with self._lock:
+            self.reused += len(sources) - len(missing)
+            self.translated += len(missing)
+        out = {}
+        for name, segments in split.items():
+            translations = {i: known[segment_key(note_id, target_language, model, s.text.strip())]
+                            for i, s in enumerate(segments) if s.translate}
+            out[name] = reassemble(segments, translations)
+        return out
+
+    def stats(self):
+        total = self.reused + self.translated
+        return {
+            'segments_reused': self.reused,
+            'segments_translated': self.translated,
+            'reuse_ratio': round(self.reused / total, 4) if total else None,
+            'errors': self.errors,
+        }
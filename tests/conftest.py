@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture
+def monkeypatchascontext(monkeypatch):
+    """A scoped monkeypatch whose patches are undone when the test finishes."""
+    with monkeypatch.context() as m:
+        yield m
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from src import admission
+from src.admission import ConcurrencyLimiter, RateLimiter, Rejected
+
+
+def test_rate_limiter_allows_a_burst_per_client():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    limiter.check('a')
+    limiter.check('a')
+    with pytest.raises(Rejected) as info:
+        limiter.check('a')
+    assert info.value.reason == 'rate_limited' and 0 < info.value.retry_after <= 1
+    limiter.check('b')
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=0.05)
+    started = limiter.acquire()
+    with pytest.raises(Rejected) as info:
+        limiter.acquire()  # waits in the queue, then times out
+    assert info.value.reason == 'queue_timeout'
+
+    limiter.waiting = 1  # someone else is already queued
+    with pytest.raises(Rejected) as info:
+        limiter.acquire()
+    assert info.value.reason == 'queue_full'
+    limiter.waiting = 0
+
+    limiter.release(started)
+    limiter.release(limiter.acquire())
+    assert limiter.active == 0
+
+
+def test_route_answers_429_and_releases_the_slot_when_a_stream_ends(monkeypatch):
+    controller = admission.AdmissionController(RateLimiter(per_minute=600, burst=100),
+                                               {'generate': ConcurrencyLimiter(limit=1, max_queue=0)})
+    monkeypatch.setattr(admission, 'controller', controller)
+    monkeypatch.setattr(admission, 'ENABLED', True)
+    app = Flask(__name__)
+    release = threading.Event()
+
+    @app.route('/slow')
+    @admission.admit('generate')
+    def slow():
+        def body():
+            yield 'a'
+            release.wait(2)
+            yield 'b'
+        return app.response_class(body())
+
+    client = app.test_client()
+    streaming = client.get('/slow', buffered=False)
+    rejected = client.get('/slow')
+    assert rejected.status_code == 429
+    assert rejected.headers['Retry-After'] == '1'
+    assert rejected.get_json()['reason'] == 'queue_full'
+
+    release.set()
+    assert streaming.get_data() == b'ab'
+    streaming.close()
+    assert controller.limiters['generate'].active == 0
+    assert client.get('/slow').status_code == 200
+    assert controller.stats()['admitted'] == 2
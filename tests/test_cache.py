@@ -0,0 +1,65 @@
+import time
+
+from bson import ObjectId
+
+from src.cache import DocumentCache, MemoryBackend
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', b'1', ttl=60)
+    backend.set('b', b'2', ttl=60)
+    backend.get('a')
+    backend.set('c', b'3', ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') == b'1'
+    assert backend.evictions == 1
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend()
+    backend.set('a', b'1', ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('a') is None
+
+
+def test_read_through_counts_and_invalidates():
+    cache = DocumentCache(MemoryBackend(), ttl=60)
+    oid = ObjectId()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {'_id': oid, 'title': 'cached'}
+
+    first = cache.get(str(oid), loader)
+    first['title'] = 'mutated by caller'
+    assert cache.get(str(oid), loader) == {'_id': oid, 'title': 'cached'}
+    assert len(loads) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.invalidate(str(oid))
+    cache.get(str(oid), loader)
+    assert len(loads) == 2
+
+
+def test_missing_documents_are_not_cached():
+    cache = DocumentCache(MemoryBackend(), ttl=60)
+    assert cache.get('nope', lambda: None) is None
+    assert cache.backend.size() == 0
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = DocumentCache(MemoryBackend(), ttl=60)
+    oid = ObjectId()
+
+    def loader_overtaken_by_a_write():
+        old = {'_id': oid, 'version': 1}
+        # a writer updates the note and invalidates it after this read, before the cache store
+        cache.invalidate(str(oid))
+        return old
+
+    assert cache.get(str(oid), loader_overtaken_by_a_write) == {'_id': oid, 'version': 1}
+    assert cache.stats()['stale_loads'] == 1
+    assert cache.get(str(oid), lambda: {'_id': oid, 'version': 2}) == {'_id': oid, 'version': 2}
+    assert cache.get(str(oid), lambda: None) == {'_id': oid, 'version': 2}
@@ -0,0 +1,29 @@
+from src.chunking import chunk_text, estimate_tokens, reassemble
+
+TEXT = (
+    '# Shopping\n\n'
+    'Buy milk. Buy eggs! Anything else?\n\n'
+    '```python\nprint("do not translate")\n\nx = 1\n```\n\n'
+    '- apples\n- pears\n\n\n'
+    + ''.join(f'Sentence {i} is here. ' for i in range(30)) + '\n\n'
+    '第一句。第二句！\n'
+)
+
+
+def test_chunks_round_trip_and_respect_budget():
+    for budget in (8, 40, 10000):
+        segments = chunk_text(TEXT, budget)
+        assert ''.join(s.text for s in segments) == TEXT
+        for s in segments:
+            if s.translate and estimate_tokens(s.text) > budget:
+                # only a single sentence may exceed the budget
+                assert '. ' not in s.text.strip()
+
+
+def test_code_fences_are_never_translated():
+    segments = chunk_text(TEXT, 40)
+    fences = [s for s in segments if '```' in s.text]
+    assert len(fences) == 1 and not fences[0].translate
+    translated = reassemble(segments, {i: s.text.upper() for i, s in enumerate(segments) if s.translate})
+    assert 'print("do not translate")' in translated
+    assert translated.startswith('# SHOPPING\n\nBUY MILK.')
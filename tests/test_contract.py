@@ -0,0 +1,275 @@
+"""API contract shared by the Flask app (src/main.py) and the ASGI app (src/asgi.py).
+
+Every test runs against both apps. With MONGO_TEST_URI set they use a real
+MongoDB (each test gets a throwaway database that is dropped afterwards);
+otherwise they run on mongomock, and the ASGI runs on mongomock-motor. The
+ASGI runs also need requirements-asgi.txt.
+"""
+import os
+import uuid
+
+import pytest
+from pymongo import MongoClient
+
+from src import llm
+
+MONGO_TEST_URI = os.environ.get('MONGO_TEST_URI')
+
+
+class Api:
+    """Same call interface over Flask's test client and Starlette's TestClient."""
+
+    def __init__(self, kind, client):
+        self.kind = kind
+        self.client = client
+
+    def call(self, method, path, json=None, headers=None):
+        if self.kind == 'flask':
+            r = self.client.open(path, method=method, json=json, headers=headers)
+            # closing runs call_on_close hooks (e.g. releasing an admission slot), as a WSGI server would
+            r.close()
+            return r.status_code, r.get_json(silent=True), r.headers
+        r = self.client.request(method, path, json=json, headers=headers)
+        return r.status_code, (r.json() if r.content else None), r.headers
+
+
+@pytest.fixture(params=['flask', 'asgi'])
+def api(request, monkeypatch):
+    db_name = f'contract_{uuid.uuid4().hex[:12]}'
+    if MONGO_TEST_URI:
+        mongo = MongoClient(MONGO_TEST_URI)
+    else:
+        mongo = pytest.importorskip('mongomock').MongoClient()
+    monkeypatch.setattr(llm, 'translation_cache', None)
+    try:
+        if request.param == 'flask':
+            monkeypatch.setenv('JOB_WORKERS', '0')
+            from src.main import app
+            monkeypatch.setitem(app.config, 'MONGO_DB', mongo[db_name])
+            monkeypatch.setitem(app.config, 'NOTE_INDEXES_READY', False)
+            yield Api('flask', app.test_client())
+        else:
+            pytest.importorskip('starlette')
+            pytest.importorskip('motor')
+            from starlette.testclient import TestClient
+            from src.asgi import create_app
+            if MONGO_TEST_URI:
+                app = create_app(mongo_uri=MONGO_TEST_URI, db_name=db_name)
+            else:
+                app = create_app(db=pytest.importorskip('mongomock_motor').AsyncMongoMockClient()[db_name])
+            with TestClient(app) as client:
+                yield Api('asgi', client)
+    finally:
+        mongo.drop_database(db_name)
+        mongo.close()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Route both apps' model calls to `reply(messages)`, set on the returned object."""
+    from types import SimpleNamespace
+    fake = SimpleNamespace(reply=lambda messages: 'translated')
+
+    def call(model, messages, temperature=1.0, top_p=1.0, api_token=None):
+        return fake.reply(messages)
+
+    async def call_async(model, messages, temperature=1.0, top_p=1.0, api_token=None):
+        return fake.reply(messages)
+
+    monkeypatch.setattr(llm, 'call_llm_model', call)
+    try:
+        from src import llm_async
+        monkeypatch.setattr(llm_async, 'call_llm_model', call_async)
+    except ImportError:
+        pass
+    return fake
+
+
+def test_note_lifecycle(api):
+    status, note, headers = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'Body text'})
+    assert status == 201
+    assert (note['title'], note['content'], note['snippet'], note['version']) == ('T', 'Body text', 'Body text', 1)
+    etag = headers['ETag']
+    url = f"/api/notes/{note['id']}"
+
+    status, got, _ = api.call('GET', url)
+    assert status == 200 and got['id'] == note['id']
+    assert api.call('GET', url, headers={'If-None-Match': etag})[0] == 304
+
+    status, body, _ = api.call('PUT', url, json={'content': 'New', 'version': 7})
+    assert status == 409 and body['current_version'] == 1
+    assert api.call('PUT', url, json={'title': 'X'}, headers={'If-Match': '"nope"'})[0] == 412
+    status, updated, _ = api.call('PUT', url, json={'content': 'New', 'version': 1})
+    assert status == 200 and updated['version'] == 2 and updated['content'] == 'New'
+    status, same, _ = api.call('PUT', url, json={'content': 'New'})
+    assert status == 200 and same['version'] == 2
+
+    assert api.call('DELETE', url)[0] == 204
+    assert api.call('GET', url)[0] == 404
+    assert api.call('DELETE', url)[0] == 404
+
+
+def test_note_validation(api):
+    assert api.call('POST', '/api/notes', json={'title': 'only'})[0] == 400
+    assert api.call('GET', '/api/notes/not-an-id')[0] == 400
+    assert api.call('PUT', '/api/notes/not-an-id', json={'title': 'x'})[0] == 400
+    assert api.call('GET', '/api/notes?limit=abc')[0] == 400
+    assert api.call('GET', '/api/notes?fields=bogus')[0] == 400
+
+
+def test_note_list_pages_and_fields(api):
+    for i in range(3):
+        api.call('POST', '/api/notes', json={'title': f'n{i}', 'content': 'c'})
+    status, page, headers = api.call('GET', '/api/notes?limit=2&fields=title')
+    assert status == 200
+    assert [set(n) for n in page['notes']] == [{'id', 'title'}] * 2
+    assert page['next_cursor']
+    assert api.call('GET', '/api/notes?limit=2&fields=title', headers={'If-None-Match': headers['ETag']})[0] == 304
+
+    status, rest, _ = api.call('GET', f"/api/notes?limit=2&fields=title&cursor={page['next_cursor']}")
+    assert [n['title'] for n in page['notes'] + rest['notes']] == ['n2', 'n1', 'n0']
+    assert rest['next_cursor'] is None
+
+
+def test_translate_and_generate(api, fake_llm):
+    fake_llm.reply = lambda messages: 'Bonjour' if 'Translate' in messages[-1]['content'] else \
+        '{"title": "Generated", "content": "Some content"}'
+    _, note, _ = api.call('POST', '/api/notes', json={'title': 'Hello', 'content': 'Hello'})
+
+    status, body, _ = api.call('POST', f"/api/notes/{note['id']}/translate", json={'to': 'French', 'token': 't'})
+    assert status == 200
+    assert (body['translated_title'], body['translated_content']) == ('Bonjour', 'Bonjour')
+    status, body, _ = api.call('POST', f"/api/notes/{note['id']}/translate",
+                               json={'to': ['German', 'Italian'], 'token': 't'})
+    assert status == 200 and set(body['translations']) == {'German', 'Italian'}
+    _, saved, _ = api.call('GET', f"/api/notes/{note['id']}")
+    assert set(saved['translations']) == {'French', 'German', 'Italian'}
+    assert api.call('POST', f"/api/notes/{note['id']}/translate", json={'to': 'a.b'})[0] == 400
+
+    status, generated, _ = api.call('POST', '/api/notes/generate', json={'prompt': 'write', 'token': 't'})
+    assert status == 201 and generated['title'] == 'Generated'
+    assert api.call('POST', '/api/notes/generate', json={})[0] == 400
+
+
+def test_user_crud(api):
+    assert api.call('POST', '/api/users', json={'username': 'ann'})[0] == 400
+    status, user, _ = api.call('POST', '/api/users', json={'username': 'ann', 'email': 'a@example.com'})
+    assert status == 201
+    url = f"/api/users/{user['id']}"
+    assert api.call('GET', url)[1] == user
+    status, updated, _ = api.call('PUT', url, json={'email': 'b@example.com'})
+    assert status == 200 and updated['email'] == 'b@example.com'
+    assert [u['id'] for u in api.call('GET', '/api/users')[1]] == [user['id']]
+    assert api.call('DELETE', url)[0] == 204
+    assert api.call('GET', url)[0] == 404
+
+
+def test_patch_note(api):
+    import hashlib
+    _, note, _ = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'Hello world'})
+    url = f"/api/notes/{note['id']}"
+
+    def checksum(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    status, body, headers = api.call('PATCH', url, json={'base_version': 1, 'ops': [[6, 5, 'there']],
+                                                         'checksum': checksum('Hello there')})
+    assert status == 200 and body['version'] == 2 and 'content' not in body
+    assert api.call('GET', url)[1]['content'] == 'Hello there'
+    assert api.call('PATCH', url, json={'base_version': 1, 'ops': [], 'checksum': checksum('x')})[0] == 409
+    assert api.call('PATCH', url, json={'base_version': 2, 'ops': [[99, 1, '']],
+                                        'checksum': checksum('x')})[0] == 422
+    assert api.call('PATCH', url, json={'base_version': 2, 'ops': [], 'checksum': checksum('x')})[0] == 422
+    assert api.call('PATCH', url, json={'ops': []})[0] == 400
+
+
+def test_delta_sync(api, monkeypatch):
+    import time
+    from src import sync
+    monkeypatch.setattr(sync, 'GRACE_SECONDS', 0)
+    _, a, _ = api.call('POST', '/api/notes', json={'title': 'A', 'content': 'c'})
+    _, b, _ = api.call('POST', '/api/notes', json={'title': 'B', 'content': 'c'})
+    time.sleep(0.002)
+    status, full, _ = api.call('GET', '/api/notes/changes?limit=1')
+    assert status == 200 and full['has_more'] is True and len(full['changed']) == 1
+    _, rest, _ = api.call('GET', f"/api/notes/changes?limit=1&since={full['next_token']}")
+    assert rest['has_more'] is False and [n['id'] for n in full['changed'] + rest['changed']] == [a['id'], b['id']]
+
+    time.sleep(0.002)
+    api.call('DELETE', f"/api/notes/{a['id']}")
+    time.sleep(0.002)
+    status, delta, _ = api.call('GET', f"/api/notes/changes?since={rest['next_token']}")
+    assert (delta['changed'], delta['deleted']) == ([], [a['id']])
+    assert api.call('GET', '/api/notes/changes?since=garbage')[0] == 400
+
+
+def test_async_jobs_are_queued(api):
+    _, note, _ = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'c'})
+    status, body, headers = api.call('POST', f"/api/notes/{note['id']}/translate", json={'to': 'French',
+                                                                                       'async': True})
+    assert status == 202 and headers['Location'] == body['location'] == f"/api/jobs/{body['job_id']}"
+    status, job, _ = api.call('GET', body['location'])
+    assert status == 200 and (job['kind'], job['status']) == ('translate', 'queued')
+    status, _, _ = api.call('POST', '/api/notes/generate', json={'prompt': 'p'}, headers={'Prefer': 'respond-async'})
+    assert status == 202
+    assert api.call('POST', '/api/notes/generate', json={'prompt': 'p', 'async': True, 'token': 't'})[0] == 400
+    assert api.call('GET', '/api/jobs/not-an-id')[0] == 400
+
+
+def test_flask_only_endpoints_are_not_taken_for_note_ids(api):
+    """Search, batch and streaming are served by the Flask app; the ASGI app answers 501 for them."""
+    expected = 501 if api.kind == 'asgi' else None
+    _, note, _ = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'c'})
+    for method, path, json, headers in [
+            ('GET', '/api/notes/search?q=T', None, None),
+            ('POST', '/api/notes/batch', {'operations': [{'op': 'delete', 'id': note['id']}]}, None),
+            ('GET', '/api/notes?stream=1', None, None),
+            ('GET', '/api/notes', None, {'Accept': 'application/x-ndjson'})]:
+        status, body, _ = api.call(method, path, json=json, headers=headers)
+        assert status == (expected or 200), path
+        if expected:
+            assert 'Flask app' in body['error']
+    for path in ('/api/notes/generate/stream', f"/api/notes/{note['id']}/translate/stream"):
+        assert api.call('POST', path, json={})[0] in ((expected,) if expected else (400, 404))
+
+
+def test_asgi_note_routes_without_a_database(monkeypatch):
+    pytest.importorskip('starlette')
+    pytest.importorskip('motor')
+    from starlette.testclient import TestClient
+    from src.asgi import create_app
+    for name in ('MONGODB_URI', 'MONGO_URI'):
+        monkeypatch.delenv(name, raising=False)
+    note = '/api/notes/0123456789abcdef01234567'
+    with TestClient(create_app()) as client:
+        for method, path in [('GET', note), ('PUT', note), ('DELETE', note), ('POST', f'{note}/translate'),
+                             ('POST', '/api/notes')]:
+            r = client.request(method, path, json={'title': 'T', 'content': 'c', 'to': 'French'})
+            assert r.status_code == 503, (method, path)
+            assert r.json()['type'] == 'configuration_error'
+
+
+def test_llm_routes_are_rate_limited(api, fake_llm, monkeypatch):
+    from src import admission
+    limiters = {group: admission.ConcurrencyLimiter(limit=4, max_queue=0) for group in ('generate', 'translate')}
+    controller = admission.AdmissionController(admission.RateLimiter(per_minute=1, burst=2), limiters)
+    monkeypatch.setattr(admission, 'controller', controller)
+    monkeypatch.setattr(admission, 'ENABLED', True)
+    _, note, _ = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'c'})
+
+    assert api.call('POST', f"/api/notes/{note['id']}/translate", json={'to': 'French', 'token': 't'})[0] == 200
+    assert api.call('POST', '/api/notes/generate', json={'prompt': 'p', 'async': True})[0] == 202
+    status, body, headers = api.call('POST', '/api/notes/generate', json={'prompt': 'p', 'async': True})
+    assert status == 429 and body['reason'] == 'rate_limited' and int(headers['Retry-After']) >= 1
+    assert controller.stats()['admitted'] == 2
+    assert all(l.active == 0 for l in limiters.values())
+    assert api.call('GET', f"/api/notes/{note['id']}")[0] == 200
+
+
+def test_unchanged_save_with_if_match_keeps_the_version(api):
+    _, note, headers = api.call('POST', '/api/notes', json={'title': 'T', 'content': 'c'})
+    url = f"/api/notes/{note['id']}"
+    status, body, after = api.call('PUT', url, json={'content': 'c'}, headers={'If-Match': headers['ETag']})
+    assert (status, body['version'], after['ETag']) == (200, 1, headers['ETag'])
+    assert api.call('PUT', url, json={'content': 'd'}, headers={'If-Match': headers['ETag']})[0] == 200
+    assert api.call('PUT', url, json={'content': 'd'}, headers={'If-Match': headers['ETag']})[0] == 412
@@ -0,0 +1,74 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import jobs
+
+
+@pytest.fixture
+def coll(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    monkeypatch.setattr(jobs, 'RETRY_BASE_SECONDS', 0)
+    return mongomock.MongoClient().db.jobs
+
+
+def test_failed_attempts_are_retried_until_max_attempts(coll, monkeypatch):
+    calls = []
+
+    def flaky(params):
+        calls.append(params)
+        raise RuntimeError('upstream down')
+
+    monkeypatch.setitem(jobs.HANDLERS, 'flaky', flaky)
+    job_id = jobs.enqueue(coll, 'flaky', {'n': 1}, max_attempts=2)
+    assert jobs.run_job(coll, jobs.claim(coll, 'w')) == jobs.QUEUED
+    assert jobs.run_job(coll, jobs.claim(coll, 'w')) == jobs.FAILED
+    assert jobs.claim(coll, 'w') is None
+    doc = coll.find_one({'_id': job_id})
+    assert doc['attempts'] == 2 and doc['error'] == 'upstream down'
+    assert len(calls) == 2
+
+
+def test_permanent_errors_and_success(coll, monkeypatch):
+    def gone(params):
+        raise jobs.PermanentJobError('Note not found')
+
+    monkeypatch.setitem(jobs.HANDLERS, 'gone', gone)
+    monkeypatch.setitem(jobs.HANDLERS, 'echo', lambda params: {'echo': params['v']})
+    gone_id = jobs.enqueue(coll, 'gone', {})
+    echo_id = jobs.enqueue(coll, 'echo', {'v': 3})
+    assert jobs.run_job(coll, jobs.claim(coll, 'w')) == jobs.FAILED
+    assert jobs.run_job(coll, jobs.claim(coll, 'w')) == jobs.SUCCEEDED
+    assert coll.find_one({'_id': gone_id})['attempts'] == 1
+    assert jobs.job_to_dict(coll.find_one({'_id': echo_id}))['result'] == {'echo': 3}
+
+
+def test_lease_is_renewed_while_the_handler_runs(coll, monkeypatch):
+    monkeypatch.setattr(jobs, 'LEASE_SECONDS', 0.06)
+    taken = []
+
+    def slow(params):
+        time.sleep(0.25)
+        # the lease would have expired three times over without renewal
+        taken.append(jobs.claim(coll, 'other'))
+        return 'done'
+
+    monkeypatch.setitem(jobs.HANDLERS, 'slow', slow)
+    job_id = jobs.enqueue(coll, 'slow', {})
+    assert jobs.run_job(coll, jobs.claim(coll, 'w')) == jobs.SUCCEEDED
+    assert taken == [None]
+    assert coll.find_one({'_id': job_id})['attempts'] == 1
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(coll):
+    job_id = jobs.enqueue(coll, 'anything', {}, max_attempts=2)
+    past = datetime.utcnow() - timedelta(seconds=1)
+    assert jobs.claim(coll, 'w')['attempts'] == 1
+    coll.update_one({'_id': job_id}, {'$set': {'lease_until': past}})
+    # the first worker vanished; one attempt is left, so another worker takes over
+    assert jobs.claim(coll, 'w2')['attempts'] == 2
+    coll.update_one({'_id': job_id}, {'$set': {'lease_until': past}})
+    assert jobs.claim(coll, 'w3') is None
+    doc = coll.find_one({'_id': job_id})
+    assert doc['status'] == jobs.FAILED and doc['attempts'] == 2 and 'lease' not in doc
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from src import json_provider
+from src.json_provider import FastJSONProvider
+from src.models.note import doc_to_dict, make_note_doc
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def app(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def test_encodes_objectid_and_datetime_like_the_old_serializer(app):
+    doc = make_note_doc('Title', 'Body')
+    doc['_id'] = ObjectId()
+    doc['created_at'] = datetime(2024, 1, 2, 3, 4, 5, 678000)
+    encoded = json.loads(app.json.dumps(doc_to_dict(doc)))
+    assert encoded['id'] == str(doc['_id'])
+    assert encoded['created_at'] == '2024-01-02T03:04:05.678000'
+    assert encoded['updated_at'] == doc['updated_at'].isoformat()
+
+
+def test_response_round_trips(app):
+    with app.app_context():
+        resp = app.json.response({'id': ObjectId('65f000000000000000000000'), 'title': 'ü'})
+    assert resp.mimetype == 'application/json'
+    assert app.json.loads(resp.get_data()) == {'id': '65f000000000000000000000', 'title': 'ü'}
+
+
+def test_rejects_unknown_types(app):
+    with pytest.raises(TypeError):
+        app.json.dumps({'x': object()})
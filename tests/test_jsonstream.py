@@ -0,0 +1,27 @@
+import json
+
+from src.jsonstream import JSONFieldStream
+
+
+def feed_all(text, size):
+    parser = JSONFieldStream()
+    deltas = []
+    for i in range(0, len(text), size):
+        deltas.extend(parser.feed(text[i:i + size]))
+    return parser, deltas
+
+
+def test_fields_stream_out_of_fenced_json_in_any_chunking():
+    note = {'title': 'Café "list" \U0001F600', 'content': 'Milk\nEggs\t\\ done'}
+    raw = 'Here you go:\n```json\n' + json.dumps(note) + '\n```'
+    for size in (1, 2, 5, len(raw)):
+        parser, deltas = feed_all(raw, size)
+        assert parser.done and not parser.failed
+        assert parser.values == note
+        assert ''.join(text for field, text in deltas if field == 'content') == note['content']
+
+
+def test_non_string_values_stop_the_parser():
+    parser, deltas = feed_all('{"title": "ok", "tags": ["a"]}', 3)
+    assert parser.failed
+    assert parser.values == {'title': 'ok'}
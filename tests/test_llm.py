@@ -23,3 +23,63 @@ def test_translate_with_fake_token(monkeypatch, monkeypatchascontext):
     monkeypatch.setattr(llm, 'call_llm_model', fake_call)
     result = translate("hello", target_language="French", api_token="fake-token")
     assert result == "Bonjour"
+
+
+def test_translate_fields_keeps_successful_fields(monkeypatch):
+    from src import llm
+
+    def fake_call(model, messages, temperature=0.2, top_p=1.0, api_token=None):
+        text = messages[-1]['content']
+        if '{' in text:
+            # structured reply that leaves out one field
+            return '```json\n{"title": "Bonjour"}\n```'
+        if 'broken' in text:
+            raise RuntimeError('upstream error')
+        return 'Monde'
+
+    monkeypatch.setattr(llm, 'call_llm_model', fake_call)
+    monkeypatch.setattr(llm, 'translation_cache', None)
+    fields = {'title': 'Hello', 'content': 'broken', 'empty': ''}
+    for mode in llm.TRANSLATE_MODES:
+        translated, errors = llm.translate_fields(fields, 'French', api_token='t', mode=mode)
+        assert errors == {'content': 'upstream error'}
+        assert translated['empty'] == ''
+        assert translated['title'] == ('Bonjour' if mode == 'combined' else 'Monde')
+
+
+def test_translate_languages_yields_each_language(monkeypatch):
+    from src import llm
+
+    def fake_call(model, messages, temperature=0.2, top_p=1.0, api_token=None):
+        target = messages[-1]['content'].split(':')[0].split()[-1]
+        return f'{target} text'
+
+    monkeypatch.setattr(llm, 'call_llm_model', fake_call)
+    monkeypatch.setattr(llm, 'translation_cache', None)
+    results = list(llm.translate_languages({'title': 'Hi', 'content': 'There'}, ['French', 'German', 'Spanish'],
+                                           api_token='t', max_concurrency=2))
+    assert sorted(target for target, _, _ in results) == ['French', 'German', 'Spanish']
+    for target, translated, errors in results:
+        assert translated == {'title': f'{target} text', 'content': f'{target} text'} and errors == {}
+
+
+def test_cached_translations_are_scoped_to_the_token(monkeypatch):
+    from src import llm
+    from src.translation_cache import TranslationCache
+
+    calls = []
+
+    def fake_call(model, messages, temperature=0.2, top_p=1.0, api_token=None):
+        calls.append(api_token)
+        return 'Bonjour'
+
+    monkeypatch.setattr(llm, 'call_llm_model', fake_call)
+    monkeypatch.setattr(llm, 'translation_cache', TranslationCache())
+    monkeypatch.setattr(llm, 'env_token', None)
+    assert translate('hello', 'French', api_token='a') == 'Bonjour'
+    assert translate('hello', 'French', api_token='a') == 'Bonjour'
+    assert calls == ['a']
+    # other tokens, or none at all, miss the cache and go to the model, which checks the token
+    translate('hello', 'French', api_token='b')
+    translate('hello', 'French')
+    assert calls == ['a', 'b', None]
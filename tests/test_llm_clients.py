@@ -0,0 +1,25 @@
+from src.llm import ClientManager
+
+
+def test_clients_are_reused_per_endpoint_and_token():
+    manager = ClientManager(max_clients=2)
+    a = manager.get('https://example.test/v1', 'token-a')
+    assert manager.get('https://example.test/v1', 'token-a') is a
+    b = manager.get('https://example.test/v1', 'token-b')
+    assert b is not a
+    # All clients share the one pooled HTTP client.
+    assert a._client is b._client
+    assert manager.stats()['created'] == 2 and manager.stats()['reused'] == 1
+    manager.close()
+
+
+def test_least_recently_used_client_is_evicted():
+    manager = ClientManager(max_clients=2)
+    a = manager.get('https://example.test/v1', 'a')
+    manager.get('https://example.test/v1', 'b')
+    manager.get('https://example.test/v1', 'a')
+    manager.get('https://example.test/v1', 'c')
+    assert manager.get('https://example.test/v1', 'a') is a
+    assert manager.evictions == 1
+    assert manager.stats()['clients'] == 2
+    manager.close()
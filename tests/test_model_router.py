@@ -0,0 +1,104 @@
+import pytest
+
+from src import llm
+from src.model_router import AUTO, MIN_SAMPLES, ModelRouter
+from src.resilience import CallerGroup, CircuitBreaker, ResilientCaller
+
+
+def upstream_error(message):
+    """A RuntimeError wrapping a retryable failure, the way call_llm_model raises it."""
+    error = RuntimeError(f'Failed to call LLM API: {message}')
+    error.__cause__ = ConnectionError(message)
+    return error
+
+
+def observe(router, model, seconds, ok=True, n=MIN_SAMPLES):
+    for _ in range(n):
+        router._stats(model).record(seconds, ok)
+
+
+def test_short_inputs_prefer_the_fastest_model_long_inputs_keep_order():
+    router = ModelRouter(['big', 'small'], short_tokens=100)
+    observe(router, 'big', 3.0)
+    observe(router, 'small', 0.5)
+    assert router.candidates('translate', 20) == ['small', 'big']
+    assert router.candidates('translate', 1000) == ['big', 'small']
+
+
+def test_failing_or_slow_models_are_demoted():
+    router = ModelRouter(['a', 'b', 'c'], max_p95=5.0, max_error_rate=0.5)
+    observe(router, 'a', 1.0, ok=False)
+    observe(router, 'b', 9.0)
+    assert router.candidates('generate', 1000) == ['c', 'b', 'a']
+    assert router.stats()['models']['a']['healthy'] is False
+
+
+def test_call_falls_back_to_the_next_candidate():
+    router = ModelRouter(['primary', 'backup'], task_models={'generate': ['backup', 'primary']})
+    tried = []
+
+    def fn(model):
+        tried.append(model)
+        if model == 'primary':
+            raise upstream_error('503')
+        return 'ok from ' + model
+
+    assert router.call('translate', 1000, fn) == 'ok from backup'
+    assert tried == ['primary', 'backup']
+    assert router.stats()['fallbacks'] == 1
+    with pytest.raises(RuntimeError):
+        router.call('translate', 1000, lambda model: (_ for _ in ()).throw(upstream_error('down')))
+
+
+def test_client_errors_are_raised_without_fallback_or_blame():
+    router = ModelRouter(['primary', 'backup'])
+    tried = []
+
+    def fn(model):
+        tried.append(model)
+        raise RuntimeError('No API token provided.')
+
+    with pytest.raises(RuntimeError, match='No API token'):
+        router.call('translate', 1000, fn)
+    assert tried == ['primary']
+    assert [m['calls'] for m in router.stats()['models'].values()] == [0, 0]
+
+
+def test_a_failing_model_does_not_open_the_next_models_circuit():
+    guards = CallerGroup(lambda: ResilientCaller(retries=0, breaker=CircuitBreaker(failure_threshold=2,
+                                                                                   reset_timeout=60)))
+    router = ModelRouter(['m1', 'm2'])
+
+    def fn(model):
+        def attempt(timeout):
+            if model == 'm1':
+                raise ConnectionError('503 Service Unavailable')
+            return 'ok from ' + model
+        try:
+            return guards.get(model).call(attempt)
+        except Exception as e:
+            raise RuntimeError(f'Failed to call LLM API: {e}') from e
+
+    assert [router.call('translate', 1000, fn) for _ in range(8)] == ['ok from m2'] * 8
+    assert guards.stats()['m1']['circuit'] == 'open' and guards.stats()['m2']['circuit'] == 'closed'
+    models = router.stats()['models']
+    # only the calls that reached m1 count against it; short-circuited ones are not blamed again
+    assert (models['m1']['calls'], models['m1']['error_rate']) == (2, 1.0)
+    assert (models['m2']['calls'], models['m2']['error_rate']) == (8, 0.0)
+
+
+def test_translate_routes_when_no_model_is_named(monkeypatch):
+    monkeypatch.setattr(llm, 'router', ModelRouter(['m1', 'm2']))
+    monkeypatch.setattr(llm, 'translation_cache', None)
+    used = []
+
+    def fake(model, messages, temperature=1.0, top_p=1.0, api_token=None):
+        used.append(model)
+        if model == 'm1':
+            raise upstream_error('timeout')
+        return 'Hallo'
+
+    monkeypatch.setattr(llm, 'call_llm_model', fake)
+    assert llm.default_model() == AUTO
+    assert llm.translate('Hello', 'German', api_token='t') == 'Hallo'
+    assert used == ['m1', 'm2']
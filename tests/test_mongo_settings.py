@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from src import mongo_settings
+from src.mongo_settings import available_compressors, client_options, start_warm_up
+
+
+def test_defaults_keep_driver_settings_and_the_existing_timeouts():
+    options = client_options({'MONGO_COMPRESSORS': 'none'})
+    assert options == {'serverSelectionTimeoutMS': 5000, 'connectTimeoutMS': 10000, 'appname': 'notetaker'}
+
+
+def test_options_from_env():
+    options = client_options({'MONGO_MAX_POOL_SIZE': '50', 'MONGO_MIN_POOL_SIZE': '5', 'MONGO_TIMEOUT_MS': '8000',
+                              'MONGO_READ_PREFERENCE': 'nearest', 'MONGO_WRITE_CONCERN': '1',
+                              'MONGO_JOURNAL': 'off', 'MONGO_COMPRESSORS': 'zlib'})
+    assert options['maxPoolSize'] == 50 and options['minPoolSize'] == 5 and options['timeoutMS'] == 8000
+    assert options['readPreference'] == 'nearest'
+    assert options['w'] == 1 and options['journal'] is False
+    assert options['compressors'] == 'zlib'
+    with pytest.raises(ValueError):
+        client_options({'MONGO_READ_PREFERENCE': 'fastest'})
+
+
+def test_compressors_without_their_package_are_skipped(monkeypatch):
+    monkeypatch.setattr(mongo_settings.importlib.util, 'find_spec', lambda name: None)
+    assert available_compressors(['zstd', 'snappy', 'zlib']) == ['zlib']
+    with pytest.raises(ValueError):
+        available_compressors(['lz4'])
+    # zlib is never picked by default
+    assert 'compressors' not in client_options({})
+    assert client_options({'MONGO_COMPRESSORS': 'zstd,zlib'})['compressors'] == 'zlib'
+
+
+def test_default_compressors_when_installed(monkeypatch):
+    monkeypatch.setattr(mongo_settings.importlib.util, 'find_spec', lambda name: object())
+    assert client_options({})['compressors'] == 'zstd,snappy'
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.pings = 0
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.admin = self
+
+    def command(self, name):
+        if self.fail:
+            raise ConnectionError('no servers')
+        with self.lock:
+            self.pings += 1
+
+
+def test_warm_up_opens_the_requested_connections_and_records_failures():
+    client = FakeClient()
+    start_warm_up(client, mode='eager', connections=3, env={})
+    assert client.pings == 4  # server selection, then one ping per connection
+    assert mongo_settings.stats()['warmup']['status'] == 'done'
+
+    start_warm_up(FakeClient(fail=True), mode='background', env={}).join(2)
+    assert mongo_settings.stats()['warmup']['status'] == 'failed'
+    assert start_warm_up(client, mode='off', env={}) is None
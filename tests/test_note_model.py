@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from src.models.note import (SUMMARY_FIELDS, doc_to_dict, make_note_doc, make_snippet,
+                             note_projection, parse_fields)
+
+
+def test_make_snippet_collapses_whitespace_and_truncates_on_word_boundary():
+    assert make_snippet('  hello\n\n world ') == 'hello world'
+    snippet = make_snippet('word ' * 100, length=32)
+    assert snippet.endswith('…')
+    assert len(snippet) <= 33
+    assert not snippet[:-1].endswith(' ')
+
+
+def test_make_note_doc_stores_snippet():
+    doc = make_note_doc('Title', 'Body text')
+    assert doc['snippet'] == 'Body text'
+
+
+def test_parse_fields():
+    assert parse_fields() is None
+    assert parse_fields(view='summary') == SUMMARY_FIELDS
+    assert parse_fields('title,updated_at') == ('id', 'title', 'updated_at')
+    with pytest.raises(ValueError):
+        parse_fields('title,password')
+    with pytest.raises(ValueError):
+        parse_fields(view='tiny')
+
+
+def test_summary_projection_and_serialization():
+    projection = note_projection(SUMMARY_FIELDS)
+    assert 'content' not in projection and 'translations' not in projection
+    assert projection['updated_at'] == 1
+
+    doc = {'_id': ObjectId(), 'title': 'T', 'snippet': 'S', 'updated_at': datetime(2024, 1, 1)}
+    out = doc_to_dict(doc, SUMMARY_FIELDS)
+    assert set(out) == set(SUMMARY_FIELDS)
+    assert out['snippet'] == 'S'
+
+
+def test_etag_version_round_trip():
+    from werkzeug.http import parse_etags
+    from src.models.note import etag_version, note_etag, version_filter
+
+    oid = ObjectId()
+    tag = note_etag({'_id': oid, 'version': 7})
+    assert etag_version(parse_etags(f'"other-3", "{tag}"'), oid) == 7
+    assert etag_version(parse_etags('"other-3"'), oid) is None
+    assert version_filter(0) == {'version': {'$in': [0, None]}}
+    assert version_filter(7) == {'version': 7}
+
+
+def test_is_noop_update():
+    from src.models.note import is_noop_update, note_update_fields
+
+    doc = make_note_doc('Title', 'Body')
+    doc['translations'] = {'French': {'title': 'Titre', 'content': 'Corps'}}
+    assert is_noop_update(doc, note_update_fields({'title': 'Title', 'content': 'Body'}))
+    assert is_noop_update(doc, note_update_fields({'translations': {'French': {'title': 'Titre', 'content': 'Corps'}}}))
+    assert not is_noop_update(doc, note_update_fields({'content': 'Body!'}))
+    assert not is_noop_update(doc, note_update_fields({'title': 'Other'}))
+
+    legacy = {'title': 'Title', 'content': 'Body'}  # written before content_hash existed
+    assert is_noop_update(legacy, note_update_fields({'content': 'Body'}))
@@ -0,0 +1,310 @@
+"""Route-level tests for /api/notes on the Flask app, backed by mongomock."""
+import time
+
+import pytest
+from bson import ObjectId
+
+mongomock = pytest.importorskip('mongomock')
+
+from src.cache import note_cache_from_env
+from src.models.note import content_hash
+from src.search import IndexHolder
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('JOB_WORKERS', '0')
+    from src.main import app
+    monkeypatch.setitem(app.config, 'MONGO_DB', mongomock.MongoClient().notes_test)
+    monkeypatch.setitem(app.config, 'NOTE_INDEXES_READY', False)
+    monkeypatch.setitem(app.extensions, 'note_cache', note_cache_from_env())
+    monkeypatch.setitem(app.extensions, 'note_search', IndexHolder())
+    return app.test_client()
+
+
+def create(client, title='T', content='Body'):
+    r = client.post('/api/notes', json={'title': title, 'content': content})
+    assert r.status_code == 201
+    return r.get_json(), r.headers['ETag']
+
+
+def test_update_rejects_if_match_that_disagrees_with_body_version(client):
+    note, etag = create(client)
+    url = f"/api/notes/{note['id']}"
+    r = client.put(url, json={'content': 'Two', 'version': 1}, headers={'If-Match': etag})
+    assert r.status_code == 200 and r.get_json()['version'] == 2
+
+    # stale If-Match with the current body version
+    r = client.put(url, json={'content': 'Three', 'version': 2}, headers={'If-Match': etag})
+    assert r.status_code == 412
+    assert client.get(url).get_json()['content'] == 'Two'
+
+    current = client.get(url).headers['ETag']
+    r = client.put(url, json={'content': 'Three', 'version': 2}, headers={'If-Match': current})
+    assert r.status_code == 200 and r.get_json()['version'] == 3
+
+
+def batch(client, *operations):
+    r = client.post('/api/notes/batch', json={'operations': list(operations)})
+    assert r.status_code == 200
+    return [(item['status'], item.get('error')) for item in r.get_json()['results']]
+
+
+def test_batch_validates_each_operation(client):
+    note, _ = create(client)
+    assert client.post('/api/notes/batch', json={'operations': []}).status_code == 400
+    assert client.post('/api/notes/batch', json={}).status_code == 400
+    results = batch(client,
+                    {'op': 'create', 'title': 'New', 'content': 'c'},
+                    {'op': 'create', 'title': 'no content'},
+                    {'op': 'rename', 'id': note['id']},
+                    {'op': 'update', 'id': 'not-an-id', 'title': 'x'},
+                    {'op': 'update', 'id': note['id']},
+                    {'op': 'delete', 'id': str(ObjectId())},
+                    'not an object')
+    assert [status for status, _ in results] == [201, 400, 400, 400, 400, 404, 400]
+    assert results[3][1] == 'Invalid note id'
+    # the bad items did not stop the good one
+    assert [n['title'] for n in client.get('/api/notes').get_json()['notes']] == ['New', 'T']
+
+    results = batch(client, {'op': 'update', 'id': note['id'], 'title': 'a'},
+                    {'op': 'delete', 'id': note['id']})
+    assert results == [(200, None), (400, 'Note appears more than once in the batch')]
+
+
+def test_batch_updates_and_deletes_are_version_conditioned(client):
+    a, _ = create(client, 'A')
+    b, _ = create(client, 'B')
+    c, _ = create(client, 'C')
+    results = batch(client,
+                    {'op': 'update', 'id': a['id'], 'title': 'A2', 'version': 1},
+                    {'op': 'update', 'id': b['id'], 'title': 'B2', 'version': 5},
+                    {'op': 'delete', 'id': c['id'], 'version': 1})
+    assert results == [(200, None), (409, 'Version conflict'), (204, None)]
+    assert client.get(f"/api/notes/{a['id']}").get_json()['version'] == 2
+    assert client.get(f"/api/notes/{b['id']}").get_json()['title'] == 'B'
+    assert client.get(f"/api/notes/{c['id']}").status_code == 404
+    assert batch(client, {'op': 'delete', 'id': a['id'], 'version': 1}) == [(409, 'Version conflict')]
+
+
+def test_batch_reports_notes_changed_between_read_and_write(client, monkeypatch):
+    from src.routes import note as routes
+    a, _ = create(client, 'A')
+    b, _ = create(client, 'B')
+    bump = routes.bump_watermark
+
+    def concurrent_write(db, by=1):
+        # another writer updates A after the batch read the versions
+        if by == 2:
+            db.notes.update_one({'_id': ObjectId(a['id'])}, {'$inc': {'version': 1}, '$set': {'title': 'other'}})
+        return bump(db, by=by)
+
+    monkeypatch.setattr(routes, 'bump_watermark', concurrent_write)
+    results = batch(client, {'op': 'update', 'id': a['id'], 'title': 'A2'},
+                    {'op': 'update', 'id': b['id'], 'title': 'B2'})
+    assert results == [(409, 'Version conflict'), (200, None)]
+    assert client.get(f"/api/notes/{a['id']}").get_json()['title'] == 'other'
+
+
+def test_batch_maps_bulk_write_errors_to_operations(client, monkeypatch):
+    from pymongo.errors import BulkWriteError
+    from src.main import app
+    coll = app.config['MONGO_DB'].notes
+    a, _ = create(client, 'A')
+    real = type(coll).bulk_write
+
+    def partly_failing(self, requests, ordered=True, **kwargs):
+        # the second request fails (e.g. a duplicate key); the others are written
+        outcome = real(self, requests[:1] + requests[2:], ordered=ordered, **kwargs).bulk_api_result
+        outcome['writeErrors'] = [{'index': 1, 'code': 11000, 'errmsg': 'E11000 duplicate key error'}]
+        raise BulkWriteError(outcome)
+
+    monkeypatch.setattr(type(coll), 'bulk_write', partly_failing)
+    results = batch(client, {'op': 'create', 'title': 'N1', 'content': 'c'},
+                    {'op': 'create', 'title': 'N2', 'content': 'c'},
+                    {'op': 'update', 'id': a['id'], 'title': 'A2'})
+    assert results == [(201, None), (500, 'E11000 duplicate key error'), (200, None)]
+    assert client.get(f"/api/notes/{a['id']}").get_json()['title'] == 'A2'
+
+
+def test_streamed_list_returns_a_cursor_when_limit_cuts_it_short(client):
+    for i in range(5):
+        create(client, f'n{i}')
+    r = client.get('/api/notes?stream=1&limit=2&fields=title')
+    page = r.get_json()
+    assert [n['title'] for n in page['notes']] == ['n4', 'n3']
+    titles = []
+    while page['next_cursor']:
+        titles += [n['title'] for n in page['notes']]
+        page = client.get(f"/api/notes?stream=1&limit=2&fields=title&cursor={page['next_cursor']}").get_json()
+    titles += [n['title'] for n in page['notes']]
+    assert titles == ['n4', 'n3', 'n2', 'n1', 'n0']
+
+    assert client.get('/api/notes?stream=1&limit=5').get_json()['next_cursor'] is None
+    assert client.get('/api/notes?stream=1').get_json()['next_cursor'] is None
+    r = client.get('/api/notes?limit=2', headers={'Accept': 'application/x-ndjson'})
+    assert len(r.get_data(as_text=True).splitlines()) == 2
+
+
+def test_note_etag_and_if_none_match(client):
+    note, etag = create(client)
+    url = f"/api/notes/{note['id']}"
+    r = client.get(url)
+    assert r.headers['ETag'] == etag == f'"{note["id"]}-1"'
+    assert r.headers['Cache-Control'] == 'no-cache'
+    r = client.get(url, headers={'If-None-Match': etag})
+    assert r.status_code == 304 and r.headers['ETag'] == etag and not r.data
+
+    client.put(url, json={'title': 'New'})
+    r = client.get(url, headers={'If-None-Match': etag})
+    assert r.status_code == 200 and r.headers['ETag'] == f'"{note["id"]}-2"'
+
+
+def test_list_etag_follows_the_watermark_and_query(client):
+    note, _ = create(client)
+    r = client.get('/api/notes?limit=10')
+    etag = r.headers['ETag']
+    assert client.get('/api/notes?limit=10', headers={'If-None-Match': etag}).status_code == 304
+    # the same watermark with other query args is a different representation
+    assert client.get('/api/notes?limit=5', headers={'If-None-Match': etag}).status_code == 200
+
+    create(client, 'Other')
+    r = client.get('/api/notes?limit=10', headers={'If-None-Match': etag})
+    assert r.status_code == 200 and r.headers['ETag'] != etag
+    etag = r.headers['ETag']
+    client.delete(f"/api/notes/{note['id']}")
+    assert client.get('/api/notes?limit=10', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_stale_if_match_fails_updates_and_deletes(client):
+    note, etag = create(client)
+    url = f"/api/notes/{note['id']}"
+    assert client.put(url, json={'title': 'Two'}, headers={'If-Match': etag}).status_code == 200
+
+    assert client.put(url, json={'title': 'Three'}, headers={'If-Match': etag}).status_code == 412
+    assert client.put(url, json={'title': 'Three'}, headers={'If-Match': '"other-1"'}).status_code == 412
+    assert client.delete(url, headers={'If-Match': etag}).status_code == 412
+    assert client.get(url).get_json()['title'] == 'Two'
+
+    current = client.get(url).headers['ETag']
+    assert client.delete(url, headers={'If-Match': current}).status_code == 204
+    assert client.delete(url, headers={'If-Match': current}).status_code == 404
+    assert client.put(url, json={'title': 'x'}, headers={'If-Match': '*'}).status_code == 404
+
+
+def sync(client, token=None, **args):
+    if token:
+        args['since'] = token
+    query = '&'.join(f'{k}={v}' for k, v in args.items())
+    # tokens have millisecond resolution: a note written in the same millisecond the token is issued
+    # falls inside even a zero grace window and would be re-sent by the next poll
+    time.sleep(0.002)
+    r = client.get(f'/api/notes/changes?{query}')
+    assert r.status_code == 200
+    return r.get_json()
+
+
+def test_changes_report_updates_and_deletes_since_a_token(client, monkeypatch):
+    from src import sync as sync_module
+    monkeypatch.setattr(sync_module, 'GRACE_SECONDS', 0)
+    a, _ = create(client, 'A')
+    b, _ = create(client, 'B')
+    full = sync(client)
+    assert sorted(n['title'] for n in full['changed']) == ['A', 'B']
+    assert full['deleted'] == [] and full['has_more'] is False
+
+    client.put(f"/api/notes/{a['id']}", json={'title': 'A2'})
+    assert client.delete(f"/api/notes/{b['id']}").status_code == 204
+    c, _ = create(client, 'C')
+    delta = sync(client, full['next_token'], fields='title')
+    assert [(n['id'], n['title']) for n in delta['changed']] == [(a['id'], 'A2'), (c['id'], 'C')]
+    assert delta['deleted'] == [b['id']]
+    # the tombstone is invisible everywhere else
+    assert client.get(f"/api/notes/{b['id']}").status_code == 404
+    assert b['id'] not in [n['id'] for n in client.get('/api/notes').get_json()['notes']]
+
+    again = sync(client, delta['next_token'])
+    assert (again['changed'], again['deleted'], again['has_more']) == ([], [], False)
+
+
+def test_changes_page_through_with_tokens(client, monkeypatch):
+    from src import sync as sync_module
+    monkeypatch.setattr(sync_module, 'GRACE_SECONDS', 0)
+    ids = [create(client, f'n{i}')[0]['id'] for i in range(5)]
+
+    def drain(token):
+        seen, deleted, pages = [], [], 0
+        while True:
+            page = sync(client, token, limit=2)
+            seen += [n['id'] for n in page['changed']]
+            deleted += page['deleted']
+            token, pages = page['next_token'], pages + 1
+            if not page['has_more']:
+                return seen, deleted, token, pages
+
+    seen, deleted, token, pages = drain(None)
+    assert (seen, deleted, pages) == (ids, [], 3)
+
+    for note_id in ids[:3]:
+        client.put(f'/api/notes/{note_id}', json={'content': 'edited'})
+    client.delete(f'/api/notes/{ids[4]}')
+    seen, deleted, token, pages = drain(token)
+    assert (seen, deleted, pages) == (ids[:3], [ids[4]], 2)
+
+
+def test_changes_reject_bad_and_expired_tokens(client):
+    from src.sync import encode_token
+    assert client.get('/api/notes/changes?since=garbage').status_code == 400
+    assert client.get('/api/notes/changes?limit=0').status_code == 400
+    r = client.get(f'/api/notes/changes?since={encode_token(1, 0)}')
+    assert r.status_code == 410
+
+
+def patch(client, note_id, base_version, ops, result, **extra):
+    return client.patch(f'/api/notes/{note_id}', json={'base_version': base_version, 'ops': ops,
+                                                       'checksum': content_hash(result), **extra})
+
+
+def test_patch_applies_a_delta_to_the_stored_content(client):
+    note, _ = create(client, content='Hello world')
+    r = patch(client, note['id'], 1, [{'pos': 6, 'del': 5, 'ins': 'there'}, [11, 0, '!']], 'Hello there!',
+              title='Greeting')
+    assert r.status_code == 200
+    body = r.get_json()
+    assert set(body) == {'id', 'title', 'snippet', 'created_at', 'updated_at', 'version'}
+    assert (body['title'], body['snippet'], body['version']) == ('Greeting', 'Hello there!', 2)
+    assert r.headers['ETag'] == f'"{note["id"]}-2"'
+    saved = client.get(f"/api/notes/{note['id']}").get_json()
+    assert (saved['content'], saved['version']) == ('Hello there!', 2)
+
+
+def test_patch_rejects_stale_base_versions_and_bad_deltas(client):
+    note, _ = create(client, content='Hello world')
+    client.put(f"/api/notes/{note['id']}", json={'content': 'Hello world, again'})
+
+    r = patch(client, note['id'], 1, [[0, 5, 'Howdy']], 'Howdy world')
+    assert r.status_code == 409
+    assert r.get_json()['current_version'] == 2 and r.get_json()['note']['content'] == 'Hello world, again'
+    # ops that do not fit the base text, and a result whose checksum does not match
+    assert patch(client, note['id'], 2, [[50, 1, '']], 'Hello world, again').status_code == 422
+    assert patch(client, note['id'], 2, [[4, 2, 'x'], [5, 0, 'y']], 'Hellxyorld, again').status_code == 422
+    assert patch(client, note['id'], 2, [[0, 5, 'Howdy']], 'something else').status_code == 422
+    # malformed requests
+    assert patch(client, note['id'], '2', [], 'Hello world, again').status_code == 400
+    assert client.patch(f"/api/notes/{note['id']}", json={'base_version': 2, 'ops': []}).status_code == 400
+    assert patch(client, 'not-an-id', 2, [], '').status_code == 400
+    assert patch(client, str(ObjectId()), 1, [], '').status_code == 404
+    assert client.get(f"/api/notes/{note['id']}").get_json()['version'] == 2
+
+
+def test_unchanged_save_with_current_if_match_is_not_written(client):
+    note, etag = create(client)
+    url = f"/api/notes/{note['id']}"
+    for headers in ({'If-Match': etag}, {'If-Match': '*'}):
+        r = client.put(url, json={'title': 'T', 'content': 'Body'}, headers=headers)
+        assert r.status_code == 200 and r.headers['ETag'] == etag
+        assert r.get_json()['version'] == 1
+
+    assert client.put(url, json={'title': 'Two'}, headers={'If-Match': etag}).status_code == 200
+    # a stale If-Match still fails even when the save changes nothing
+    assert client.put(url, json={'title': 'Two'}, headers={'If-Match': etag}).status_code == 412
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from src.pagination import (CursorError, decode_cursor, encode_cursor,
+                            keyset_filter, parse_limit, MAX_LIMIT, DEFAULT_LIMIT)
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    updated = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    cursor = encode_cursor({'_id': oid, 'updated_at': updated})
+    assert decode_cursor(cursor) == (updated, oid)
+
+
+def test_cursor_without_updated_at():
+    oid = ObjectId()
+    cursor = encode_cursor({'_id': oid})
+    assert decode_cursor(cursor) == (None, oid)
+    assert keyset_filter(cursor) == {'updated_at': None, '_id': {'$lt': oid}}
+
+
+def test_invalid_cursor_raises():
+    with pytest.raises(CursorError):
+        decode_cursor('not-a-cursor')
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    oid = ObjectId()
+    updated = datetime(2024, 5, 1)
+    clauses = keyset_filter(encode_cursor({'_id': oid, 'updated_at': updated}))['$or']
+    assert {'updated_at': {'$lt': updated}} in clauses
+    assert {'updated_at': updated, '_id': {'$lt': oid}} in clauses
+
+
+def test_parse_limit():
+    assert parse_limit(None) == DEFAULT_LIMIT
+    assert parse_limit('10') == 10
+    assert parse_limit(str(MAX_LIMIT * 10)) == MAX_LIMIT
+    with pytest.raises(CursorError):
+        parse_limit('0')
+    with pytest.raises(CursorError):
+        parse_limit('abc')
+
+
+def test_sync_token_round_trip():
+    from src.sync import SyncTokenError, decode_token, encode_token
+
+    assert decode_token(encode_token(42, 1700000000000)) == (42, 1700000000000, False)
+    assert decode_token(encode_token(42, 1700000000000, more=True)) == (42, 1700000000000, True)
+    with pytest.raises(SyncTokenError):
+        decode_token('garbage')
+
+
+def test_sync_pages_past_more_recent_notes_than_the_limit():
+    mongomock = pytest.importorskip('mongomock')
+    from src.models.note import bump_watermark
+    from src.sync import encode_token, fetch_changes
+
+    db = mongomock.MongoClient().db
+    now = datetime.utcnow()
+    for _ in range(600):
+        db.notes.insert_one({'title': 't', 'updated_at': now, 'change_seq': bump_watermark(db)})
+    # a client that has already synced everything, polling within the grace window
+    token = encode_token(600, int(time.time() * 1000))
+    seen = []
+    for _ in range(5):
+        docs, token, has_more = fetch_changes(db.notes, token, limit=500)
+        seen.extend(d['change_seq'] for d in docs)
+        if not has_more:
+            break
+    assert not has_more
+    assert sorted(set(seen)) == list(range(1, 601))
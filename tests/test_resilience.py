@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+
+
+def test_retryable_errors_are_retried_and_others_are_not():
+    caller = ResilientCaller(retries=2, retry_base=0)
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise TimeoutError('slow upstream')
+        return 'ok'
+
+    assert caller.call(flaky) == 'ok'
+    assert len(attempts) == 3 and caller.counts['retries'] == 2
+
+    def bad_request(timeout):
+        attempts.append(timeout)
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        caller.call(bad_request)
+    assert len(attempts) == 4
+
+
+def test_circuit_opens_then_recovers_after_a_trial_call():
+    caller = ResilientCaller(retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+
+    def down(timeout):
+        raise ConnectionError('refused')
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            caller.call(down)
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda timeout: 'not called')
+    time.sleep(0.06)
+    assert caller.call(lambda timeout: 'ok') == 'ok'
+    assert caller.breaker.state == 'closed'
+    assert caller.stats()['short_circuited'] == 1
+
+
+def test_hedge_answers_when_the_first_attempt_is_slow():
+    caller = ResilientCaller(hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        caller.call(lambda timeout: 'warm-up')
+    calls = []
+
+    def first_slow(timeout):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return 'slow'
+        return 'fast'
+
+    started = time.monotonic()
+    assert caller.call(first_slow) == 'fast'
+    assert time.monotonic() - started < 0.4
+    assert caller.counts['hedges'] == 1 and caller.counts['hedge_wins'] == 1
+
+
+def test_hedge_pool_does_not_cap_primaries():
+    caller = ResilientCaller(hedge=True, hedge_min_samples=3, max_hedge_workers=1)
+    for _ in range(3):
+        caller.call(lambda timeout: 'warm-up')
+
+    def slow(timeout):
+        time.sleep(0.2)
+        return 'ok'
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=caller.call, args=(slow,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # four primaries ran side by side; one hedge got the only hedge worker and the others were skipped
+    assert time.monotonic() - started < 0.35
+    assert caller.counts['hedges'] == 1 and caller.counts['hedges_skipped'] == 3
+
+
+def test_async_calls_retry_and_respect_the_deadline():
+    caller = ResilientCaller(deadline=0.3, retries=2, retry_base=0.01)
+    attempts = []
+
+    async def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            raise TimeoutError('slow upstream')
+        return 'ok'
+
+    assert asyncio.run(caller.call_async(flaky)) == 'ok'
+    assert len(attempts) == 2 and caller.stats()['retries'] == 1
+
+    async def hangs(timeout):
+        await asyncio.sleep(5)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(caller.call_async(hangs))
+    assert time.monotonic() - started < 1
@@ -0,0 +1,38 @@
+from src.search import SearchIndex, tokenize
+
+
+def test_tokenize_lowercases_and_splits_cjk_into_bigrams():
+    assert tokenize('Hello, World!') == ['hello', 'world']
+    assert tokenize('测试笔记') == ['测试', '试笔', '笔记']
+    assert tokenize('a.*(b+)+$') == ['a', 'b']
+
+
+def test_bm25_ranks_more_relevant_notes_first():
+    index = SearchIndex()
+    index.add('1', 'Groceries', 'milk eggs bread')
+    index.add('2', 'Meeting notes', 'discuss milk budget with the team and more filler words here')
+    index.add('3', 'Milk', 'remember the milk')
+    total, hits = index.search('milk')
+    assert total == 3
+    assert hits[0][0] == '3'
+
+
+def test_limit_offset_and_remove():
+    index = SearchIndex()
+    for i in range(5):
+        index.add(str(i), f'note {i}', 'shared term')
+    total, page = index.search('shared', limit=2, offset=2)
+    assert total == 5
+    assert len(page) == 2
+
+    index.remove('0')
+    assert index.search('shared')[0] == 4
+    assert len(index) == 4
+
+
+def test_reindex_replaces_old_terms():
+    index = SearchIndex()
+    index.add('1', 'draft', 'apples')
+    index.add('1', 'draft', 'oranges')
+    assert index.search('apples') == (0, [])
+    assert index.search('oranges')[0] == 1
@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    group = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do('k', slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while group.stats()['deduplicated'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert group.stats() == {'executed': 1, 'deduplicated': 4, 'dedup_ratio': 0.8, 'in_flight': 0}
+    # finished calls are not cached
+    assert group.do('k', lambda: 'again') == 'again'
+
+
+def test_errors_are_shared_and_not_remembered():
+    group = SingleFlight()
+
+    def boom():
+        raise RuntimeError('upstream')
+
+    with pytest.raises(RuntimeError):
+        group.do('k', boom)
+    assert group.do('k', lambda: 'ok') == 'ok'
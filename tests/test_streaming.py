@@ -0,0 +1,32 @@
+import json
+
+from flask import Flask, request
+
+from src.streaming import stream_documents, stream_mode
+
+app = Flask(__name__)
+
+
+@app.route('/items')
+def items():
+    docs = ({'n': i} for i in range(int(request.args.get('count', 5))))
+    return stream_documents(stream_mode(), docs, lambda d: {'value': d['n']},
+                            key='items', extra={'total': 5}, batch_size=2)
+
+
+def test_streamed_json_matches_buffered_shape():
+    resp = app.test_client().get('/items?stream=1')
+    assert resp.mimetype == 'application/json'
+    assert json.loads(resp.data) == {'items': [{'value': i} for i in range(5)], 'total': 5}
+
+
+def test_streamed_json_empty():
+    resp = app.test_client().get('/items?stream=1&count=0')
+    assert json.loads(resp.data) == {'items': [], 'total': 5}
+
+
+def test_ndjson_when_accepted():
+    resp = app.test_client().get('/items', headers={'Accept': 'application/x-ndjson'})
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = resp.data.decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{'value': i} for i in range(5)]
@@ -0,0 +1,32 @@
+import pytest
+
+from src.textdelta import DeltaError, apply_ops
+
+
+def test_applies_ops_in_base_coordinates():
+    base = 'The quick brown fox'
+    ops = [{'pos': 4, 'del': 5, 'ins': 'slow'}, [16, 3, 'dog']]
+    assert apply_ops(base, ops) == 'The slow brown dog'
+
+
+def test_positions_count_utf16_code_units():
+    # the emoji is two UTF-16 code units, as in JavaScript
+    assert apply_ops('a😀b', [[3, 1, 'c']]) == 'a😀c'
+
+
+def test_empty_ops_return_base():
+    assert apply_ops('unchanged', []) == 'unchanged'
+
+
+@pytest.mark.parametrize('ops', [
+    [[5, 1, 'x'], [2, 1, 'y']],        # unsorted
+    [[0, 4, 'x'], [2, 1, 'y']],        # overlapping
+    [[0, 100, '']],                    # past the end
+    [[-1, 0, 'x']],                    # negative
+    [{'pos': '1', 'del': 0}],          # wrong type
+    [[1, 1, 'x', 'extra']],
+    [[2, 0, 'x']],                     # splits the surrogate pair
+])
+def test_rejects_bad_ops(ops):
+    with pytest.raises(DeltaError):
+        apply_ops('a😀bcdef', ops)
@@ -0,0 +1,35 @@
+import pytest
+
+from src import llm
+from src.translation_cache import TranslationCache, translation_key
+
+
+def test_key_depends_on_language_model_and_prompt_version():
+    base = translation_key('hello', 'French', 'm', 1)
+    assert base == translation_key('hello', 'French', 'm', 1)
+    assert base != translation_key('hello', 'German', 'm', 1)
+    assert base != translation_key('hello', 'French', 'other', 1)
+    assert base != translation_key('hello', 'French', 'm', 2)
+
+
+def test_translate_consults_cache(monkeypatch):
+    calls = []
+
+    def fake_call(model, messages, temperature=0.2, top_p=1.0, api_token=None):
+        calls.append(messages)
+        return 'Bonjour'
+
+    mongomock = pytest.importorskip('mongomock')
+    store = mongomock.MongoClient().db.translation_cache
+    monkeypatch.setattr(llm, 'call_llm_model', fake_call)
+    monkeypatch.setattr(llm, 'translation_cache', TranslationCache(store))
+    assert llm.translate('hello', 'French', api_token='t') == 'Bonjour'
+    assert llm.translate('hello', 'French', api_token='t') == 'Bonjour'
+    assert len(calls) == 1
+    assert llm.translation_cache.stats()['memory_hits'] == 1
+
+    # A fresh process (empty LRU) still hits the shared collection.
+    monkeypatch.setattr(llm, 'translation_cache', TranslationCache(store))
+    assert llm.translate('hello', 'French', api_token='t') == 'Bonjour'
+    assert len(calls) == 1
+    assert llm.translation_cache.stats()['store_hits'] == 1
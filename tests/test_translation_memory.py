@@ -0,0 +1,76 @@
+import pytest
+
+from src.translation_memory import TranslationMemory
+
+
+def test_only_new_sentences_are_translated():
+    mongomock = pytest.importorskip('mongomock')
+    memory = TranslationMemory(mongomock.MongoClient().db.translation_memory)
+    batches = []
+
+    def translate_batch(sentences):
+        batches.append(sentences)
+        return [s.upper() for s in sentences]
+
+    first = memory.translate_fields('n1', {'content': 'One. Two.\n\nThree!'}, 'French', 'm', translate_batch)
+    assert first == {'content': 'ONE. TWO.\n\nTHREE!'}
+    edited = memory.translate_fields('n1', {'content': 'One. Deux.\n\nThree!'}, 'French', 'm', translate_batch)
+    assert edited == {'content': 'ONE. DEUX.\n\nTHREE!'}
+    assert batches == [['One.', 'Two.', 'Three!'], ['Deux.']]
+    # memory is per note and per language
+    memory.translate_fields('n2', {'content': 'One.'}, 'French', 'm', translate_batch)
+    memory.translate_fields('n1', {'content': 'One.'}, 'German', 'm', translate_batch)
+    assert batches[2:] == [['One.'], ['One.']]
+    assert memory.stats()['segments_reused'] == 2
+
+
+def test_failed_batch_returns_nothing():
+    mongomock = pytest.importorskip('mongomock')
+    memory = TranslationMemory(mongomock.MongoClient().db.translation_memory)
+
+    def failing(sentences):
+        raise RuntimeError('misaligned')
+
+    assert memory.translate_fields('n1', {'content': 'One.'}, 'French', 'm', failing) == {}
+    assert memory.stats()['errors'] == 1
+
+
+def test_first_translation_follows_mode_and_seeds_memory(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    import json
+    from src import llm
+    calls = []
+
+    def fake_call(model, messages, temperature=0.2, top_p=1.0, api_token=None):
+        calls.append(messages[0]['content'])
+        text = messages[-1]['content'].split('\n\n', 1)[1]
+        if 'JSON array' in messages[0]['content']:
+            return json.dumps([s.upper() for s in json.loads(text)])
+        return text.upper()
+
+    memory = TranslationMemory(mongomock.MongoClient().db.translation_memory)
+    monkeypatch.setattr(llm, 'call_llm_model', fake_call)
+    monkeypatch.setattr(llm, 'translation_cache', None)
+    monkeypatch.setattr(llm, 'translation_memory', memory)
+
+    fields = {'title': 'Hello', 'content': 'One. Two.'}
+    translated, errors = llm.translate_fields(fields, 'French', 'm', 't', mode='sequential', note_id='n1')
+    assert (translated, errors) == ({'title': 'HELLO', 'content': 'ONE. TWO.'}, {})
+    assert len(calls) == 2 and not any('JSON array' in c for c in calls)
+    assert memory.has_segments('n1', 'French', 'm')
+
+    calls.clear()
+    translated, _ = llm.translate_fields({'title': 'Hello', 'content': 'One. Three.'}, 'French', 'm', 't',
+                                         note_id='n1')
+    assert translated == {'title': 'HELLO', 'content': 'ONE. THREE.'}
+    assert len(calls) == 1 and 'JSON array' in calls[0]
+    assert memory.stats()['segments_reused'] == 2
+
+
+def test_remember_skips_fields_that_do_not_align():
+    mongomock = pytest.importorskip('mongomock')
+    memory = TranslationMemory(mongomock.MongoClient().db.translation_memory)
+    assert memory.remember('n1', {'content': 'One. Two.'}, {'content': 'Un et deux.'}, 'French', 'm') == 0
+    assert not memory.has_segments('n1', 'French', 'm')
+    assert memory.remember('n1', {'content': 'One. Two.', 'title': 'Hi'}, {'content': 'Un. Deux.'},
+                           'French', 'm') == 2